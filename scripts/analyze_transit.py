@@ -1,139 +1,131 @@
-﻿import pandas as pd, datetime, requests, matplotlib.pyplot as plt, numpy as np
-from pathlib import Path
+﻿import pandas as pd, datetime, numpy as np
+import container_costs
+import dashboard
+from paths import DATA_DIR, DOCS_DIR
+import history_store
+import instrument
+from breakeven_solver import CONTAINERS
+from portcalls_client import PortCallsClient
+import synth_portcalls
 
 # --- Setup ---
-base = Path("C:/Users/seeds/Documents/Containrttransshipment")
-data_dir, docs_dir = base / "data", base / "docs"
+data_dir, docs_dir = DATA_DIR, DOCS_DIR
 data_dir.mkdir(exist_ok=True); docs_dir.mkdir(exist_ok=True)
 
 today = datetime.date.today()
+instrument.stage("fetch")
 print("📡 Fetching NZ→Singapore transshipment data...")
 
-api_url = "https://api.portcalls.io/v1/schedules"
 nz_ports = ["NZAKL", "NZTRG", "NZLYT"]
+fallback = {
+    "NZAKL": {"origin": "Auckland", "destination": "Singapore", "eta_days": 12.3},
+    "NZTRG": {"origin": "Tauranga", "destination": "Singapore", "eta_days": 11.8},
+    "NZLYT": {"origin": "Lyttelton", "destination": "Singapore", "eta_days": 13.5},
+}
 records = []
 
-for port in nz_ports:
-    try:
-        params = {"from": port, "to": "SGSIN", "limit": 10}
-        headers = {"accept": "application/json"}
-        res = requests.get(api_url, params=params, headers=headers, timeout=15)
-        res.raise_for_status()
-        data_json = res.json()
-        records += data_json.get("results", [])
-    except Exception:
+client = PortCallsClient()
+for port, res in zip(nz_ports, client.fetch_many([{"from": port, "to": "SGSIN"} for port in nz_ports])):
+    if isinstance(res, Exception):
         print(f"⚠️ Using simulated data for {port}.")
-        fallback = {
-            "NZAKL": {"origin": "Auckland", "destination": "Singapore", "eta_days": 12.3},
-            "NZTRG": {"origin": "Tauranga", "destination": "Singapore", "eta_days": 11.8},
-            "NZLYT": {"origin": "Lyttelton", "destination": "Singapore", "eta_days": 13.5},
-        }
-        records.append(fallback[port])
-
-df = pd.DataFrame(records)
+        res = pd.DataFrame([fallback[port]])
+    records.append(res.assign(Port_Code=port))
+
+instrument.stage("merge")
+df = pd.concat(records, ignore_index=True)
+instrument.rows("concat_port_schedules", sum(len(r) for r in records), df)
 if "eta_days" not in df.columns:
-    df["eta_days"] = [r.get("eta_days", 12) for r in records]
+    df["eta_days"] = 12
+df["eta_days"] = df["eta_days"].fillna(12)
 
 df["Date"], df["Port"], df["Avg_Transit_Days"] = today, df["origin"], df["eta_days"]
-df["Containers"] = [round(50 + 50 * abs(hash(p)) % 30) for p in df["Port"]]
 
-# --- Baseline transshipment costs ---
+instrument.stage("containers")
+# --- Baseline transshipment costs, per container (see container_costs) ---
 handling_nzd, thc_nzd, storage_per_day_sg_nzd, admin_nzd, avg_stay_sg_days = 180, 160, 30, 40, 7
-per_container_cost_nzd = handling_nzd + thc_nzd + admin_nzd + storage_per_day_sg_nzd * avg_stay_sg_days
 nzd_to_usd, nzd_to_sgd = 0.60, 0.80
-
-df["Transshipment_Cost_NZD"] = per_container_cost_nzd
-df["Total_Transshipment_Cost_NZD"] = df["Transshipment_Cost_NZD"] * df["Containers"]
-
+tariff = {"handling": handling_nzd + thc_nzd + admin_nzd, "sg_rate": storage_per_day_sg_nzd}
+
+# data/containers.csv when there is a manifest; otherwise a seeded sample of the usual port
+# volumes, which the dashboard labels as modelled
+ctn = container_costs.load_manifest()
+synthetic = ctn is None
+if synthetic:
+    print("⚠️ No data/containers.csv: costing a synthetic container sample.")
+    ctn = synth_portcalls.containers(dict(zip(container_costs.PORTS, CONTAINERS)), avg_sg_dwell=avg_stay_sg_days)
+ports = container_costs.port_totals(ctn, tariff=tariff)
+instrument.rows("container_costs", len(ctn), ports)
+df = df.merge(ports[["Port_Code", "Containers", "TEU", "Reefers", "Current_Cost_NZD"]], on="Port_Code", how="left")
+df["Transshipment_Cost_NZD"] = (df["Current_Cost_NZD"] / df["Containers"]).round(2)
+df["Total_Transshipment_Cost_NZD"] = df.pop("Current_Cost_NZD").round(2)
+
+instrument.stage("scenarios")
 # --- Deferred departure model ---
-NZ_storage_per_day_nzd = 15
-SG_storage_per_day_nzd = 30
+# Every column comes from each container's own size, reefer plug, yard rate and dwell
 delay_to_sg_ratio = 0.8
-SG_handling_nzd = handling_nzd + thc_nzd + admin_nzd
-total_containers = df["Containers"].sum()
-
-scenarios = []
-for delay_days in range(0, 8):
-    reduced_sg_days = max(1, avg_stay_sg_days - delay_days * delay_to_sg_ratio)
-    cost_now = SG_handling_nzd + SG_storage_per_day_nzd * avg_stay_sg_days
-    cost_defer = SG_handling_nzd + SG_storage_per_day_nzd * reduced_sg_days + NZ_storage_per_day_nzd * delay_days
-    savings_per_teu = cost_now - cost_defer
-    fleet_savings = savings_per_teu * total_containers
-    scenarios.append((delay_days, reduced_sg_days, cost_now, cost_defer, savings_per_teu, fleet_savings))
-df_scen = pd.DataFrame(scenarios, columns=[
-    "Delay_Days","Reduced_SG_Days","Current_SG_Cost","Deferred_Total_Cost",
-    "Savings_Per_TEU_NZD","Fleet_Savings_NZD"])
+total_containers = int(ports["Containers"].sum())
+
+delays = np.arange(0, 8)
+curve = container_costs.deferral_curve(ctn, delays, dict(tariff, delay_to_sg_ratio=delay_to_sg_ratio))
+df_scen = pd.DataFrame({
+    "Delay_Days": delays, "Reduced_SG_Days": curve["SG_Days"].round(2),
+    "Current_SG_Cost": (curve["Current_Cost_NZD"] / curve["TEU"]).round(2),
+    "Deferred_Total_Cost": (curve["Deferred_Cost_NZD"] / curve["TEU"]).round(2),
+    "Savings_Per_TEU_NZD": ((curve["Current_Cost_NZD"] - curve["Deferred_Cost_NZD"]) / curve["TEU"]).round(2),
+    "Fleet_Savings_NZD": (curve["Current_Cost_NZD"] - curve["Deferred_Cost_NZD"]).round(0)})
 df_scen.to_csv(data_dir / "delay_scenarios.csv", index=False)
+history_store.append("baseline_costs", df, port_col="Port")
+history_store.append("delay_scenarios", df_scen)
 
-# --- Sensitivity analysis ---
-print("📈 Running sensitivity analysis...")
-yard_rates = range(10, 26, 3)
-sens_rows = []
-for rate in yard_rates:
-    for delay_days in range(0, 8):
-        reduced_sg_days = max(1, avg_stay_sg_days - delay_days * delay_to_sg_ratio)
-        cost_defer = SG_handling_nzd + SG_storage_per_day_nzd * reduced_sg_days + rate * delay_days
-        savings = (SG_handling_nzd + SG_storage_per_day_nzd * avg_stay_sg_days) - cost_defer
-        sens_rows.append((rate, delay_days, savings))
-df_sens = pd.DataFrame(sens_rows, columns=["NZ_Yard_Rate","Delay_Days","Savings_Per_TEU"])
-pivot = df_sens.pivot(index="NZ_Yard_Rate", columns="Delay_Days", values="Savings_Per_TEU")
-
-plt.figure(figsize=(8,6))
-plt.imshow(pivot, cmap="RdYlGn", origin="lower", aspect="auto")
-plt.colorbar(label="Savings per TEU (NZD)")
-plt.xticks(range(0,8), range(0,8))
-plt.yticks(range(len(pivot.index)), pivot.index)
-plt.xlabel("Delay in NZ (days)")
-plt.ylabel("NZ Yard Cost (NZD/day)")
-plt.title("Sensitivity of Savings per TEU to Yard Cost and Delay")
-plt.tight_layout()
-plt.savefig(docs_dir / "yard_sensitivity_chart.png")
-plt.close()
-
+instrument.stage("html")
 # --- Summary ---
 opt_delay = df_scen.loc[df_scen["Deferred_Total_Cost"].idxmin(), "Delay_Days"]
 opt_saving_teu = df_scen["Savings_Per_TEU_NZD"].max()
 opt_fleet_saving = df_scen["Fleet_Savings_NZD"].max()
-avg_cost_per_teu = df["Total_Transshipment_Cost_NZD"].sum() / total_containers
-
-# --- Dashboard HTML ---
-html_base = df.to_html(index=False)
-html_scen = df_scen.to_html(index=False)
-
-html = f"""
-<html>
-<head><title>NZ ➜ Singapore Transshipment Optimization Dashboard</title></head>
-<body style='font-family:Arial;text-align:center;background-color:#f9fafc;'>
-<h1>🚢 NZ ➜ Singapore Transshipment Optimization</h1>
-<p>Last updated: {today}</p>
+avg_cost_per_teu = ports["Current_Cost_NZD"].sum() / ports["TEU"].sum()
+
+# --- Dashboard sections (re-rendered only when their data changes; see dashboard.py) ---
+def render_baseline(d):
+    return f"""
+<p style='text-align:center;'>Last updated: {d['date']}</p>
 <div style='display:flex;justify-content:center;gap:15px;flex-wrap:wrap;'>
     <img src='cost_chart.png' width='380'>
     <img src='defer_chart.png' width='380'>
     <img src='fleet_savings_chart.png' width='380'>
     <img src='yard_sensitivity_chart.png' width='380'>
 </div>
-<h3>📊 Baseline Transshipment Costs</h3>
-{html_base}
-<hr style='margin:30px 0;'>
-<h3>⏳ Deferred Departure Scenarios</h3>
-{html_scen}
-<hr style='margin:30px 0;'>
-<div style='display:inline-block;padding:20px;background-color:#fff3cd;border-radius:10px;box-shadow:0 0 5px rgba(0,0,0,0.1);'>
+<h3 style='text-align:center;'>📊 Baseline Transshipment Costs{' (modelled, synthetic sample)' if d['source'] else ''}</h3>
+{dashboard.table(d['costs'], 'baseline_costs')}
+<div style='margin:30px auto;width:fit-content;padding:20px;background-color:#fff3cd;border-radius:10px;box-shadow:0 0 5px rgba(0,0,0,0.1);'>
 <h3>📦 Summary</h3>
-<p><b>Total Containers:</b> {total_containers}</p>
-<p><b>Baseline Avg Cost per TEU:</b> NZD {avg_cost_per_teu:,.2f}</p>
-<p><b>Optimal NZ Delay:</b> {opt_delay} days</p>
-<p><b>Per-TEU Saving:</b> NZD {opt_saving_teu:,.2f}</p>
-<p><b>Total Fleet Saving:</b> NZD {opt_fleet_saving:,.0f}</p>
+<p><b>Total Containers:</b> {d['containers']}</p>
+<p><b>Baseline Avg Cost per TEU:</b> NZD {d['avg_cost']:,.2f}</p>
+<p><b>Optimal NZ Delay:</b> {d['opt_delay']} days</p>
+<p><b>Per-TEU Saving:</b> NZD {d['saving_teu']:,.2f}</p>
+<p><b>Total Fleet Saving:</b> NZD {d['fleet_saving']:,.0f}</p>
 </div>
-<p style='margin-top:20px;color:gray;font-size:14px;'>
-*Assumes: SG handling+THC+admin = {SG_handling_nzd} NZD, SG storage = {SG_storage_per_day_nzd} NZD/day.<br>
-NZ yard = 10–25 NZD/day tested. Each 1 day NZ delay ≈ 0.8 day less dwell in Singapore.*
-</p>
-</body></html>
-"""
-
-html_path = docs_dir / "index.html"
-with open(html_path, "w", encoding="utf-8") as f: f.write(html)
-print(f"🌍 Dashboard updated with sensitivity analysis: {html_path}")
-
+<p style='text-align:center;color:gray;font-size:14px;'>
+*Costed per container: SG handling+THC+admin = {d['sg_handling']} NZD per 20 ft box ({d['box_40']}× for 40 ft),
+SG storage = {d['sg_storage']} NZD/day/TEU, reefer plug-in = {d['reefer_sg']:g} NZD/day in SG and {d['reefer_nz']:g} in NZ.<br>
+NZ yard = each container's own yard, {d['yard_min']:g}–{d['yard_max']:g} NZD/day/TEU. Each 1 day NZ delay ≈
+{d['ratio']} day less dwell in Singapore (at least {d['min_sg']:g} day).*{d['source']}
+</p>"""
+
+
+def render_scenarios(d):
+    return dashboard.table(d["scenarios"], "delay_scenarios")
+
+
+dashboard.write_section("baseline", render_baseline, {
+    "date": today, "costs": df, "containers": int(total_containers), "avg_cost": float(avg_cost_per_teu),
+    "opt_delay": int(opt_delay), "saving_teu": float(opt_saving_teu), "fleet_saving": float(opt_fleet_saving),
+    "sg_handling": tariff["handling"], "sg_storage": tariff["sg_rate"],
+    "box_40": container_costs.TARIFF["box_factor_40"], "reefer_sg": container_costs.TARIFF["reefer_sg_day"],
+    "reefer_nz": container_costs.TARIFF["reefer_nz_day"], "yard_min": float(container_costs.YARD_RATES.min()),
+    "yard_max": float(container_costs.YARD_RATES.max()), "ratio": delay_to_sg_ratio,
+    "min_sg": container_costs.TARIFF["min_sg_days"],
+    "source": "<br><b>Modelled from a synthetic container sample</b> (no data/containers.csv): "
+              "counts follow the usual port volumes; sizes, reefers, yards and dwell are simulated."
+              if synthetic else ""})
+dashboard.write_section("scenarios", render_scenarios, {"scenarios": df_scen})
+print("🌍 Baseline and scenario sections ready (assemble with dashboard.py)")
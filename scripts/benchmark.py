@@ -0,0 +1,225 @@
+﻿import argparse, json, platform, sys, tempfile, threading, time, tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from paths import DATA_DIR
+
+# --- Benchmarks for the analysis hot paths ---
+# Each benchmark is a setup function registered with @bench: it prepares inputs at a given
+# size (synthetic feeds from synth_portcalls, generated once and cached) and returns the
+# callable to time. Every (benchmark, size) is timed best-of-N, then run once more for
+# peak allocation: tracemalloc covers Python/NumPy, and Arrow's memory pool (which
+# tracemalloc can't see) is sampled alongside when pyarrow is loaded. Baselines live in
+# data/benchmark_baseline.json keyed by machine, so a regression against this machine's
+# last --save fails the run before it ships.
+#
+#   python benchmark.py                       # 1e3..1e5, compare with baseline
+#   python benchmark.py --sizes 1e6 1e7 --only leg_join
+#   python benchmark.py --save                # record a new baseline
+
+BASELINE_PATH = DATA_DIR / "benchmark_baseline.json"
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+MIN_SECONDS, MIN_MIB = 0.02, 1.0    # below these, differences are noise
+BENCHES = {}
+
+
+def bench(name):
+    def register(setup):
+        BENCHES[name] = setup
+        return setup
+    return register
+
+
+@bench("leg_join")
+def _leg_join(rows):
+    from synth_portcalls import cached_feeds
+    from leg_join import join_legs
+    paths = cached_feeds(rows)
+    return lambda: join_legs(paths["nz"], paths["sg"], paths["jp"])
+
+
+@bench("feed_load")
+def _feed_load(rows):
+    from synth_portcalls import cached_feeds
+    from feed_loader import read_feed
+    path = cached_feeds(rows)["nz"]
+    return lambda: read_feed(path, report=False)
+
+
+@bench("dwell_match")
+def _dwell_match(rows):
+    from synth_portcalls import hub_calls
+    from dwell_matching import match_next_departures
+    arr, dep = hub_calls(rows)
+    arr = arr.assign(arrival_time=arr["eta"], hub=arr["to"])
+    dep = dep.assign(depart_time=dep["etd"], hub=dep["from"])
+    return lambda: match_next_departures(arr, dep, by=["hub"])
+
+
+@bench("schedule_lookup")
+def _schedule_lookup(rows):
+    from synth_portcalls import hub_calls
+    from schedule_index import ScheduleIndex, lanes_from_frame
+    arr, dep = hub_calls(rows)
+    index = ScheduleIndex(tempfile.mkdtemp(prefix="bench-schedule-"))
+    index.update(lanes_from_frame(dep))
+    arrivals = arr["eta"].to_numpy("datetime64[s]")
+    return lambda: index.next_departures("SGSIN", "NLRTM", arrivals, 24 * 3600)
+
+
+@bench("scenario_grid")
+def _scenario_grid(rows):
+    from scenario_grid import evaluate_grid
+    side = max(1, int(rows ** 0.5))
+    axes = {"yard_rate": np.linspace(10, 25, side), "delay_days": np.linspace(0, 14, max(1, rows // side))}
+    return lambda: evaluate_grid(axes).pivot("yard_rate", "delay_days")
+
+
+@bench("monte_carlo")
+def _monte_carlo(rows):
+    import breakeven_montecarlo as mc
+    dists = mc.fit_distributions()
+    totals = [mc.trans_total[p] for p in mc.ports]
+    return lambda: mc.simulate_chunk(np.random.SeedSequence(2025), rows, dists, mc.containers, totals, 14)
+
+
+@bench("container_costs")
+def _container_costs(rows):
+    import container_costs
+    from synth_portcalls import containers
+    share = np.diff(np.linspace(0, rows, len(container_costs.PORTS) + 1).astype(int))
+    ctn = containers(dict(zip(container_costs.PORTS, share)))
+    return lambda: container_costs.deferral_curve(ctn, range(8))
+
+
+@bench("deferral_optimizer")
+def _deferral_optimizer(rows):
+    import container_costs
+    import deferral_optimizer as opt
+    from synth_portcalls import containers
+    share = np.diff(np.linspace(0, rows, len(container_costs.PORTS) + 1).astype(int))
+    ctn = containers(dict(zip(container_costs.PORTS, share)))
+    departures = opt.sg_departure_days(["2025-01-04"], "2025-01-01", 30 + opt.MAX_DEFER_DAYS + 20)
+    return lambda: opt.optimize(ctn, departures, capacity=rows / 1000)
+
+
+@bench("routing")
+def _routing(rows):
+    from routing import AllPairs
+    rng = np.random.default_rng(2025)
+    n = max(8, int(rows ** 0.5))
+    keys = np.unique(rng.integers(0, n, rows) * n + rng.integers(0, n, rows))
+    weights = rng.uniform(1, 30, (len(keys), 2))
+    nodes = [f"N{i}" for i in range(n)]
+    return lambda: AllPairs.build(nodes, keys, weights)
+
+
+@bench("chart_render")
+def _chart_render(rows):
+    import charts
+    from chart_render import ChartJob, _render
+    side = max(2, int(min(rows, 10**6) ** 0.5))
+    values = np.random.default_rng(2025).normal(size=(side, side))
+    out = Path(tempfile.mkdtemp(prefix="bench-chart-")) / "heatmap.png"
+    job = ChartJob(out, charts.heatmap, {"values": values, "rows": list(range(side)), "cols": list(range(side))},
+                   {"title": "bench", "xlabel": "x", "ylabel": "y", "cbar_label": "v"})
+    return lambda: _render(job, "bench")
+
+
+@bench("chart_tiles")
+def _chart_tiles(rows):
+    import chart_tiles
+    from synth_portcalls import cached_feeds
+    from leg_join import join_legs
+    from leg_table import classify_departures
+    paths = cached_feeds(rows)
+    legs = classify_departures(join_legs(paths["nz"], paths["sg"], paths["jp"]))
+    root = Path(tempfile.mkdtemp(prefix="bench-tiles-"))
+    return lambda: chart_tiles.scatter(legs, "voyages", "Departure_NZ", "Total_Transit_Days", by="DepartureType",
+                                       text="Vessel_IMO", root=root)
+
+
+def measure(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    arrow = sys.modules.get("pyarrow")
+    arrow_peak, done = [0], threading.Event()
+
+    def sample(base):
+        while not done.wait(0.001):
+            arrow_peak[0] = max(arrow_peak[0], arrow.total_allocated_bytes() - base)
+    sampler = threading.Thread(target=sample, args=(arrow.total_allocated_bytes(),)) if arrow else None
+    tracemalloc.start()
+    if sampler:
+        sampler.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    if sampler:
+        done.set()
+        sampler.join()
+        peak += arrow_peak[0]
+    return {"seconds": round(min(times), 5), "peak_mib": round(peak / 2**20, 2)}
+
+
+def machine_id():
+    return f"{platform.node()}-{platform.machine()}-py{platform.python_version()}"
+
+
+def run(names, sizes, repeat=None):
+    """{'name@rows': {'seconds', 'peak_mib'}} for every benchmark and size."""
+    results = {}
+    for name in names:
+        for rows in sizes:
+            fn = BENCHES[name](rows)
+            results[f"{name}@{rows}"] = measure(fn, repeat or (3 if rows < 10**6 else 1))
+            r = results[f"{name}@{rows}"]
+            print(f"⏱️ {name:<14} {rows:>10,} rows  {r['seconds']:>9.4f}s  {r['peak_mib']:>9.1f} MiB peak")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Rows of (case, metric, baseline, now, ratio) for measurements beyond tolerance."""
+    regressions = []
+    for case, now in results.items():
+        base = baseline.get(case)
+        if not base:
+            continue
+        for metric, floor in (("seconds", MIN_SECONDS), ("peak_mib", MIN_MIB)):
+            if now[metric] > max(base[metric], floor) * tolerance:
+                regressions.append((case, metric, base[metric], now[metric], now[metric] / max(base[metric], floor)))
+    return regressions
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Time and memory-profile the analysis hot paths")
+    ap.add_argument("--sizes", nargs="+", type=float, default=DEFAULT_SIZES, help="row counts, e.g. 1e3 1e5 1e7")
+    ap.add_argument("--only", nargs="+", choices=sorted(BENCHES), help="run just these benchmarks")
+    ap.add_argument("--repeat", type=int, help="timed runs per case (default 3, 1 from 1e6 rows)")
+    ap.add_argument("--tolerance", type=float, default=1.25, help="allowed slowdown/growth vs baseline")
+    ap.add_argument("--save", action="store_true", help="store these results as this machine's baseline")
+    args = ap.parse_args()
+
+    machine = machine_id()
+    stored = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    print(f"🏋️ Benchmarking on {machine}")
+    results = run(args.only or list(BENCHES), [int(s) for s in args.sizes], args.repeat)
+
+    if args.save:
+        stored[machine] = {**stored.get(machine, {}), **results}
+        BASELINE_PATH.write_text(json.dumps(stored, indent=2, sort_keys=True))
+        print(f"✅ Baseline saved → {BASELINE_PATH}")
+        sys.exit(0)
+    if machine not in stored:
+        print("ℹ️ No baseline for this machine yet; run with --save to record one.")
+        sys.exit(0)
+    regressions = compare(results, stored[machine], args.tolerance)
+    if regressions:
+        print(pd.DataFrame(regressions, columns=["Case", "Metric", "Baseline", "Now", "Ratio"]).round(3).to_string(index=False))
+        print(f"❌ {len(regressions)} regression(s) beyond {args.tolerance:.2f}x")
+        sys.exit(1)
+    print(f"✅ No regressions beyond {args.tolerance:.2f}x")
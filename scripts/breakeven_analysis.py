@@ -1,55 +1,39 @@
-﻿import pandas as pd, numpy as np, matplotlib.pyplot as plt, os, datetime
+﻿import numpy as np, os, datetime
+import charts
+import dashboard
+from chart_render import ChartJob, describe, render_all
+from paths import DATA_DIR, DOCS_DIR
+import history_store
+import instrument
+from breakeven_solver import default_lanes, nz_cost, solve_lanes
 
 print("📈 Rebuilding breakeven comparison with clearer visuals...")
 
-base = r"C:\Users\seeds\Documents\Containrttransshipment"
-data_dir = os.path.join(base, "data")
-docs_dir = os.path.join(base, "docs")
+data_dir, docs_dir = str(DATA_DIR), str(DOCS_DIR)
 os.makedirs(data_dir, exist_ok=True)
 os.makedirs(docs_dir, exist_ok=True)
 
-ports = ["Auckland", "Tauranga", "Lyttelton"]
-containers = [60, 70, 65]
-nz_cost_per_day = 45
-transship_total = {"Auckland":108000, "Tauranga":115500, "Lyttelton":113750}
+instrument.stage("scenarios")
+lanes = solve_lanes(default_lanes())
+ports = list(lanes["Port"])
 
-rows = []
-days = np.arange(0, 15)
+jobs = []
+for _, lane in lanes.iterrows():
+    port, be = lane["Port"], lane["Breakeven_Day"]
+    days = np.arange(0, max(15, int(np.nan_to_num(be)) + 4))
+    nz_costs = nz_cost(lane["Containers"], lane["Yard_Per_Day"], lane["Truck"], lane["Wharf"], days)
+    jobs.append(ChartJob(os.path.join(docs_dir, f"breakeven_{port}.png"), charts.breakeven_curve,
+                         {"days": days, "nz_costs": nz_costs, "sg_total": float(lane["Trans_Total"]), "breakeven": float(be)},
+                         {"figsize": (7.5,5.2), "dpi": 140, "title": f"{port}: NZ vs SG — Breakeven"}))
 
-for port, c, t_cost in zip(ports, containers, [transship_total[p] for p in ports]):
-    nz_costs = c * (nz_cost_per_day * days + 320 + 180)
-    diff = t_cost - nz_costs
-    be_day = int(days[np.argmin(np.abs(diff))])
-    rows.append((port, be_day))
+instrument.stage("rendering")
+print(f"🖼️ Charts: {describe(render_all(jobs))}")
 
-    plt.figure(figsize=(7.5,5.2), dpi=140)
-    plt.plot(days, nz_costs, linewidth=3, label="NZ Deferred Storage (total)")
-    plt.axhline(y=t_cost, linestyle="--", linewidth=2, label="SG Transshipment (total)")
-
-    cheaper_mask = nz_costs < t_cost
-    if cheaper_mask.any():
-        plt.fill_between(days, nz_costs, t_cost, where=cheaper_mask, alpha=0.18)
-
-    plt.axvline(be_day, linestyle=":", linewidth=2)
-    y_val = c * (nz_cost_per_day * be_day + 320 + 180)
-    plt.scatter([be_day], [y_val], s=60)
-    plt.annotate(f"Breakeven ≈ {be_day} day(s)",
-                 xy=(be_day, y_val),
-                 xytext=(be_day+0.5, y_val*1.03),
-                 arrowprops=dict(arrowstyle="->", lw=1))
-
-    plt.title(f"{port}: NZ vs SG — Breakeven", fontsize=13, pad=12)
-    plt.xlabel("Deferred days in NZ yard", fontsize=11)
-    plt.ylabel("Total cost (NZD)", fontsize=11)
-    plt.grid(True, linestyle="--", alpha=0.35)
-    plt.legend(loc="best", frameon=False)
-    plt.tight_layout()
-    plt.savefig(os.path.join(docs_dir, f"breakeven_{port}.png"))
-    plt.close()
-
-df = pd.DataFrame(rows, columns=["Port", "Breakeven_Day"])
+df = lanes[["Port", "Breakeven_Day", "Has_Crossing"]].round({"Breakeven_Day": 2})
 df.to_csv(os.path.join(data_dir, "breakeven_summary.csv"), index=False)
+history_store.append("breakeven_summary", df, port_col="Port")
 
+instrument.stage("html")
 html = f"""
 <html><head><title>⚖️ NZ Storage vs Singapore Transshipment — Breakeven</title>
 <style>
@@ -65,7 +49,7 @@ img {{display:block; margin:18px auto; max-width:95%; border-radius:8px;}}
 <p style='text-align:center;'>Updated {datetime.date.today()}</p>
 <table>
 <tr><th>Port</th><th>Breakeven Day (days)</th></tr>
-{''.join([f"<tr><td>{p}</td><td>{d}</td></tr>" for p,d in df.values])}
+{''.join([f"<tr><td>{p}</td><td>{d if x else 'no crossing'}</td></tr>" for p,d,x in df.values])}
 </table>
 <hr>
 <h2>Cost Curves by Port</h2>
@@ -79,4 +63,16 @@ Assumptions: NZ yard 45 NZD/day/TEU, Truck 320 NZD/ctn, Wharf 180 NZD/ctn.
 with open(os.path.join(docs_dir, "breakeven.html"), "w", encoding="utf-8") as f:
     f.write(html)
 
-print(f"✅ Breakeven visuals refreshed → {docs_dir}\\breakeven.html")
+print(f"✅ Breakeven visuals refreshed → {os.path.join(docs_dir, 'breakeven.html')}")
+
+# --- Dashboard section (re-rendered only when the breakeven table changes; see dashboard.py) ---
+def render_breakeven(d):
+    rows = "".join(f"<tr><td>{p}</td><td>{b if x else 'no crossing'}</td></tr>" for p, b, x in d["summary"].values)
+    imgs = "".join(f"<img src='breakeven_{p}.png' alt='{p} breakeven' style='max-width:32%;'>" for p in d["summary"]["Port"])
+    return f"""
+<table><tr><th>Port</th><th>Breakeven Day (days)</th></tr>{rows}</table>
+<div style='text-align:center;margin-top:18px;'>{imgs}</div>
+<p style='text-align:center;'><a href='breakeven.html'>Full breakeven page →</a></p>"""
+
+
+dashboard.write_section("breakeven", render_breakeven, {"summary": df})
@@ -0,0 +1,106 @@
+﻿import argparse, os, time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from paths import DATA_DIR
+import instrument
+from leg_table import load_leg_table
+from breakeven_solver import (CONTAINERS, PORTS, TRANS_TOTAL, TRUCK_PER_CTN, WHARF_PER_CTN, YARD_NZ_DAY,
+                              nz_cost, solve_breakeven)
+
+# --- Monte Carlo breakeven (stochastic mode of breakeven/local-storage analyses) ---
+# Transit NZ->SG, SG dwell and NZ yard rate are drawn from distributions fitted to the
+# feeds (transit from the voyage-joined leg table, one sample per voyage); each trial's
+# breakeven day comes from the closed-form breakeven_solver, so a chunk of trials is a
+# handful of array ops. Chunks get their own SeedSequence child, which keeps results
+# identical whatever the number of worker processes.
+
+data_dir = DATA_DIR
+
+ports, containers, trans_total = PORTS, CONTAINERS, TRANS_TOTAL
+yard_nz_day, truck_per_ctn, wharf_per_ctn = YARD_NZ_DAY, TRUCK_PER_CTN, WHARF_PER_CTN
+sg_storage_day = 30.0
+CHUNK = 250_000
+PCTS = (5, 25, 50, 75, 95)
+
+
+def _lognormal(samples, min_cv):
+    """(mu, sigma) of a lognormal matching the sample mean/CV, with a CV floor."""
+    samples = np.asarray(samples, dtype=float)
+    samples = samples[np.isfinite(samples) & (samples > 0)]
+    mean = samples.mean()
+    cv = max(samples.std(ddof=1) / mean if len(samples) > 1 else 0.0, min_cv)
+    sigma = np.sqrt(np.log1p(cv ** 2))
+    return float(np.log(mean) - sigma ** 2 / 2), float(sigma)
+
+
+def fit_distributions(data_dir=data_dir, min_cv=0.1, yard_spread=(0.8, 1.3)):
+    """Fit transit/dwell lognormals from the leg table and dwell CSV plus a triangular yard-rate range."""
+    legs = load_leg_table(data_dir)
+    dwell = pd.read_csv(data_dir / "inferred_dwell.csv", encoding="utf-8-sig")
+    return {
+        "transit": _lognormal(legs["NZ_to_SG_days"], min_cv),
+        "dwell": _lognormal(dwell["Dwell_Days"], min_cv),
+        "yard": (yard_nz_day * yard_spread[0], yard_nz_day, yard_nz_day * yard_spread[1]),
+    }
+
+
+def simulate_chunk(seed, n, dists, containers, trans_total, defer_days):
+    """Run n trials for every port at once; returns (breakeven, savings) of shape (ports, n)."""
+    rng = np.random.default_rng(seed)
+    c = np.asarray(containers, dtype=float)[:, None]
+    t_mu, t_sigma = dists["transit"]
+    d_mu, d_sigma = dists["dwell"]
+    transit = rng.lognormal(t_mu, t_sigma, (len(c), n))
+    dwell = rng.lognormal(d_mu, d_sigma, (len(c), n))
+    yard = rng.triangular(*dists["yard"], (len(c), n))
+
+    # Late arrivals eat into the SG dwell before a fixed onward departure.
+    dwell_eff = np.maximum(0.0, dwell + np.exp(t_mu + t_sigma ** 2 / 2) - transit)
+    sg_fixed = np.asarray(trans_total, dtype=float)[:, None] / c - sg_storage_day * np.exp(d_mu + d_sigma ** 2 / 2)
+    sg_per_ctn = sg_fixed + sg_storage_day * dwell_eff
+
+    breakeven, _ = solve_breakeven(c, yard, truck_per_ctn, wharf_per_ctn, c * sg_per_ctn)
+    savings = c * sg_per_ctn - nz_cost(c, yard, truck_per_ctn, wharf_per_ctn, defer_days)
+    return breakeven.astype(np.float32), savings.astype(np.float32)
+
+
+def run(trials=1_000_000, seed=2025, workers=None, defer_days=14, dists=None):
+    """Simulate `trials` per port across a process pool; returns a per-port percentile table."""
+    dists = dists or fit_distributions()
+    sizes = [min(CHUNK, trials - s) for s in range(0, trials, CHUNK)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    totals = [trans_total[p] for p in ports]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        parts = list(pool.map(simulate_chunk, seeds, sizes, [dists] * len(sizes),
+                              [containers] * len(sizes), [totals] * len(sizes), [defer_days] * len(sizes)))
+    be = np.concatenate([p[0] for p in parts], axis=1)
+    sav = np.concatenate([p[1] for p in parts], axis=1)
+
+    rows = []
+    for i, port in enumerate(ports):
+        row = {"Port": port, "Trials": trials, "P_Crossing": float(np.isfinite(be[i]).mean()),
+               "P_Breakeven_Within_Horizon": float((be[i] <= defer_days).mean())}
+        row.update({f"Breakeven_P{q}": v for q, v in zip(PCTS, np.nanpercentile(be[i], PCTS))})
+        row.update({f"Savings_P{q}": v for q, v in zip(PCTS, np.percentile(sav[i], PCTS))})
+        rows.append(row)
+    return pd.DataFrame(rows).round(2)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Monte Carlo breakeven bands per port")
+    ap.add_argument("--trials", type=int, default=1_000_000)
+    ap.add_argument("--seed", type=int, default=2025)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--defer-days", type=float, default=14)
+    args = ap.parse_args()
+
+    print(f"🎲 Simulating {args.trials:,} breakeven trials per port...")
+    t0 = time.perf_counter()
+    instrument.stage("simulate")
+    df = run(args.trials, args.seed, args.workers, args.defer_days)
+    df.to_csv(data_dir / "breakeven_montecarlo.csv", index=False)
+    print(df.to_string(index=False))
+    print(f"✅ Saved breakeven bands to {data_dir / 'breakeven_montecarlo.csv'} ({time.perf_counter() - t0:.1f}s)")
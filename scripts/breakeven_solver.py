@@ -0,0 +1,49 @@
+﻿import numpy as np
+import pandas as pd
+
+# --- Closed-form breakeven solver ---
+# NZ deferral cost for a lane is linear in deferred days:  c * (yard * d + truck + wharf)
+# and the SG transshipment total is flat, so the crossing is exact:
+#     d* = (trans_total / c - truck - wharf) / yard
+# Every lane (origin x hub x destination, or just the three NZ ports) is solved in one
+# broadcast call; lanes where NZ is never cheaper are flagged instead of clipped.
+
+PORTS      = ["Auckland", "Tauranga", "Lyttelton"]
+CONTAINERS = [60, 70, 65]
+YARD_NZ_DAY, TRUCK_PER_CTN, WHARF_PER_CTN = 45.0, 320.0, 180.0
+TRANS_TOTAL = {"Auckland": 108000, "Tauranga": 115500, "Lyttelton": 113750}
+
+
+def default_lanes():
+    """The NZ port lanes both breakeven pages have always used."""
+    return pd.DataFrame({
+        "Port": PORTS, "Containers": CONTAINERS, "Yard_Per_Day": YARD_NZ_DAY,
+        "Truck": TRUCK_PER_CTN, "Wharf": WHARF_PER_CTN,
+        "Trans_Total": [TRANS_TOTAL[p] for p in PORTS],
+    })
+
+
+def nz_cost(containers, yard_per_day, truck, wharf, days):
+    """Total NZ deferral cost after `days` in the yard (broadcasts)."""
+    return np.asarray(containers) * (np.asarray(yard_per_day) * np.asarray(days) + truck + wharf)
+
+
+def solve_breakeven(containers, yard_per_day, truck, wharf, trans_total):
+    """Exact fractional breakeven day per lane.
+
+    Returns (breakeven_days, crossing): breakeven is NaN where the cost lines never cross
+    at a non-negative day (NZ fixed costs already exceed SG, or a zero yard rate).
+    """
+    c, yard = np.asarray(containers, dtype=float), np.asarray(yard_per_day, dtype=float)
+    margin = np.asarray(trans_total, dtype=float) / c - truck - wharf
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days = margin / yard
+    crossing = (yard > 0) & (margin >= 0)
+    return np.where(crossing, days, np.nan), crossing
+
+
+def solve_lanes(lanes):
+    """Solve a lane table (default_lanes() columns); adds Breakeven_Day and Has_Crossing."""
+    days, crossing = solve_breakeven(lanes["Containers"], lanes["Yard_Per_Day"], lanes["Truck"],
+                                     lanes["Wharf"], lanes["Trans_Total"])
+    return lanes.assign(Breakeven_Day=days, Has_Crossing=crossing)
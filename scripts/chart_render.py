@@ -0,0 +1,118 @@
+﻿import hashlib, inspect, os, struct, time
+import multiprocessing as mp
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import instrument
+
+# --- Cached, parallel chart rendering ---
+# Each chart is a ChartJob: an output PNG, a draw function from charts.py, its input data
+# and style. The job's fingerprint (data + style + draw source) is stored in the PNG's
+# own tEXt metadata, so an unchanged chart is skipped without a separate manifest.
+# Changed charts render in a process pool on the Agg canvas. Pools need the "fork" start
+# method (the scripts run at module level, which "spawn" would re-execute); elsewhere the
+# changed charts render serially.
+
+ChartJob = namedtuple("ChartJob", "path draw data style")
+FINGERPRINT_KEY = "Fingerprint"
+last_render_times = {}   # png name -> seconds, for the most recent render_all()
+
+
+def _feed(h, obj):
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        h.update(repr(getattr(obj, "columns", obj.name)).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update(f"{obj.dtype}{obj.shape}".encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        for k in sorted(obj, key=str):
+            h.update(repr(k).encode())
+            _feed(h, obj[k])
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"seq{len(obj)}".encode())
+        for item in obj:
+            _feed(h, item)
+    else:
+        h.update(repr(obj).encode())
+
+
+def fingerprint(job):
+    """Stable hash of a chart's data, style and drawing code."""
+    h = hashlib.sha256()
+    h.update(inspect.getsource(job.draw).encode())
+    _feed(h, job.data)
+    _feed(h, job.style)
+    return h.hexdigest()
+
+
+def stored_fingerprint(path):
+    """Read the fingerprint tEXt chunk from an existing PNG, or None."""
+    try:
+        with open(path, "rb") as f:
+            if f.read(8) != b"\x89PNG\r\n\x1a\n":
+                return None
+            while True:
+                head = f.read(8)
+                if len(head) < 8:
+                    return None
+                length, kind = struct.unpack(">I4s", head)
+                if kind == b"IDAT":   # metadata precedes image data
+                    return None
+                chunk = f.read(length)
+                f.seek(4, 1)
+                if kind == b"tEXt":
+                    key, _, value = chunk.partition(b"\0")
+                    if key.decode("latin-1") == FINGERPRINT_KEY:
+                        return value.decode("latin-1")
+    except OSError:
+        return None
+
+
+def _render(job, fp):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    t0 = time.perf_counter()
+    style = dict(job.style)
+    fig = Figure(figsize=style.pop("figsize", (7, 5)), dpi=style.pop("dpi", 100))
+    FigureCanvasAgg(fig)
+    job.draw(fig, job.data, **style)
+    fig.tight_layout()
+    path = Path(job.path)
+    tmp = path.with_name(f".{path.stem}.tmp.png")
+    fig.savefig(tmp, metadata={FINGERPRINT_KEY: fp})
+    os.replace(tmp, path)
+    return time.perf_counter() - t0
+
+
+def render_all(jobs, workers=None):
+    """Render only the charts whose fingerprint changed; returns {png name: 'rendered'|'cached'}."""
+    status, stale = {}, []
+    for job in jobs:
+        fp = fingerprint(job)
+        if stored_fingerprint(job.path) == fp:
+            status[Path(job.path).name] = "cached"
+        else:
+            stale.append((job, fp))
+
+    last_render_times.clear()
+    if len(stale) > 1 and "fork" in mp.get_all_start_methods():
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("fork")) as pool:
+            times = list(pool.map(_render, *zip(*stale)))
+    else:
+        times = [_render(job, fp) for job, fp in stale]
+    for (job, _), seconds in zip(stale, times):
+        status[Path(job.path).name] = "rendered"
+        last_render_times[Path(job.path).name] = round(seconds, 4)
+    instrument.charts(last_render_times)
+    return status
+
+
+def describe(status):
+    rendered = sum(v == "rendered" for v in status.values())
+    return f"{rendered} rendered, {len(status) - rendered} unchanged"
@@ -0,0 +1,160 @@
+﻿import hashlib, json, os, uuid
+
+import numpy as np
+import pandas as pd
+
+from paths import DOCS_DIR
+
+# --- Pre-aggregated, lazily loaded interactive charts ---
+# Interactive charts follow the same pattern as dashboard.table: the page only carries a
+# placeholder, and the chart's JSON under docs/data/charts/ is fetched when it scrolls
+# into view. plotly.js is served from docs/assets/, written once per plotly version, and
+# loaded by the page only when it draws its first chart. No CDN is involved.
+#
+# Point clouds with any number of points (every voyage, every container) are reduced on
+# the server side:
+# - overview.json holds per-series bins along x (mean, P10, P90, count), drawn as WebGL
+#   lines.
+# - The x range is also cut into TILES equal tiles. Each tile file holds that range's
+#   points, evenly downsampled to TILE_POINTS per series.
+# Once the view is zoomed in to DETAIL_TILES tiles or fewer, the page fetches those tiles
+# and draws their points with scattergl. A file is rewritten only when its content
+# changes, and each URL carries a content version, so browsers cache everything else.
+
+CHART_DIR = DOCS_DIR / "data" / "charts"
+ASSET_DIR = DOCS_DIR / "assets"
+OVERVIEW_BINS = 240
+TILES = 24
+TILE_POINTS = 20_000
+DETAIL_TILES = 4
+
+
+def _version(text):
+    return hashlib.sha256(text.encode()).hexdigest()[:10]
+
+
+def _write(path, text):
+    """Atomically write `text` unless the file already holds it; returns True if written."""
+    try:
+        if path.read_text(encoding="utf-8") == text:
+            return False
+    except FileNotFoundError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+    return True
+
+
+def _rel(path):
+    """URL of a docs/ file relative to the dashboard page (the plain path for files elsewhere)."""
+    try:
+        return path.relative_to(DOCS_DIR).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+
+def plotly_path(root=ASSET_DIR):
+    """Where the bundle for the installed plotly version lives (list it in write_section outputs)."""
+    import plotly
+    return root / f"plotly-{plotly.__version__}.min.js"
+
+
+def plotly_js(root=ASSET_DIR):
+    """Path (relative to docs/) of the bundled plotly.js; written once per plotly version, older bundles removed."""
+    path = plotly_path(root)
+    if not path.exists():
+        from plotly.offline import get_plotlyjs
+        _write(path, get_plotlyjs())
+        for old in root.glob("plotly-*.min.js"):
+            if old != path:
+                old.unlink(missing_ok=True)
+    return _rel(path)
+
+
+def _placeholder(path, text, label, height):
+    return (f"<div class='lazy-chart' data-src='{_rel(path)}?v={_version(text)}' data-plotly='{plotly_js()}' "
+            f"style='height:{height}px;'>{label} — loading…</div>")
+
+
+def figure(fig, name, height=480, root=CHART_DIR):
+    """A (small) plotly figure as data/charts/<name>.json, drawn when scrolled to."""
+    text = fig.to_json()
+    path = root / f"{name}.json"
+    _write(path, text)
+    return _placeholder(path, text, "📈 Chart", height)
+
+
+def _numeric_x(values):
+    """(float x, is_time): datetimes become epoch milliseconds, which plotly date axes accept."""
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        ms = values.astype("datetime64[ms]")
+        return np.where(np.isnat(ms), np.nan, ms.astype(np.int64).astype(float)), True
+    return values.astype(float), False
+
+
+def _bins(x, lo, hi, n):
+    return np.minimum(((x - lo) / ((hi - lo) or 1.0) * n).astype(np.int64), n - 1)
+
+
+def scatter(frame, name, x, y, by=None, text=None, title="", x_title="", y_title="", height=480, root=CHART_DIR):
+    """Point cloud of frame[x] vs frame[y] (one series per `by` value) as a binned overview plus point tiles."""
+    xs, is_time = _numeric_x(frame[x].to_numpy())
+    ys = frame[y].to_numpy(dtype=float)
+    keep = np.isfinite(xs) & np.isfinite(ys)
+    order = np.argsort(xs[keep], kind="stable")
+    xs, ys = xs[keep][order], ys[keep][order]
+    codes, names = pd.factorize(frame[by].astype(str) if by else pd.Series(y, index=frame.index), sort=True)
+    groups = codes[keep][order]
+    labels = frame[text].to_numpy()[keep][order] if text else None
+    out, written = root / name, set()
+    lo, hi = (xs[0], xs[-1]) if len(xs) else (0.0, 1.0)
+    bins, tiles = _bins(xs, lo, hi, OVERVIEW_BINS), _bins(xs, lo, hi, TILES)
+    width = ((hi - lo) or 1.0) / TILES
+
+    series = []
+    for g, label in enumerate(names):
+        m = groups == g
+        if not m.any():
+            continue
+        stats = pd.DataFrame({"b": bins[m], "y": ys[m]}).groupby("b")["y"]
+        agg = pd.DataFrame({"mean": stats.mean(), "p10": stats.quantile(0.1), "p90": stats.quantile(0.9),
+                            "n": stats.size()})
+        centers = lo + (agg.index.to_numpy() + 0.5) * ((hi - lo) or 1.0) / OVERVIEW_BINS
+        centers = np.round(centers).astype(np.int64) if is_time else np.round(centers, 4)
+        series.append({"name": str(label), "x": centers.tolist(),
+                       "y": agg["mean"].round(3).tolist(), "p10": agg["p10"].round(3).tolist(),
+                       "p90": agg["p90"].round(3).tolist(), "n": agg["n"].tolist()})
+
+    index = []
+    bounds = np.searchsorted(tiles, np.arange(TILES + 1))
+    for t in range(TILES):
+        a, b = bounds[t], bounds[t + 1]
+        if a == b:
+            continue
+        payload = {}
+        for g in np.unique(groups[a:b]):
+            idx = a + np.flatnonzero(groups[a:b] == g)
+            if len(idx) > TILE_POINTS:
+                idx = idx[np.linspace(0, len(idx) - 1, TILE_POINTS).astype(np.int64)]
+            px = xs[idx].astype(np.int64) if is_time else np.round(xs[idx], 4)
+            payload[str(names[g])] = {"x": px.tolist(), "y": np.round(ys[idx], 3).tolist(),
+                                      "text": labels[idx].astype(str).tolist() if labels is not None else []}
+        body = json.dumps({"series": payload}, separators=(",", ":"))
+        file = f"tile-{t:03d}.json"
+        _write(out / file, body)
+        written.add(file)
+        index.append({"x0": lo + t * width, "x1": lo + (t + 1) * width, "n": int(b - a),
+                      "file": f"{file}?v={_version(body)}"})
+
+    spec = json.dumps({"title": title, "x_title": x_title, "y_title": y_title, "time": is_time,
+                       "points": int(len(xs)), "detail_tiles": DETAIL_TILES, "series": series, "tiles": index},
+                      separators=(",", ":"))
+    _write(out / "overview.json", spec)
+    written.add("overview.json")
+    for stale in out.glob("*.json"):
+        if stale.name not in written:
+            stale.unlink(missing_ok=True)
+    return _placeholder(out / "overview.json", spec, f"📈 {len(xs):,} points", height)
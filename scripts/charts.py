@@ -0,0 +1,59 @@
+﻿import numpy as np
+
+# --- Chart drawing functions for chart_render ---
+# Each takes (fig, data, **style) and draws on a fresh matplotlib Figure; they must stay
+# importable top-level functions so worker processes can run them.
+
+
+def breakeven_curve(fig, data, title):
+    """NZ deferral cost line vs the flat SG transshipment total, with the crossing marked."""
+    ax = fig.add_subplot()
+    days, nz_costs, t_cost, be = data["days"], data["nz_costs"], data["sg_total"], data["breakeven"]
+    ax.plot(days, nz_costs, linewidth=3, label="NZ Deferred Storage (total)")
+    ax.axhline(y=t_cost, linestyle="--", linewidth=2, label="SG Transshipment (total)")
+
+    cheaper_mask = nz_costs < t_cost
+    if cheaper_mask.any():
+        ax.fill_between(days, nz_costs, t_cost, where=cheaper_mask, alpha=0.18)
+
+    if np.isfinite(be):
+        ax.axvline(be, linestyle=":", linewidth=2)
+        ax.scatter([be], [t_cost], s=60)
+        ax.annotate(f"Breakeven ≈ {be:.1f} day(s)",
+                    xy=(be, t_cost),
+                    xytext=(be+0.5, t_cost*1.03),
+                    arrowprops=dict(arrowstyle="->", lw=1))
+
+    ax.set_title(title, fontsize=13, pad=12)
+    ax.set_xlabel("Deferred days in NZ yard", fontsize=11)
+    ax.set_ylabel("Total cost (NZD)", fontsize=11)
+    ax.grid(True, linestyle="--", alpha=0.35)
+    ax.legend(loc="best", frameon=False)
+
+
+def bar(fig, data, title, ylabel, value_labels=None, grid=False):
+    """Simple category bar chart; `value_labels` are printed above each bar."""
+    ax = fig.add_subplot()
+    ax.bar(data["labels"], data["values"])
+    for i, (v, text) in enumerate(zip(data["values"], value_labels or [])):
+        ax.text(i, v + 0.15, text, ha="center", va="bottom")
+    if grid:
+        ax.set_title(title, fontsize=13, pad=10)
+        ax.set_ylabel(ylabel, fontsize=11)
+        ax.grid(axis="y", linestyle="--", alpha=0.35)
+    else:
+        ax.set_title(title)
+        ax.set_ylabel(ylabel)
+
+
+def heatmap(fig, data, title, xlabel, ylabel, cbar_label, cmap="RdYlGn"):
+    """Pivot-table heatmap (rows = y axis, columns = x axis)."""
+    ax = fig.add_subplot()
+    values, rows, cols = data["values"], data["rows"], data["cols"]
+    im = ax.imshow(values, cmap=cmap, origin="lower", aspect="auto")
+    fig.colorbar(im, ax=ax, label=cbar_label)
+    ax.set_xticks(range(len(cols)), cols)
+    ax.set_yticks(range(len(rows)), rows)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
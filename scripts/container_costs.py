@@ -0,0 +1,146 @@
+﻿import numpy as np
+import pandas as pd
+
+from paths import DATA_DIR
+
+# --- Container-level cost model ---
+# Per-port costing used one flat per-container figure times a container count. Here every
+# container is one 14-byte record of a NumPy structured array (categorical port and yard
+# codes, box size, reefer flag, SG dwell and planned NZ deferral as float32, and the day it
+# is ready to sail), so millions fit in tens of MB. Handling, SG storage, NZ yard storage
+# and the deferred-departure total are evaluated for all containers in one vectorized pass
+# (chunked to bound temporaries) and reduced to per-port totals with bincount.
+
+PORTS = ["NZAKL", "NZTRG", "NZLYT"]
+PORT_NAMES = {"NZAKL": "Auckland", "NZTRG": "Tauranga", "NZLYT": "Lyttelton"}
+# NZ yards a container can wait in before departure: (port, yard, NZD/day/TEU)
+YARDS = [("NZAKL", "Wharf", 15.0), ("NZAKL", "Inland", 11.0),
+         ("NZTRG", "Wharf", 15.0), ("NZTRG", "Inland", 10.0),
+         ("NZLYT", "Wharf", 15.0), ("NZLYT", "Inland", 12.0)]
+YARD_RATES = np.array([rate for _, _, rate in YARDS])
+
+CONTAINER = np.dtype([("port", "u1"), ("yard", "u1"), ("size_ft", "u1"), ("reefer", "?"),
+                      ("sg_dwell_days", "f4"), ("defer_days", "f4"), ("ready_day", "u2")])
+TARIFF = {
+    "handling": 380.0,          # SG handling + THC + admin NZD per 20 ft box
+    "box_factor_40": 1.5,       # 40 ft boxes pay this multiple of per-box charges
+    "sg_rate": 30.0,            # SG storage NZD/day/TEU
+    "reefer_sg_day": 45.0,      # SG reefer plug-in NZD/day
+    "reefer_nz_day": 35.0,      # NZ reefer plug-in NZD/day
+    "delay_to_sg_ratio": 0.8,   # SG dwell days saved per NZ deferral day
+    "min_sg_days": 1.0,
+}
+MANIFEST_PATH = DATA_DIR / "containers.csv"
+CHUNK = 1 << 20
+
+
+def empty(n):
+    return np.zeros(n, dtype=CONTAINER)
+
+
+def yard_codes(ports, yards):
+    """Yard index (into YARDS) for port codes + yard names; unknown yards fall back to the port's first."""
+    lookup = {(p, y): i for i, (p, y, _) in enumerate(YARDS)}
+    first = {p: i for i, (p, _, _) in reversed(list(enumerate(YARDS)))}
+    return np.array([lookup.get((p, y), first[p]) for p, y in zip(ports, yards)], dtype="u1")
+
+
+def from_frame(df):
+    """Structured array from a manifest frame (Port, Yard, Size_ft, Reefer, SG_Dwell_Days[, Defer_Days, Ready_Day])."""
+    ports = pd.Categorical(df["Port"], categories=PORTS)
+    if (ports.codes < 0).any():
+        raise ValueError(f"Unknown port codes: {sorted(set(df['Port'][ports.codes < 0]))}")
+    out = empty(len(df))
+    out["port"] = ports.codes
+    pairs = df[["Port", "Yard"]].astype(str).drop_duplicates()
+    codes = dict(zip(zip(pairs["Port"], pairs["Yard"]), yard_codes(pairs["Port"], pairs["Yard"])))
+    out["yard"] = [codes[k] for k in zip(df["Port"].astype(str), df["Yard"].astype(str))]
+    out["size_ft"] = df["Size_ft"]
+    out["reefer"] = df["Reefer"].astype(bool)
+    out["sg_dwell_days"] = df["SG_Dwell_Days"]
+    if "Defer_Days" in df.columns:
+        out["defer_days"] = df["Defer_Days"].fillna(0)
+    if "Ready_Day" in df.columns:
+        out["ready_day"] = df["Ready_Day"].fillna(0)
+    return out
+
+
+def to_frame(ctn):
+    return pd.DataFrame({"Port": pd.Categorical.from_codes(ctn["port"], PORTS),
+                         "Yard": [YARDS[i][1] for i in ctn["yard"]], "Size_ft": ctn["size_ft"],
+                         "Reefer": ctn["reefer"], "SG_Dwell_Days": ctn["sg_dwell_days"],
+                         "Defer_Days": ctn["defer_days"], "Ready_Day": ctn["ready_day"]})
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Container manifest from data/containers.csv, or None when there is none."""
+    try:
+        df = pd.read_csv(path, encoding="utf-8-sig", dtype={"Port": "category", "Yard": "category"})
+    except FileNotFoundError:
+        return None
+    return from_frame(df)
+
+
+def _terms(ctn, t):
+    """Per-container cost terms that don't depend on the deferral."""
+    teu = ctn["size_ft"] / np.float32(20)
+    box = np.where(ctn["size_ft"] == 40, np.float32(t["box_factor_40"]), np.float32(1))
+    reefer = ctn["reefer"]
+    return {"teu": teu, "handling": t["handling"] * box, "dwell": ctn["sg_dwell_days"],
+            "sg_day": t["sg_rate"] * teu + reefer * np.float32(t["reefer_sg_day"]),
+            "nz_day": YARD_RATES.astype("f4")[ctn["yard"]] * teu + reefer * np.float32(t["reefer_nz_day"])}
+
+
+def _sg_days(terms, defer, t):
+    """SG dwell left after `defer` days in NZ (never below min_sg_days, never above the dwell)."""
+    dwell = terms["dwell"]
+    return np.minimum(dwell, np.maximum(t["min_sg_days"], dwell - defer * np.float32(t["delay_to_sg_ratio"])))
+
+
+def _deferred(terms, defer, t):
+    return terms["handling"] + terms["sg_day"] * _sg_days(terms, defer, t) + terms["nz_day"] * defer
+
+
+def port_totals(ctn, defer_days=None, tariff=TARIFF, chunk=CHUNK):
+    """Per-port totals of handling, storage and current vs deferred cost in one chunked pass.
+
+    `defer_days` overrides every container's planned deferral (a scalar scenario);
+    None uses the manifest's own Defer_Days.
+    """
+    t = {**TARIFF, **tariff}
+    n_ports = len(PORTS)
+    sums = {k: np.zeros(n_ports) for k in ("teu", "handling", "sg_storage", "current", "deferred")}
+    counts, reefers = np.zeros(n_ports, dtype=np.int64), np.zeros(n_ports, dtype=np.int64)
+    for lo in range(0, len(ctn), chunk):
+        part = ctn[lo:lo + chunk]
+        port, terms = part["port"], _terms(part, t)
+        sg_storage = terms["sg_day"] * terms["dwell"]
+        values = {"teu": terms["teu"], "handling": terms["handling"], "sg_storage": sg_storage,
+                  "current": terms["handling"] + sg_storage,
+                  "deferred": _deferred(terms, part["defer_days"] if defer_days is None else np.float32(defer_days), t)}
+        for key, v in values.items():
+            sums[key] += np.bincount(port, weights=v, minlength=n_ports)
+        counts += np.bincount(port, minlength=n_ports)
+        reefers += np.bincount(port, weights=part["reefer"], minlength=n_ports).astype(np.int64)
+    return pd.DataFrame({
+        "Port_Code": PORTS, "Port": [PORT_NAMES[p] for p in PORTS], "Containers": counts,
+        "TEU": sums["teu"], "Reefers": reefers, "Handling_NZD": sums["handling"],
+        "SG_Storage_NZD": sums["sg_storage"], "Current_Cost_NZD": sums["current"],
+        "Deferred_Cost_NZD": sums["deferred"]})
+
+
+def deferral_curve(ctn, delays, tariff=TARIFF, chunk=CHUNK):
+    """Fleet TEU, current and deferred cost, and mean SG dwell left, with every container held `d` days in NZ."""
+    t = {**TARIFF, **tariff}
+    delays = np.asarray(delays)
+    teu, current = 0.0, 0.0
+    deferred, sg_days = np.zeros(len(delays)), np.zeros(len(delays))
+    for lo in range(0, len(ctn), chunk):
+        terms = _terms(ctn[lo:lo + chunk], t)
+        teu += float(terms["teu"].sum(dtype=np.float64))
+        current += float((terms["handling"] + terms["sg_day"] * terms["dwell"]).sum(dtype=np.float64))
+        for i, d in enumerate(delays):
+            deferred[i] += _deferred(terms, np.float32(d), t).sum(dtype=np.float64)
+            sg_days[i] += _sg_days(terms, np.float32(d), t).sum(dtype=np.float64)
+    return pd.DataFrame({"Delay_Days": delays, "TEU": teu, "Current_Cost_NZD": current, "Deferred_Cost_NZD": deferred,
+                         "SG_Days": sg_days / max(len(ctn), 1)})
@@ -0,0 +1,210 @@
+﻿import hashlib, inspect, json, os, uuid
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from paths import DOCS_DIR
+import instrument
+
+# --- Section-level dashboard assembler ---
+# Each analysis writes its part of docs/index.html as a fragment under docs/fragments,
+# stamped with a fingerprint of the data and renderer behind it; a fragment is only
+# re-rendered when that fingerprint changes. Tables longer than INLINE_ROWS go to
+# docs/data/tables/<name>.json and are fetched when scrolled into view, so page weight
+# stays flat as they grow; interactive charts load the same way (chart_tiles.py).
+# `python dashboard.py` stitches the fragments into index.html, atomically and only when
+# the page actually changes.
+
+FRAGMENT_DIR = DOCS_DIR / "fragments"
+TABLE_DIR = DOCS_DIR / "data" / "tables"
+INLINE_ROWS = 25
+SECTIONS = [  # page order: (fragment, heading)
+    ("summary", "📘 NZ ➜ Singapore Transshipment Summary"),
+    ("baseline", "1️⃣ Cost, Delay & Sensitivity Analysis"),
+    ("scenarios", "⏳ Deferred Departure Scenarios"),
+    ("deferral", "🗓️ Per-Container Deferral Plan"),
+    ("dwell", "2️⃣ Real Vessel Dwell Time"),
+    ("routing", "🛳️ Hub Routing: Cheapest vs Fastest"),
+    ("local_storage", "3️⃣ Local NZ Deferred Departure"),
+    ("breakeven", "4️⃣ Breakeven Curve"),
+    ("eta", "🧭 ETA Delay Impact (NZ ➜ SG ➜ JP)"),
+    ("live", "📡 Live ETA Statistics"),
+]
+
+STYLE = """<style>body{font-family:Arial;background:#f9fafc;margin:0;}
+section{margin:40px auto;width:90%;background:white;padding:30px;border-radius:12px;
+box-shadow:0 0 8px rgba(0,0,0,0.1);}h1,h2{text-align:center;}
+section#summary{background:#e8f3ff;border-left:6px solid #0078d7;}
+hr{margin:40px 0;border:0;border-top:2px solid #eee;}
+table{border-collapse:collapse;margin:0 auto;}th,td{border:1px solid #ddd;padding:6px;text-align:center;}
+th{background:#f0f3f8;}.lazy-table{max-height:480px;overflow:auto;text-align:center;color:gray;}
+.lazy-chart{width:100%;text-align:center;color:gray;}
+a{color:#0078d7;text-decoration:none;}a:hover{text-decoration:underline;}
+footer{text-align:center;margin:30px;color:gray;font-size:14px;}
+</style>"""
+
+# Fetches each external table the first time it nears the viewport
+LOADER = """<script>
+const esc = v => String(v ?? "").replace(/[&<>]/g, c => ({"&": "&amp;", "<": "&lt;", ">": "&gt;"}[c]));
+const lazyTables = new IntersectionObserver(entries => entries.forEach(e => {
+  if (!e.isIntersecting) return;
+  lazyTables.unobserve(e.target);
+  fetch(e.target.dataset.src).then(r => r.json()).then(t => {
+    const head = "<tr>" + t.columns.map(c => `<th>${esc(c)}</th>`).join("") + "</tr>";
+    const rows = t.data.map(r => "<tr>" + r.map(v => `<td>${esc(v)}</td>`).join("") + "</tr>").join("");
+    e.target.innerHTML = `<table class="dataframe">${head}${rows}</table>`;
+  }).catch(() => { e.target.textContent = "⚠️ Could not load table."; });
+}), {rootMargin: "300px"});
+document.querySelectorAll(".lazy-table").forEach(el => lazyTables.observe(el));
+
+// Charts (chart_tiles.py): plotly.js is loaded on first use; point clouds start from the
+// binned overview and fetch point tiles once zoomed in to a few of them
+const scripts = {};
+const loadScript = src => scripts[src] ??= new Promise((ok, fail) =>
+  document.head.appendChild(Object.assign(document.createElement("script"), {src, onload: ok, onerror: fail})));
+const ms = v => typeof v === "number" ? v : Date.parse(String(v).replace(" ", "T") + "Z");
+async function drawChart(el) {
+  const [spec] = await Promise.all([fetch(el.dataset.src).then(r => r.json()), loadScript(el.dataset.plotly)]);
+  el.textContent = "";
+  if (!spec.tiles) return Plotly.newPlot(el, spec.data, spec.layout, {responsive: true});
+  const traces = spec.series.flatMap(s => [
+    {type: "scattergl", mode: "lines", name: `${s.name} (binned mean)`, legendgroup: s.name, x: s.x, y: s.y,
+     customdata: s.n.map((n, i) => [n, s.p10[i], s.p90[i]]),
+     hovertemplate: "%{y:.2f} (P10 %{customdata[1]:.2f} – P90 %{customdata[2]:.2f}, n=%{customdata[0]})"},
+    {type: "scattergl", mode: "markers", name: s.name, legendgroup: s.name, x: [], y: [], text: [],
+     marker: {size: 4, opacity: 0.45}}]);
+  await Plotly.newPlot(el, traces, {
+    title: {text: spec.title}, hovermode: "closest", legend: {orientation: "h"},
+    xaxis: {title: {text: spec.x_title}, type: spec.time ? "date" : "linear"}, yaxis: {title: {text: spec.y_title}},
+  }, {responsive: true});
+  const dir = el.dataset.src.slice(0, el.dataset.src.lastIndexOf("/") + 1), tiles = new Map();
+  const tile = t => tiles.get(t.file) ?? tiles.set(t.file, fetch(dir + t.file).then(r => r.json())).get(t.file);
+  const detail = async () => {
+    const [x0, x1] = el.layout.xaxis.range.map(ms);
+    const visible = spec.tiles.filter(t => t.x1 >= x0 && t.x0 <= x1);
+    const shown = visible.length <= spec.detail_tiles ? await Promise.all(visible.map(tile)) : [];
+    const part = (s, k) => shown.flatMap(t => t.series[s.name]?.[k] ?? []);
+    Plotly.restyle(el, {x: spec.series.map(s => part(s, "x")), y: spec.series.map(s => part(s, "y")),
+                        text: spec.series.map(s => part(s, "text"))}, spec.series.map((_, i) => 2 * i + 1));
+  };
+  el.on("plotly_relayout", detail);
+  detail();
+}
+const lazyCharts = new IntersectionObserver(entries => entries.forEach(e => {
+  if (!e.isIntersecting) return;
+  lazyCharts.unobserve(e.target);
+  drawChart(e.target).catch(() => { e.target.textContent = "⚠️ Could not load chart."; });
+}), {rootMargin: "300px"});
+document.querySelectorAll(".lazy-chart").forEach(el => lazyCharts.observe(el));
+</script>"""
+
+
+def _atomic_write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _feed(h, value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        frame = value.to_frame() if isinstance(value, pd.Series) else value
+        h.update(json.dumps([[str(c), str(t)] for c, t in frame.dtypes.items()]).encode())
+        h.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        h.update(f"{value.dtype}{value.shape}".encode() + np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        for k in sorted(value):
+            h.update(str(k).encode())
+            _feed(h, value[k])
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            _feed(h, v)
+    else:
+        h.update(json.dumps(value, default=str).encode())
+
+
+def fingerprint(render, data):
+    h = hashlib.sha256()
+    try:
+        h.update(inspect.getsource(render).encode())
+    except (OSError, TypeError):
+        h.update(render.__code__.co_code)
+    _feed(h, data)
+    return h.hexdigest()[:16]
+
+
+def _header(path):
+    """The key=value stamp on a fragment's first line ({} if missing/unreadable)."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            line = f.readline()
+    except OSError:
+        return {}
+    if not line.startswith("<!-- fragment "):
+        return {}
+    fields = line[len("<!-- fragment "):].rstrip().removesuffix("-->").strip()
+    return dict(kv.split("=", 1) for kv in fields.split(";") if "=" in kv)
+
+
+def write_section(name, render, data, outputs=(), root=FRAGMENT_DIR):
+    """Write fragment `name` as render(data) unless the stored one came from the same data and code.
+
+    `outputs` are extra files render() writes (e.g. an embedded chart); a missing one forces a re-render.
+    """
+    path = root / f"{name}.html"
+    fp = fingerprint(render, data)
+    if _header(path).get("fp") == fp and all(os.path.exists(o) for o in outputs):
+        print(f"🧩 Dashboard section {name}: unchanged")
+        return False
+    stamp = datetime.now().strftime("%Y-%m-%d %H:%M")
+    _atomic_write(path, f"<!-- fragment fp={fp};updated={stamp} -->\n{render(data).strip()}\n")
+    print(f"🧩 Dashboard section {name}: rendered")
+    return True
+
+
+def table(df, name, inline_rows=INLINE_ROWS, root=TABLE_DIR):
+    """Small tables inline; larger ones as data/tables/<name>.json, loaded when scrolled to."""
+    if len(df) <= inline_rows:
+        return df.to_html(index=False)
+    payload = df.to_json(orient="split", index=False, date_format="iso")
+    _atomic_write(root / f"{name}.json", payload)
+    version = hashlib.sha256(payload.encode()).hexdigest()[:10]
+    src = f"{root.relative_to(DOCS_DIR).as_posix()}/{name}.json?v={version}"
+    return f"<div class='lazy-table' data-src='{src}'>{len(df):,} rows — loading…</div>"
+
+
+def build(dest=None, root=FRAGMENT_DIR):
+    """Assemble index.html from the fragments in SECTIONS order; returns True if the page changed."""
+    dest = dest or DOCS_DIR / "index.html"
+    parts, stamps = [], []
+    for name, heading in SECTIONS:
+        path = root / f"{name}.html"
+        if not path.exists():
+            continue
+        stamps.append(_header(path).get("updated", ""))
+        body = path.read_text(encoding="utf-8").partition("\n")[2]
+        parts.append(f"<section id='{name}'><h2>{heading}</h2>\n{body}</section>")
+    updated = max(stamps, default="")
+    page = "\n".join([
+        "<html><head><meta charset='utf-8'><title>NZ ➜ Singapore Transshipment Dashboard</title>",
+        STYLE + "</head><body>",
+        "<h1>🚢 NZ ➜ Singapore Transshipment Intelligence Dashboard</h1>",
+        f"<p style='text-align:center;'>Updated: {updated}</p>",
+        "\n<hr>\n".join(parts),
+        "<footer>Built automatically using PortConnect (NZ), OpenFreightData & Singapore Port Data"
+        f" • {updated[:4]}<br><a href='summary.html'>📘 Read Full Summary</a></footer>",
+        LOADER,
+        "</body></html>",
+    ]) + "\n"
+    if dest.exists() and dest.read_text(encoding="utf-8") == page:
+        return False
+    _atomic_write(dest, page)
+    return True
+
+
+if __name__ == "__main__":
+    instrument.stage("html")
+    changed = build()
+    index = DOCS_DIR / "index.html"
+    print(f"🌍 Dashboard {'rebuilt' if changed else 'unchanged'}: {index} ({index.stat().st_size / 1024:.1f} KB)")
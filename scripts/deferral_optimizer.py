@@ -0,0 +1,238 @@
+﻿import argparse, datetime, time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.optimize import linprog
+
+import container_costs
+import dashboard
+import instrument
+from breakeven_solver import CONTAINERS
+from paths import DATA_DIR
+
+# --- Capacity-constrained container deferral optimizer ---
+# analyze_transit picks one fleet-wide NZ delay from a handful of scenarios. Here every
+# container gets its own hold time: held d days in its NZ yard after it is ready, it sails,
+# reaches Singapore after the port's transit time and waits for the next onward departure
+# (the inferred dwell pairs, repeated on a weekly service cycle). Cost per container is
+# NZ yard days at its yard's rate plus SG wait days at the SG rate (reefer plugs on both,
+# per TEU for 40 ft boxes), using the container_costs tariff.
+#
+# Containers with the same port, yard, size, reefer flag and ready day are interchangeable,
+# so the LP runs over (class x deferral day) counts with one equality row per class and a
+# TEU capacity row per yard and day (HiGHS via scipy). The fractional solution is floored
+# and the remainder placed greedily on the cheapest deferral that still fits, so yard
+# capacity is never exceeded; the gap to the LP bound is reported.
+
+NZ_SG_TRANSIT_DAYS = {"NZAKL": 12.3, "NZTRG": 11.8, "NZLYT": 13.5}   # analyze_transit reference ETAs
+YARD_CAPACITY_TEU = {"Wharf": 40.0, "Inland": 80.0}                   # TEU held per yard per day
+SERVICE_CYCLE_DAYS = 7
+MIN_CONNECTION_DAYS = 1.0
+MAX_DEFER_DAYS = 14
+PLAN_PATH = DATA_DIR / "deferral_plan.npy"
+SUMMARY_PATH = DATA_DIR / "deferral_summary.csv"
+SCHEDULE_PATH = DATA_DIR / "deferral_schedule.csv"
+
+
+def sg_departure_days(dates, start, span, cycle=SERVICE_CYCLE_DAYS):
+    """Onward SG departure days (from `start`) covering [0, span]: each known departure repeated every `cycle` days."""
+    known = np.unique([(pd.Timestamp(d) - pd.Timestamp(start)).days for d in dates])
+    if not len(known):
+        known = np.array([0])
+    phases = np.unique(known % cycle)
+    days = (phases[None, :] + cycle * np.arange(span // cycle + 2)[:, None]).ravel()
+    return np.sort(days[days <= span + cycle])
+
+
+def capacities(capacity=None):
+    """TEU capacity per YARDS entry: a {yard name: TEU} mapping, an array, or a scale on the defaults."""
+    if capacity is None or np.isscalar(capacity):
+        scale = 1.0 if capacity is None else float(capacity)
+        return np.array([YARD_CAPACITY_TEU[y] * scale for _, y, _ in container_costs.YARDS])
+    if isinstance(capacity, dict):
+        return np.array([capacity.get(y, YARD_CAPACITY_TEU[y]) for _, y, _ in container_costs.YARDS], dtype=float)
+    return np.asarray(capacity, dtype=float)
+
+
+def classes(ctn):
+    """Interchangeable container classes: (class fields, inverse index, counts)."""
+    key = ctn[["port", "yard", "size_ft", "reefer", "ready_day"]]
+    fields, inverse, counts = np.unique(key, return_inverse=True, return_counts=True)
+    return fields, inverse.ravel(), counts
+
+
+def class_costs(fields, departures, max_defer=MAX_DEFER_DAYS, tariff=container_costs.TARIFF,
+                transit=NZ_SG_TRANSIT_DAYS, min_connection=MIN_CONNECTION_DAYS):
+    """(K, max_defer+1) cost per container of class k held d days, plus its SG wait days."""
+    t = {**container_costs.TARIFF, **tariff}
+    teu = fields["size_ft"] / 20.0
+    reefer = fields["reefer"].astype(float)
+    sg_day = t["sg_rate"] * teu + reefer * t["reefer_sg_day"]
+    nz_day = container_costs.YARD_RATES[fields["yard"]] * teu + reefer * t["reefer_nz_day"]
+    handling = t["handling"] * np.where(fields["size_ft"] == 40, t["box_factor_40"], 1.0)
+    transit_days = np.array([transit[p] for p in container_costs.PORTS])[fields["port"]]
+    d = np.arange(max_defer + 1)
+    arrive = fields["ready_day"][:, None] + d[None, :] + transit_days[:, None]
+    idx = np.searchsorted(departures, arrive + min_connection)
+    wait = np.where(idx < len(departures), departures[np.minimum(idx, len(departures) - 1)] - arrive, np.inf)
+    return handling[:, None] + nz_day[:, None] * d + sg_day[:, None] * wait, wait
+
+
+def _capacity_rows(fields, max_defer, n_days):
+    """Sparse (yard x day, class x deferral) TEU occupancy: a class held d days fills its yard on days ready..ready+d-1."""
+    K, D = len(fields), max_defer + 1
+    teu = fields["size_ft"] / 20.0
+    k, d = np.divmod(np.arange(K * D), D)
+    span = d                                            # days in the yard
+    rows_k, rows_off = np.repeat(k, span), np.arange(span.sum()) - np.repeat(np.cumsum(span) - span, span)
+    day = fields["ready_day"][rows_k] + rows_off
+    row = fields["yard"][rows_k].astype(np.int64) * n_days + day
+    col = np.repeat(np.arange(K * D), span)
+    return sparse.csr_matrix((teu[rows_k], (row, col)), shape=(len(container_costs.YARDS) * n_days, K * D))
+
+
+def optimize(ctn, departures, capacity=None, max_defer=MAX_DEFER_DAYS, tariff=container_costs.TARIFF,
+             transit=NZ_SG_TRANSIT_DAYS):
+    """Assign every container a deferral minimising NZ yard + SG wait cost under yard TEU capacity.
+
+    Returns (defer_days per container, cost per container at its deferral, cost with no
+    deferral, {lp_cost, cost, classes, seconds}).
+    """
+    t0 = time.perf_counter()
+    fields, inverse, counts = classes(ctn)
+    cost, _ = class_costs(fields, departures, max_defer, tariff, transit)
+    K, D = cost.shape
+    n_days = int(fields["ready_day"].max()) + D
+    cap = np.repeat(capacities(capacity), n_days)
+    feasible = np.isfinite(cost)
+    A_ub = _capacity_rows(fields, max_defer, n_days)
+    A_eq = sparse.csr_matrix((np.ones(K * D), (np.repeat(np.arange(K), D), np.arange(K * D))), shape=(K, K * D))
+    bounds = np.column_stack([np.zeros(K * D), np.where(feasible.ravel(), np.inf, 0.0)])
+    c = np.where(feasible, cost, 0.0).ravel()
+    res = linprog(c, A_ub=A_ub, b_ub=cap, A_eq=A_eq, b_eq=counts, bounds=bounds, method="highs")
+    if res.status != 0:
+        raise RuntimeError(f"deferral LP failed: {res.message}")
+
+    # Floor, then place the leftover containers of each class on its cheapest deferral that still fits
+    x = np.floor(res.x.reshape(K, D) + 1e-6).astype(np.int64)
+    residual = cap - A_ub @ x.ravel()
+    A_csc = A_ub.tocsc()
+    for k in np.flatnonzero(counts - x.sum(axis=1) > 0):
+        left = counts[k] - x[k].sum()
+        teu = fields["size_ft"][k] / 20.0
+        for d in np.argsort(cost[k], kind="stable"):
+            if not feasible[k, d]:
+                continue
+            col = A_csc[:, k * D + d]
+            fits = left if col.nnz == 0 else int(np.floor(residual[col.indices].min() / teu + 1e-9))
+            take = min(left, max(fits, 0))
+            if take:
+                x[k, d] += take
+                residual[col.indices] -= take * teu
+                left -= take
+            if not left:
+                break
+        if left:   # no deferral fits: sail when ready (holds no yard space)
+            x[k, 0] += left
+
+    # Containers sorted by class receive their class's deferrals in order
+    order = np.argsort(inverse, kind="stable")
+    defer = np.empty(len(ctn), dtype=np.float32)
+    defer[order] = np.repeat(np.tile(np.arange(D), K), x.ravel())
+    chosen = cost[inverse, defer.astype(np.int64)]
+    info = {"lp_cost": float(res.fun), "cost": float((x * np.where(feasible, cost, 0.0)).sum()),
+            "classes": K, "seconds": time.perf_counter() - t0}
+    return defer, chosen, cost[inverse, 0], info
+
+
+def summarize(ctn, defer, chosen, baseline, capacity=None, start=None):
+    """Per-port savings and the per-port, per-day NZ departure / yard occupancy schedule."""
+    n_ports = len(container_costs.PORTS)
+    port, teu = ctn["port"], ctn["size_ft"] / 20.0
+    count = np.bincount(port, minlength=n_ports)
+    summary = pd.DataFrame({
+        "Port": [container_costs.PORT_NAMES[p] for p in container_costs.PORTS],
+        "Containers": count,
+        "Deferred": np.bincount(port, weights=defer > 0, minlength=n_ports).astype(int),
+        "Avg_Defer_Days": np.bincount(port, weights=defer, minlength=n_ports) / np.maximum(count, 1),
+        "Baseline_Cost_NZD": np.bincount(port, weights=baseline, minlength=n_ports),
+        "Optimized_Cost_NZD": np.bincount(port, weights=chosen, minlength=n_ports)})
+    summary["Savings_NZD"] = summary["Baseline_Cost_NZD"] - summary["Optimized_Cost_NZD"]
+    summary["Savings_Per_TEU_NZD"] = summary["Savings_NZD"] / np.maximum(np.bincount(port, weights=teu, minlength=n_ports), 1)
+
+    n_days = int(ctn["ready_day"].max() + defer.max()) + 1 if len(ctn) else 1
+    sail = (ctn["ready_day"] + defer).astype(np.int64)
+    cell = port.astype(np.int64) * n_days + sail
+    departing = np.bincount(cell, minlength=n_ports * n_days)
+    departing_teu = np.bincount(cell, weights=teu, minlength=n_ports * n_days)
+    # yard TEU on day t: held containers with ready <= t < sail (difference array per port)
+    held = np.zeros(n_ports * n_days + 1)
+    np.add.at(held, port.astype(np.int64) * n_days + ctn["ready_day"], np.where(defer > 0, teu, 0))
+    np.add.at(held, cell, -np.where(defer > 0, teu, 0))
+    yard = np.cumsum(held[:-1].reshape(n_ports, n_days), axis=1).ravel()
+    start = pd.Timestamp(start or datetime.date.today())
+    schedule = pd.DataFrame({
+        "Port": np.repeat(summary["Port"].to_numpy(), n_days), "Day": np.tile(np.arange(n_days), n_ports),
+        "Departing_Containers": departing, "Departing_TEU": departing_teu, "Yard_TEU": yard.round(1)})
+    schedule.insert(2, "Date", (start + pd.to_timedelta(schedule["Day"], unit="D")).dt.date)
+    port_cap = np.bincount([container_costs.PORTS.index(p) for p, _, _ in container_costs.YARDS],
+                           weights=capacities(capacity), minlength=n_ports)
+    summary["Peak_Yard_Utilization"] = schedule.groupby("Port", sort=False)["Yard_TEU"].max().to_numpy() / port_cap
+    return summary.round(2), schedule[(schedule["Departing_Containers"] > 0) | (schedule["Yard_TEU"] > 0)]
+
+
+def render_deferral(d):
+    s = d["summary"]
+    return f"""
+<p style='text-align:center;'>Last updated: {d['date']} · {s['Containers'].sum():,} containers,
+{s['Deferred'].sum():,} held in NZ · LP bound gap {d['gap']:.2%}</p>
+<h3 style='text-align:center;'>Total Saving vs Sailing When Ready: NZD {s['Savings_NZD'].sum():,.0f}</h3>
+{dashboard.table(s, 'deferral_summary')}
+<h3 style='text-align:center;'>📅 NZ Departures and Yard Occupancy by Day</h3>
+{dashboard.table(d['schedule'], 'deferral_schedule')}
+<p style='text-align:center;color:gray;font-size:14px;'>
+*Each container is held in its NZ yard ({d['yards']}) until the sailing that makes the next onward
+Singapore departure with the least SG waiting, within yard TEU capacity; weekly onward services
+from the inferred dwell pairs.*</p>"""
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Assign per-container NZ deferrals under yard capacity")
+    ap.add_argument("--capacity-scale", type=float, default=None, help="multiply the default yard TEU capacities")
+    ap.add_argument("--max-defer", type=int, default=MAX_DEFER_DAYS)
+    args = ap.parse_args()
+
+    instrument.stage("load")
+    today = datetime.date.today()
+    ctn = container_costs.load_manifest()
+    if ctn is None:
+        from synth_portcalls import containers
+        ctn = containers(dict(zip(container_costs.PORTS, CONTAINERS)))
+    try:
+        dwell_dates = pd.read_csv(DATA_DIR / "inferred_dwell.csv")["Departure"]
+    except (FileNotFoundError, KeyError):
+        dwell_dates = []
+    span = int(ctn["ready_day"].max()) + args.max_defer + int(np.ceil(max(NZ_SG_TRANSIT_DAYS.values()))) + 1
+    departures = sg_departure_days(dwell_dates, today, span)
+
+    instrument.stage("optimize")
+    print(f"🧮 Optimizing NZ deferrals for {len(ctn):,} containers...")
+    defer, chosen, baseline, info = optimize(ctn, departures, args.capacity_scale, args.max_defer)
+    gap = info["cost"] / info["lp_cost"] - 1 if info["lp_cost"] else 0.0
+    print(f"✅ Solved {info['classes']:,} container classes in {info['seconds']:.1f}s (gap to LP bound {gap:.3%})")
+
+    instrument.stage("report")
+    summary, schedule = summarize(ctn, defer, chosen, baseline, args.capacity_scale, today)
+    plan = ctn.copy()
+    plan["defer_days"] = defer
+    np.save(PLAN_PATH, plan)
+    summary.to_csv(SUMMARY_PATH, index=False)
+    schedule.to_csv(SCHEDULE_PATH, index=False)
+    print(summary.to_string(index=False))
+    print(f"💾 Plan → {PLAN_PATH.name}, {SUMMARY_PATH.name}, {SCHEDULE_PATH.name}")
+
+    instrument.stage("html")
+    dashboard.write_section("deferral", render_deferral, {
+        "date": today, "summary": summary, "schedule": schedule, "gap": gap,
+        "yards": ", ".join(f"{y} {c:.0f} TEU/day" for y, c in YARD_CAPACITY_TEU.items())})
@@ -0,0 +1,42 @@
+﻿import pandas as pd
+
+# --- Batch next-departure matching ---
+# Pairs every hub arrival with the first onward departure after it using a sorted-key
+# as-of join (pd.merge_asof) instead of filtering and sorting all departures per arrival.
+# Times may be naive (taken as UTC) or tz-aware; both sides are compared as naive UTC.
+
+
+def _naive_utc(values):
+    return pd.to_datetime(values, utc=True).dt.tz_convert("UTC").dt.tz_localize(None).astype("datetime64[ns]")
+
+
+def match_next_departures(arrivals, departures, by=("hub",), arr_time="arrival_time",
+                          dep_time="depart_time", min_connection=pd.Timedelta(0)):
+    """Attach the next departure sharing the `by` keys (e.g. hub, or hub and dest) to every arrival.
+
+    With a zero `min_connection` the departure must be strictly after the arrival (the
+    original rule); a positive value requires at least that much connection time.
+    Returns `arrivals` in its original order with `dep_time` (naive UTC) and `Dwell_Days`
+    added; arrivals without an onward departure get NaT/NaN.
+    """
+    by = list(by)
+    min_connection = pd.Timedelta(min_connection)
+
+    left = arrivals.reset_index(drop=True)
+    left["_row"] = range(len(left))
+    left["_key"] = _naive_utc(left[arr_time]) + min_connection
+
+    right = departures[by + [dep_time]].copy()
+    right["_key"] = _naive_utc(right[dep_time])
+    right = right.dropna(subset=["_key"]).sort_values("_key")
+
+    timed = left["_key"].notna()
+    matched = pd.merge_asof(
+        left[timed].drop(columns=[dep_time], errors="ignore").sort_values("_key"),
+        right.drop(columns=[dep_time]).assign(**{dep_time: right["_key"]}),
+        on="_key", by=by or None, direction="forward",
+        allow_exact_matches=min_connection > pd.Timedelta(0),
+    )
+    out = pd.concat([matched, left[~timed]]).sort_values("_row")
+    out["Dwell_Days"] = (out[dep_time] - _naive_utc(out[arr_time])).dt.days
+    return out.drop(columns=["_row", "_key"]).reset_index(drop=True)
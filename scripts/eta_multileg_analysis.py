@@ -1,30 +1,29 @@
-﻿import pandas as pd
+﻿import json, os, uuid
+import pandas as pd
 from datetime import datetime
+from paths import DATA_DIR
+import history_store
+import instrument
+import leg_aggregates
 
-data_path = r"C:\\Users\\seeds\\Documents\\Containrttransshipment\\data"
+data_dir = DATA_DIR
 
-# Load required CSVs
-try:
-    nz = pd.read_csv(f"{data_path}\\portconnect_departures.csv")
-    sg = pd.read_csv(f"{data_path}\\singapore_arrivals.csv")
-    jp = pd.read_csv(f"{data_path}\\japan_arrivals.csv")
-except FileNotFoundError as e:
-    print("⚠️ Missing required CSV files:", e)
+feeds = [data_dir / f for f in ("portconnect_departures.csv", "singapore_arrivals.csv", "japan_arrivals.csv")]
+missing = [str(f) for f in feeds if not f.exists()]
+if missing:
+    print("⚠️ Missing required CSV files:", missing)
     exit()
 
-# --- Merge and compute ETA metrics ---
-leg1 = pd.merge(nz, sg, on="Vessel_IMO", how="inner", suffixes=("_NZ", "_SG"))
-leg2 = pd.merge(sg, jp, on="Vessel_IMO", how="inner", suffixes=("_SG", "_JP"))
-
-leg1["NZ_to_SG_days"] = (pd.to_datetime(leg1["ActualArrival_SG"]) - pd.to_datetime(leg1["Departure_NZ"])).dt.days
-leg2["SG_to_JP_days"] = (pd.to_datetime(leg2["ActualArrival_JP"]) - pd.to_datetime(leg2["Departure_SG"])).dt.days
-
-combined = pd.merge(leg1, leg2, on="Vessel_IMO", how="inner")
-combined["Total_Transit_Days"] = combined["NZ_to_SG_days"] + combined["SG_to_JP_days"]
-
-avg_leg1 = combined["NZ_to_SG_days"].mean()
-avg_leg2 = combined["SG_to_JP_days"].mean()
-avg_total = combined["Total_Transit_Days"].mean()
+instrument.stage("summary")
+# Leg averages come from the incremental aggregate state (see leg_aggregates.py), not a
+# rebuilt leg table
+state = leg_aggregates.current(data_dir)
+overall = state.means(by_type=False)
+if overall.empty:
+    print("⚠️ No complete NZ → SG → JP voyages in the feeds yet.")
+    exit()
+overall = overall.iloc[0]
+avg_leg1, avg_leg2, avg_total = overall["NZ_to_SG_days"], overall["SG_to_JP_days"], overall["Total_Transit_Days"]
 
 summary = {
     "updated": datetime.now().strftime("%Y-%m-%d %H:%M"),
@@ -33,8 +32,30 @@ summary = {
     "avg_total_days": round(avg_total, 2)
 }
 
-pd.DataFrame([summary]).to_json(f"{data_path}\\eta_multileg_summary.json", orient="records")
-combined.to_csv(f"{data_path}\\eta_multileg_comparison.csv", index=False)
+# --- Per departure type (and All): voyages, mean / p50 / p90 of each leg ---
+stats = state.frame()
+stats = stats[stats["Lane"] == leg_aggregates.LANE]
+comparison = stats.pivot(index="DepartureType", columns="Metric", values=["Mean", "P50", "P90"])
+comparison.columns = [f"{metric}_{stat}" for stat, metric in comparison.columns]
+voyages = stats[stats["Metric"] == "Total_Transit_Days"].set_index("DepartureType")["Count"]
+comparison.insert(0, "Voyages", voyages)
+
+pd.DataFrame([summary]).to_json(data_dir / "eta_multileg_summary.json", orient="records")
+comparison.round(3).to_csv(data_dir / "eta_multileg_comparison.csv")
+
+instrument.stage("history")
+# --- History gets only the voyages eta_multileg_final.csv gained since the last run ---
+final, mark_path = data_dir / "eta_multileg_final.csv", data_dir / "aggregates" / "eta_multileg_history.json"
+if final.exists():
+    mark = json.loads(mark_path.read_text(encoding="utf-8")) if mark_path.exists() else None
+    new, whole, mark = leg_aggregates.rows_since(final, mark, ["Departure_NZ", "ActualArrival_SG", "ActualArrival_JP"])
+    if len(new) or whole:
+        history_store.append("eta_multileg_comparison", new, replace=whole)
+    mark_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = mark_path.with_name(f".{mark_path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    tmp.write_text(json.dumps(mark), encoding="utf-8")
+    os.replace(tmp, mark_path)
+    print(f"🗂️ {len(new):,} voyage(s) added to history{' (rewritten feed)' if whole else ''}")
 
 print("✅ Multi-leg ETA analysis complete.")
 print(f"Average NZ→SG: {avg_leg1:.1f} days | SG→JP: {avg_leg2:.1f} days | Total: {avg_total:.1f} days")
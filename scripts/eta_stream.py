@@ -0,0 +1,293 @@
+﻿import argparse, asyncio, json, math, os, time, uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+import dashboard
+from paths import DATA_DIR
+from leg_join import LEG_COLUMNS
+from leg_table import DELAY_THRESHOLD_HOURS
+from online_stats import OnlineSummary
+
+# --- Streaming ETA ingestion ---
+# A long-running asyncio service that consumes vessel events, one JSON object per line:
+#   {"event": "nz_departure", "Vessel_IMO": 9876543, "time": "2025-10-28T14:00", "port": "NZAKL", "delay_hours": 3}
+#   {"event": "sg_arrival" | "sg_departure" | "jp_arrival", "Vessel_IMO": ..., "time": ...}
+# from a tailed NDJSON file or a websocket. Times without an offset are UTC. Each voyage
+# is followed through NZ -> SG -> JP with leg_join's pairing rule: the first SG arrival
+# after the NZ departure, then the first JP arrival after the SG departure (or arrival),
+# both before the vessel's next NZ departure. As in the batch leg table, only completed
+# voyages count: their legs update per-DepartureType and per-origin OnlineSummary stats
+# (Welford mean/variance + t-digest quantiles) without a recompute. State (stats, open
+# voyages, file offset) is checkpointed periodically so a restart resumes where it
+# stopped, and the live figures the batch ETA/dwell scripts derive are published to
+# data/stream/ and the dashboard's "live" section.
+#
+#   python eta_stream.py stand-in --rows 2000 --rate 500     # local synthetic event feed
+#   python eta_stream.py serve                                # tail data/stream/events.ndjson
+
+STREAM_DIR = DATA_DIR / "stream"
+EVENTS_PATH = STREAM_DIR / "events.ndjson"
+CHECKPOINT_PATH = STREAM_DIR / "checkpoint.json"
+MAX_OPEN_DAYS = 60   # voyages with no event for this long are dropped at checkpoint
+
+
+def _ts(value):
+    t = datetime.fromisoformat(str(value).replace(" ", "T"))
+    return (t if t.tzinfo else t.replace(tzinfo=timezone.utc)).timestamp()
+
+
+def _days(seconds):
+    return seconds / 86400
+
+
+class EtaState:
+    def __init__(self, voyages=None, summaries=None, offset=0, events=0, skipped=0, last_time=None):
+        self.voyages = voyages or {}          # IMO -> open voyage
+        self.summaries = summaries or {}      # "metric|dim=value" -> OnlineSummary
+        self.offset, self.events, self.skipped, self.last_time = offset, events, skipped, last_time
+
+    def _observe(self, metric, value, voyage):
+        for dim in ("DepartureType", "Origin"):
+            key = f"{metric}|{dim}={voyage[dim]}"
+            self.summaries.setdefault(key, OnlineSummary()).add(value)
+
+    def apply(self, ev):
+        """Advance one vessel's voyage with an event; completed legs update the stats."""
+        self.events += 1
+        try:
+            imo, t, kind = int(ev["Vessel_IMO"]), _ts(ev["time"]), ev["event"]
+        except (KeyError, TypeError, ValueError):
+            self.skipped += 1
+            return
+        self.last_time = max(self.last_time or t, t)
+        v = self.voyages.get(imo)
+        if kind == "nz_departure":
+            delay = ev.get("delay_hours")
+            kind_ = "Unknown" if delay is None else "Delayed" if delay > DELAY_THRESHOLD_HOURS else "On-time"
+            self.voyages[imo] = {"Origin": ev.get("port") or "NZ", "DepartureType": kind_, "nz": t, "seen": t}
+        elif v is None:
+            self.skipped += 1
+        elif kind == "sg_arrival" and "sg_arr" not in v and t > v["nz"]:
+            v["sg_arr"] = v["seen"] = t
+        elif kind == "sg_departure" and "sg_arr" in v and "sg_dep" not in v and t >= v["sg_arr"]:
+            v["sg_dep"] = v["seen"] = t
+            self._observe("SG_Dwell_Days", _days(t - v["sg_arr"]), v)
+        elif kind == "jp_arrival" and "sg_arr" in v and t > v.get("sg_dep", v["sg_arr"]):
+            nz_leg, sg_leg = _days(v["sg_arr"] - v["nz"]), _days(t - v.get("sg_dep", v["sg_arr"]))
+            self._observe("NZ_to_SG_days", nz_leg, v)
+            self._observe("SG_to_JP_days", sg_leg, v)
+            self._observe("Total_Transit_Days", nz_leg + sg_leg, v)
+            del self.voyages[imo]
+        else:
+            self.skipped += 1
+
+    def evict_stale(self):
+        if self.last_time is not None:
+            cutoff = self.last_time - MAX_OPEN_DAYS * 86400
+            self.voyages = {imo: v for imo, v in self.voyages.items() if v["seen"] >= cutoff}
+
+    def table(self, dim):
+        """{value: {metric: describe()}} for one grouping dimension."""
+        out = {}
+        for key, summary in self.summaries.items():
+            metric, _, group = key.partition("|")
+            d, _, value = group.partition("=")
+            if d == dim:
+                out.setdefault(value, {})[metric] = summary.describe()
+        return out
+
+    def to_dict(self):
+        return {"offset": self.offset, "events": self.events, "skipped": self.skipped, "last_time": self.last_time,
+                "voyages": {str(k): v for k, v in self.voyages.items()},
+                "summaries": {k: s.to_dict() for k, s in self.summaries.items()}}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls({int(k): v for k, v in d["voyages"].items()},
+                   {k: OnlineSummary.from_dict(s) for k, s in d["summaries"].items()},
+                   d["offset"], d["events"], d.get("skipped", 0), d.get("last_time"))
+
+
+def _atomic_write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path=CHECKPOINT_PATH):
+    try:
+        return EtaState.from_dict(json.loads(path.read_text(encoding="utf-8")))
+    except (OSError, ValueError, KeyError):
+        return EtaState()
+
+
+def checkpoint(state, path=CHECKPOINT_PATH):
+    state.evict_stale()
+    _atomic_write(path, json.dumps(state.to_dict()))
+
+
+# --- Published figures (same shapes as the batch summaries) ---
+def _finite(obj):
+    """NaN -> None, recursively, so the published JSON stays valid."""
+    if isinstance(obj, dict):
+        return {k: _finite(v) for k, v in obj.items()}
+    return None if isinstance(obj, float) and math.isnan(obj) else obj
+
+
+def render_live(d):
+    legs, dwell = d["legs"], d["dwell"]
+    return f"""
+<p style='text-align:center;'>Streaming statistics from {d['events']:,} vessel events ({d['open']:,} voyages in progress).</p>
+<h3 style='text-align:center;'>Leg durations by departure type (days)</h3>
+{legs.to_html(index=False, na_rep='–')}
+<h3 style='text-align:center;'>Singapore dwell by origin (days)</h3>
+{dwell.to_html(index=False, na_rep='–')}"""
+
+
+def publish(state, out_dir=STREAM_DIR):
+    """Write the live leg/dwell figures and refresh the dashboard's live section."""
+    by_type, by_origin = state.table("DepartureType"), state.table("Origin")
+    legs = pd.DataFrame([{"DepartureType": k, **{m: v.get(m, {}).get("mean", math.nan) for m in LEG_COLUMNS},
+                          "Voyages": v.get("Total_Transit_Days", {}).get("count", 0)} for k, v in sorted(by_type.items())],
+                        columns=["DepartureType", *LEG_COLUMNS, "Voyages"]).round(2)
+    dwell = pd.DataFrame([{"Origin": k, "Dwell_Days": s["mean"], "Dwell_P50": s["p50"], "Dwell_P90": s["p90"],
+                           "Calls": s["count"]} for k, v in sorted(by_origin.items())
+                          if (s := v.get("SG_Dwell_Days"))],
+                         columns=["Origin", "Dwell_Days", "Dwell_P50", "Dwell_P90", "Calls"]).round(2)
+    updated = datetime.now().strftime("%Y-%m-%d %H:%M")
+    legs.assign(Updated=updated).to_csv(out_dir / "eta_live_summary.csv", index=False)
+    dwell.assign(Updated=updated).to_csv(out_dir / "dwell_live.csv", index=False)
+    _atomic_write(out_dir / "eta_live.json", json.dumps(
+        {"updated": updated, "events": state.events, "skipped": state.skipped, "open_voyages": len(state.voyages),
+         "by_departure_type": _finite(by_type), "by_origin": _finite(by_origin)}, default=str))
+    if dashboard.write_section("live", render_live, {"legs": legs, "dwell": dwell, "events": state.events,
+                                                     "open": len(state.voyages)}):
+        dashboard.build()
+
+
+# --- Sources ---
+async def ndjson_source(path, offset=0, follow=True, poll=0.5):
+    """Yield (event, offset after it) from an NDJSON file, tailing it when `follow`."""
+    path = Path(path)
+    while not path.exists():
+        if not follow:
+            return
+        await asyncio.sleep(poll)
+    with open(path, "rb") as f:
+        f.seek(offset)
+        since_yield = 0
+        while True:
+            line = f.readline()
+            if not line.endswith(b"\n"):    # EOF or a line still being written
+                if not follow:
+                    return
+                f.seek(offset)
+                await asyncio.sleep(poll)
+                continue
+            offset = f.tell()
+            if line.strip():
+                try:
+                    yield json.loads(line), offset
+                except ValueError:
+                    print(f"⚠️ Skipping malformed event at byte {offset}")
+            since_yield += 1
+            if since_yield >= 1000:         # let the checkpoint/publish timers run
+                since_yield = 0
+                await asyncio.sleep(0)
+
+
+async def websocket_source(url, retry=5.0):
+    """Yield (event, None) from a websocket feed, reconnecting on drops (needs `websockets`)."""
+    import websockets
+    while True:
+        try:
+            async with websockets.connect(url) as ws:
+                async for message in ws:
+                    yield json.loads(message), None
+        except (OSError, websockets.ConnectionClosed) as e:
+            print(f"⚠️ Websocket {url} dropped ({e}); reconnecting in {retry:.0f}s")
+            await asyncio.sleep(retry)
+
+
+async def serve(source, state, checkpoint_every=30.0, publish_every=10.0):
+    async def every(seconds, fn):
+        while True:
+            await asyncio.sleep(seconds)
+            fn(state)
+
+    timers = [asyncio.create_task(every(checkpoint_every, checkpoint)),
+              asyncio.create_task(every(publish_every, publish))]
+    try:
+        async for event, offset in source:
+            state.apply(event)
+            if offset is not None:
+                state.offset = offset
+    finally:
+        for timer in timers:
+            timer.cancel()
+        publish(state)
+        checkpoint(state)
+
+
+# --- Local stand-in feed (synthetic voyages replayed as events) ---
+def synthetic_events(rows, seed=2025):
+    from synth_portcalls import NZ_PORTS, voyages
+    nz, sg, jp = voyages(rows, seed, sg_departures=True)
+    frames = [
+        pd.DataFrame({"event": "nz_departure", "Vessel_IMO": nz["Vessel_IMO"], "time": nz["Departure_NZ"],
+                      "port": [NZ_PORTS[i % len(NZ_PORTS)] for i in nz["Vessel_IMO"]],
+                      "delay_hours": nz["Departure_Delay_Hours"]}),
+        pd.DataFrame({"event": "sg_arrival", "Vessel_IMO": sg["Vessel_IMO"], "time": sg["ActualArrival_SG"]}),
+        pd.DataFrame({"event": "sg_departure", "Vessel_IMO": sg["Vessel_IMO"], "time": sg["Departure_SG"]}),
+        pd.DataFrame({"event": "jp_arrival", "Vessel_IMO": jp["Vessel_IMO"], "time": jp["ActualArrival_JP"]}),
+    ]
+    return pd.concat(frames, ignore_index=True).sort_values("time", kind="stable").reset_index(drop=True)
+
+
+async def stand_in(path, rows, seed=2025, rate=0.0, batch=500):
+    """Append synthetic events to `path` at `rate` events/s (0 = as fast as possible)."""
+    events = synthetic_events(rows, seed)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    t0 = time.perf_counter()
+    with open(path, "a", encoding="utf-8") as f:
+        for start in range(0, len(events), batch):
+            chunk = events.iloc[start:start + batch]
+            f.write(chunk.to_json(orient="records", lines=True, date_format="iso", date_unit="s").rstrip("\n") + "\n")
+            f.flush()
+            if rate:
+                await asyncio.sleep(max(0.0, (start + len(chunk)) / rate - (time.perf_counter() - t0)))
+    return len(events)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Streaming ETA ingestion with incremental lane statistics")
+    sub = ap.add_subparsers(dest="command", required=True)
+    sp = sub.add_parser("serve", help="consume events and keep live statistics")
+    sp.add_argument("--ndjson", type=Path, default=EVENTS_PATH, help="NDJSON event file to tail")
+    sp.add_argument("--ws", help="websocket URL to consume instead of a file")
+    sp.add_argument("--once", action="store_true", help="stop at the end of the file instead of tailing")
+    sp.add_argument("--fresh", action="store_true", help="ignore the existing checkpoint")
+    sp.add_argument("--checkpoint-every", type=float, default=30.0)
+    sp.add_argument("--publish-every", type=float, default=10.0)
+    si = sub.add_parser("stand-in", help="write a synthetic event feed for local testing")
+    si.add_argument("--out", type=Path, default=EVENTS_PATH)
+    si.add_argument("--rows", type=int, default=2000, help="NZ departures to replay")
+    si.add_argument("--seed", type=int, default=2025)
+    si.add_argument("--rate", type=float, default=0.0, help="events per second (0 = unthrottled)")
+    args = ap.parse_args()
+
+    if args.command == "stand-in":
+        n = asyncio.run(stand_in(args.out, args.rows, args.seed, args.rate))
+        print(f"✅ Wrote {n:,} synthetic events to {args.out}")
+    else:
+        state = EtaState() if args.fresh else load_checkpoint()
+        source = websocket_source(args.ws) if args.ws else ndjson_source(args.ndjson, state.offset, follow=not args.once)
+        print(f"📡 Streaming ETA events from {args.ws or args.ndjson} (resuming at event {state.events:,})")
+        try:
+            asyncio.run(serve(source, state, args.checkpoint_every, args.publish_every))
+        except KeyboardInterrupt:
+            pass
+        print(f"✅ {state.events:,} events processed, {len(state.voyages):,} voyages open; state → {CHECKPOINT_PATH}")
@@ -0,0 +1,336 @@
+﻿import csv, io
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from paths import DATA_DIR
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:   # pandas' C parser with the same schema, just slower
+    pa = None
+
+# --- Schema-validated, typed loader for the feed CSVs ---
+# Each feed declares its columns: Vessel_IMO as uint32 (7 digits), timestamps in one
+# explicit format and time zone (returned as naive UTC datetime64), delay hours as float,
+# and port / UN/LOCODE columns as categoricals. With pyarrow the file is first read fully
+# typed (multi-threaded C++ conversion, UTF-8 BOM handled); only if that fails on a bad
+# value is it re-read as strings and validated column by column. Rows with a wrong field
+# count, an unparseable or out-of-range value, or a missing required value are dropped
+# and listed in data/rejects/<feed>.csv (Row, Column, Reason, Value) instead of turning
+# whole columns into object dtype. Row is the rejected row's 1-based line in the file
+# for every kind of error (the header is line 1). Timestamps that carry an explicit UTC
+# offset (ISO 8601) are accepted and converted. A byte range (start, stop) reads just the
+# lines appended since an earlier read, under the file's header. read_feed builds one Arrow
+# table and hands its buffers to pandas (self_destruct), so the file is held only once.
+
+Column = namedtuple("Column", "name kind required", defaults=(True,))
+Feed = namedtuple("Feed", "columns tz time_format", defaults=("UTC", "%Y-%m-%d %H:%M"))
+
+SCHEMAS = {
+    "portconnect_departures.csv": Feed((Column("Vessel_IMO", "imo"), Column("Departure_NZ", "datetime"),
+                                        Column("Departure_Delay_Hours", "float", False),
+                                        Column("Port", "locode", False))),
+    "singapore_arrivals.csv": Feed((Column("Vessel_IMO", "imo"), Column("ActualArrival_SG", "datetime"),
+                                    Column("Departure_SG", "datetime", False), Column("Port", "locode", False))),
+    "japan_arrivals.csv": Feed((Column("Vessel_IMO", "imo"), Column("ActualArrival_JP", "datetime"),
+                                Column("Port", "locode", False))),
+}
+REJECT_DIR = DATA_DIR / "rejects"
+IMO_RANGE = (1_000_000, 9_999_999)
+LOCODE = r"[A-Z]{2}[A-Z2-9]{3}"
+ARROW_TYPES = {"imo": "uint32", "datetime": "timestamp[ns]", "float": "float64", "locode": "dictionary"}
+
+
+class Rejects:
+    """Collects rejected rows across chunks and writes the feed's report.
+
+    Rows are recorded as the parser sees them: value errors by 0-based data-row index,
+    field-count errors by their fields. write() maps both to file lines in one csv pass.
+    """
+
+    def __init__(self, name, source=None, shift=0):
+        self.name, self.rows = name, []
+        self.source, self.shift = source, shift   # what was parsed; its line 1 + shift is the file line
+        self.pads_short = False                   # pandas' python engine keeps short rows, padded
+
+    def add(self, row, column, reason, value):
+        self.rows.append((row, column, reason, value))
+
+    def _lines(self):
+        """{recorded row: [1-based file lines]}; data rows are those with the header's field count."""
+        want, found = {r[0] for r in self.rows}, {}
+        raw = io.BytesIO(self.source) if isinstance(self.source, bytes) else open(self.source, "rb")
+        with io.TextIOWrapper(raw, encoding="utf-8-sig", newline="") as f:
+            reader = csv.reader(f)
+            width, k = len(next(reader, [])), 0
+            prev = reader.line_num
+            for fields in reader:
+                line, prev = prev + 1, reader.line_num
+                if not fields:   # blank lines are skipped by both parsers
+                    continue
+                data = len(fields) == width or (self.pads_short and len(fields) < width)
+                key = k if data else tuple(fields)
+                k += data
+                if key in want:
+                    found.setdefault(key, []).append(line + self.shift)
+        return found
+
+    def write(self, root=REJECT_DIR):
+        path = root / f"{Path(self.name).stem}.csv"
+        if not self.rows:
+            path.unlink(missing_ok=True)
+            return None
+        found, seen = self._lines() if self.source is not None else {}, {}
+        rows = []
+        for row, *rest in self.rows:
+            lines, i = found.get(row, []), 0
+            if isinstance(row, tuple):   # the n-th short/long row with these fields
+                i = seen[row] = seen.get(row, -1) + 1
+            rows.append((lines[i] if i < len(lines) else "", *rest))
+        root.mkdir(parents=True, exist_ok=True)
+        report = pd.DataFrame(rows, columns=["Row", "Column", "Reason", "Value"])
+        report.sort_values("Row", key=lambda r: pd.to_numeric(r, errors="coerce"), kind="stable").to_csv(path, index=False)
+        print(f"⚠️ {self.name}: rejected {report['Row'].nunique():,} malformed row(s) → {path}")
+        return path
+
+
+def schema_for(path):
+    try:
+        return SCHEMAS[Path(path).name]
+    except KeyError:
+        raise KeyError(f"no feed schema for {Path(path).name}; known: {sorted(SCHEMAS)}") from None
+
+
+# --- Column converters (strings -> typed values + validity) ---
+def _to_utc(values, tz):
+    return values if tz == "UTC" else values.dt.tz_localize(tz).dt.tz_convert("UTC").dt.tz_localize(None)
+
+
+def _convert(raw, kind, feed):
+    """(typed series, bad mask) for a column of strings; empty cells are NaN/NaT, not bad."""
+    blank = raw.isna() | (raw.astype(str).str.strip() == "")
+    if kind == "imo":
+        num = pd.to_numeric(raw, errors="coerce")
+        ok = num.between(*IMO_RANGE) & (num % 1 == 0)
+        return num.where(ok).astype("UInt32" if (~ok).any() else "uint32"), ~ok & ~blank
+    if kind == "datetime":
+        values = _to_utc(pd.to_datetime(raw, format=feed.time_format, errors="coerce"), feed.tz)
+        retry = values.isna() & ~blank
+        if retry.any():   # explicit offsets / other ISO 8601 spellings
+            iso = pd.to_datetime(raw[retry], format="ISO8601", utc=True, errors="coerce")
+            values[retry] = iso.dt.tz_convert("UTC").dt.tz_localize(None)
+        return values.astype("datetime64[ns]"), values.isna() & ~blank
+    if kind == "float":
+        values = pd.to_numeric(raw, errors="coerce")
+        return values.astype("float64"), (values.isna() | ~np.isfinite(values)) & ~blank
+    if kind == "locode":
+        values = raw.astype("category")
+        valid = values.cat.categories[values.cat.categories.astype(str).str.fullmatch(LOCODE)]
+        values = values.cat.set_categories(valid)
+        return values, values.isna() & ~blank
+    raise ValueError(f"unknown column kind {kind!r}")
+
+
+def _validate(frame, feed, rejects, offset):
+    """Typed frame from a frame of strings; failing rows are dropped and reported."""
+    bad_rows = np.zeros(len(frame), dtype=bool)
+    for col in feed.columns:
+        if col.name not in frame.columns:
+            continue
+        values, bad = _convert(frame[col.name], col.kind, feed)
+        if col.required:
+            bad = bad | values.isna().to_numpy()
+        for i in np.flatnonzero(bad):
+            reason = "missing" if pd.isna(frame[col.name].iat[i]) or not str(frame[col.name].iat[i]).strip() \
+                else f"not a valid {col.kind}"
+            rejects.add(offset + i, col.name, reason, frame[col.name].iat[i])
+        bad_rows |= np.asarray(bad)
+        frame[col.name] = values
+    out = frame[~bad_rows]
+    for col in feed.columns:   # no missing values left in required columns -> plain dtypes
+        if col.name in out.columns and col.required and str(out[col.name].dtype) == "UInt32":
+            out[col.name] = out[col.name].astype("uint32")
+    return out.reset_index(drop=True)
+
+
+def _check_header(names, feed, path):
+    missing = [c.name for c in feed.columns if c.required and c.name not in names]
+    if missing:
+        raise ValueError(f"{path}: missing required column(s) {missing}")
+
+
+# --- Readers ---
+def _arrow_options(feed, names, typed, rejects):
+    def on_bad_row(row):
+        rejects.add(tuple(next(csv.reader([row.text]), [])), "*",
+                    f"expected {row.expected_columns} fields, got {row.actual_columns}", row.text)
+        return "skip"
+    types = {c.name: (pa.dictionary(pa.int32(), pa.string()) if c.kind == "locode" else pa.type_for_alias(ARROW_TYPES[c.kind]))
+             if typed else pa.string() for c in feed.columns if c.name in names}
+    types.update({n: pa.string() for n in names if n not in types and not typed})
+    return (pacsv.ParseOptions(invalid_row_handler=on_bad_row),
+            pacsv.ConvertOptions(column_types=types, timestamp_parsers=[feed.time_format], strings_can_be_null=True))
+
+
+def _typed_checks(frame, feed, rejects, offset):
+    """Range/format checks the typed reader can't express; datetimes to UTC."""
+    bad = np.zeros(len(frame), dtype=bool)
+    for col in feed.columns:
+        if col.name not in frame.columns:
+            continue
+        s = frame[col.name]
+        if col.kind == "imo":
+            b = ~s.between(*IMO_RANGE)
+        elif col.kind == "locode":
+            frame[col.name] = s = s.astype("category")
+            b = s.notna() & ~s.astype(str).str.fullmatch(LOCODE)
+        elif col.kind == "datetime":
+            frame[col.name] = _to_utc(s, feed.tz)
+            b = s.isna() if col.required else pd.Series(False, index=s.index)
+        else:
+            b = (~np.isfinite(s) & s.notna()) | (s.isna() if col.required else False)
+        b = np.asarray(b, dtype=bool)
+        for i in np.flatnonzero(b):
+            rejects.add(offset + i, col.name, "missing" if pd.isna(s.iat[i]) else f"not a valid {col.kind}", s.iat[i])
+        bad |= b
+    return frame[~bad].reset_index(drop=True) if bad.any() else frame
+
+
+def complete_size(path):
+    """Byte length of the file's complete lines (a half-written last line is left for later)."""
+    with open(path, "rb") as f:
+        pos = f.seek(0, io.SEEK_END)
+        while pos > 0:
+            lo = max(0, pos - (1 << 16))
+            f.seek(lo)
+            nl = f.read(pos - lo).rfind(b"\n")
+            if nl >= 0:
+                return lo + nl + 1
+            pos = lo
+    return 0
+
+
+def byte_range(path, start, stop):
+    """The header line plus the bytes [start, stop) of a feed, as one in-memory CSV."""
+    with open(path, "rb") as f:
+        header = f.readline()
+        start = max(start, len(header))
+        f.seek(start)
+        return header + (f.read() if stop is None else f.read(max(0, stop - start)))
+
+
+def _lines_before(path, start):
+    """Newlines before byte `start` (at least the header's)."""
+    with open(path, "rb") as f:
+        header = f.readline()
+        count, left = 1, max(0, start - len(header))
+        while left > 0:
+            block = f.read(min(left, 1 << 20))
+            if not block:
+                break
+            count, left = count + block.count(b"\n"), left - len(block)
+    return count
+
+
+def _open(source):
+    return io.BytesIO(source) if isinstance(source, bytes) else source
+
+
+def _header(source, feed, path):
+    names = list(pd.read_csv(_open(source), nrows=0, encoding="utf-8-sig").columns)
+    _check_header(names, feed, path)
+    return names
+
+
+def _arrow_batches(source, feed, rejects, typed, block_size, path):
+    names = _header(source, feed, path)
+    parse, convert = _arrow_options(feed, names, typed, rejects)
+    reader = pacsv.open_csv(_open(source), read_options=pacsv.ReadOptions(block_size=block_size),
+                            parse_options=parse, convert_options=convert)
+    for batch in reader:
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+
+def _arrow_frame(source, feed, rejects, typed, path):
+    """The whole source as one DataFrame; Arrow buffers are released as columns convert."""
+    names = _header(source, feed, path)
+    parse, convert = _arrow_options(feed, names, typed, rejects)
+    table = pacsv.read_csv(_open(source), parse_options=parse, convert_options=convert)
+    return table.to_pandas(self_destruct=True, split_blocks=True)
+
+
+def _pandas_chunks(source, feed, rejects, chunksize, path):
+    names = _header(source, feed, path)
+
+    def on_bad_line(fields):
+        rejects.add(tuple(fields), "*", f"expected {len(names)} fields, got {len(fields)}", ",".join(fields))
+    yield from pd.read_csv(_open(source), dtype=str, encoding="utf-8-sig", keep_default_na=False, na_values=[""],
+                           chunksize=chunksize, engine="python", on_bad_lines=on_bad_line)
+
+
+def _source(path, start, stop):
+    """What to parse (the path, or a byte range under the header) and its Rejects."""
+    source = byte_range(path, start, stop) if start or stop is not None else path
+    return source, Rejects(Path(path).name, source, _lines_before(path, start) - 1 if isinstance(source, bytes) else 0)
+
+
+def _drop_field_count_rejects(rejects):
+    rejects.rows = [r for r in rejects.rows if r[1] != "*"]   # the re-read reports them again
+
+
+def iter_feed(path, chunksize=200_000, feed=None, report=True, start=0, stop=None):
+    """Typed, validated frames of a feed CSV (or of its bytes [start, stop)), about `chunksize` rows at a time."""
+    feed = feed or schema_for(path)
+    source, rejects = _source(path, start, stop)
+    offset = 0
+    if pa is not None:
+        block_size = max(1 << 16, chunksize * 48)   # ~48 bytes per feed row
+        try:
+            for frame in _arrow_batches(source, feed, rejects, True, block_size, path):
+                out = _typed_checks(frame, feed, rejects, offset)
+                offset += len(frame)
+                yield out
+        except pa.ArrowInvalid:
+            # a value the typed reader can't convert: re-read as strings from where it stopped
+            skip, offset = offset, 0
+            _drop_field_count_rejects(rejects)
+            for frame in _arrow_batches(source, feed, rejects, False, block_size, path):
+                start = max(0, skip - offset)
+                offset += len(frame)
+                if start < len(frame):
+                    yield _validate(frame.iloc[start:].copy(), feed, rejects, offset - len(frame) + start)
+    else:
+        rejects.pads_short = True
+        for frame in _pandas_chunks(source, feed, rejects, chunksize, path):
+            yield _validate(frame, feed, rejects, offset)
+            offset += len(frame)
+    if report:
+        rejects.write()
+
+
+def read_feed(path, feed=None, report=True, start=0, stop=None):
+    """The whole feed (or its bytes [start, stop)) as one typed, validated DataFrame."""
+    feed = feed or schema_for(path)
+    if pa is None:
+        parts = list(iter_feed(path, 1 << 22, feed, report, start, stop))
+        if not parts:
+            return pd.DataFrame(columns=[c.name for c in feed.columns if c.required])
+        out = pd.concat(parts, ignore_index=True)
+        for col in feed.columns:   # chunks may carry different category sets
+            if col.kind == "locode" and col.name in out.columns:
+                out[col.name] = out[col.name].astype("category")
+        return out
+    source, rejects = _source(path, start, stop)
+    try:
+        out = _typed_checks(_arrow_frame(source, feed, rejects, True, path), feed, rejects, 0)
+    except pa.ArrowInvalid:   # a value the typed reader can't convert: validate as strings
+        _drop_field_count_rejects(rejects)
+        out = _validate(_arrow_frame(source, feed, rejects, False, path), feed, rejects, 0)
+    if report:
+        rejects.write()
+    return out
@@ -0,0 +1,151 @@
+﻿import argparse, datetime, uuid
+
+from paths import DATA_DIR
+
+pa = pacsv = ds = pafs = None   # pyarrow loads on first use (_arrow), not on import
+
+# --- Partitioned columnar history of feeds and derived tables ---
+# Every run appends its tables to data/history/<table>/date=YYYY-MM-DD/port=<code>/ as
+# Parquet (hive partitioning). A rerun on the same day replaces that day's partitions,
+# unless the run appends an increment (replace=False), which adds files next to them.
+# Reads project columns and push date/port predicates down to the partition paths, so
+# "last 90 days, NZTRG only" opens only those files, memory-mapped. Appends are conformed
+# to the files already written: missing columns are filled with nulls, shared columns are
+# cast to the stored type, and new columns are added (reads unify the file schemas).
+
+HISTORY_DIR = DATA_DIR / "history"
+PARTITIONING = ("date", "port")
+
+
+def _arrow():
+    """Import pyarrow on first use; False when it isn't installed (history is optional)."""
+    global pa, pacsv, ds, pafs
+    if pa is None:
+        try:
+            import pyarrow as pa
+            import pyarrow.csv as pacsv
+            import pyarrow.dataset as ds
+            import pyarrow.fs as pafs
+        except ImportError:   # the flat CSVs keep working without it
+            pa = False
+    return pa is not False
+
+
+def _partitioning():
+    return ds.partitioning(pa.schema([("date", pa.string()), ("port", pa.string())]), flavor="hive")
+
+
+def _behavior(replace):
+    return "delete_matching" if replace else "overwrite_or_ignore"
+
+
+def _file_schema(table, root):
+    """Unified schema of the table's existing files (no partition fields); None for a new table."""
+    if not (root / table).exists():
+        return None
+    files = [f.physical_schema for f in ds.dataset(root / table, format="parquet").get_fragments()]
+    return pa.unify_schemas(files, promote_options="permissive") if files else None
+
+
+def _target(schema, stored):
+    """The schema an append is written with: the stored columns and types first, then its new columns."""
+    if stored is None:
+        return schema
+    fields = [schema.field(f.name) if pa.types.is_null(f.type) and f.name in schema.names else f for f in stored]
+    return pa.schema(fields + [f for f in schema if f.name not in stored.names])
+
+
+def _conform(data, target, table):
+    """A Table or RecordBatch with `target`'s columns: missing ones as nulls, the rest cast."""
+    cols = []
+    for f in target:
+        if f.name not in data.schema.names:
+            cols.append(pa.nulls(len(data), f.type))
+            continue
+        col = data.column(f.name)
+        try:
+            cols.append(col if col.type == f.type else col.cast(f.type))
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            raise ValueError(f"{table}: column {f.name} ({col.type}) does not fit the stored {f.type}") from e
+    return type(data).from_arrays(cols, schema=target)
+
+
+def append(table, df, port_col=None, run_date=None, root=HISTORY_DIR, replace=True):
+    """Append one run of `table`; rows are partitioned by run date and `port_col` (or ALL)."""
+    if not _arrow():
+        print(f"⚠️ pyarrow not installed; skipping history for {table}")
+        return
+    run_date = str(run_date or datetime.date.today())
+    frame = df.drop(columns=[c for c in PARTITIONING if c in df.columns and c != port_col])
+    frame = frame.assign(date=run_date, port=df[port_col].astype(str) if port_col else "ALL")
+    data = pa.Table.from_pandas(frame, preserve_index=False)
+    data = _conform(data, _target(data.schema, _file_schema(table, root)), table)
+    ds.write_dataset(data, root / table, format="parquet",
+                     partitioning=_partitioning(), existing_data_behavior=_behavior(replace),
+                     basename_template=f"part-{uuid.uuid4().hex[:8]}-{{i}}.parquet")
+
+
+def append_csv(table, path, run_date=None, root=HISTORY_DIR, replace=True):
+    """Stream a feed CSV (path or file object) into history batch by batch (no full in-memory load)."""
+    if not _arrow():
+        print(f"⚠️ pyarrow not installed; skipping history for {table}")
+        return
+    run_date = str(run_date or datetime.date.today())
+    reader = pacsv.open_csv(path)
+    schema = reader.schema.append(pa.field("date", pa.string())).append(pa.field("port", pa.string()))
+    target = _target(schema, _file_schema(table, root))
+    batches = (_conform(pa.RecordBatch.from_arrays(b.columns + [pa.array([run_date] * b.num_rows),
+                                                                pa.array(["ALL"] * b.num_rows)], schema=schema),
+                        target, table) for b in reader)
+    ds.write_dataset(batches, root / table, schema=target, format="parquet", partitioning=_partitioning(),
+                     existing_data_behavior=_behavior(replace),
+                     basename_template=f"part-{uuid.uuid4().hex[:8]}-{{i}}.parquet")
+
+
+def dataset(table, root=HISTORY_DIR):
+    if not _arrow():
+        raise ImportError("history_store needs pyarrow")
+    fs = pafs.LocalFileSystem(use_mmap=True)
+    data = ds.dataset(root / table, format="parquet", partitioning=_partitioning(), filesystem=fs)
+    schema = pa.unify_schemas([data.schema] + [f.physical_schema for f in data.get_fragments()],
+                              promote_options="permissive")
+    return data if schema == data.schema else \
+        ds.dataset(root / table, format="parquet", partitioning=_partitioning(), filesystem=fs, schema=schema)
+
+
+def read(table, columns=None, since=None, until=None, ports=None, days=None, filter=None, root=HISTORY_DIR):
+    """Read history with column projection and partition pruning.
+
+    `days` is shorthand for since = today - days. Extra conditions can be passed as a
+    pyarrow.dataset expression in `filter`.
+    """
+    if days is not None:
+        since = datetime.date.today() - datetime.timedelta(days=days)
+    data = dataset(table, root)
+    expr = filter
+    for cond in (ds.field("date") >= str(since) if since else None,
+                 ds.field("date") <= str(until) if until else None,
+                 ds.field("port").isin([str(p) for p in ports]) if ports else None):
+        if cond is not None:
+            expr = cond if expr is None else expr & cond
+    return data.to_table(columns=columns, filter=expr).to_pandas()
+
+
+def export_csv(table, dest, **query):
+    """Write a history slice as CSV, e.g. for the docs/data mirror."""
+    df = read(table, **query)
+    df.to_csv(dest, index=False)
+    return dest
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Export a slice of the history store to CSV")
+    ap.add_argument("table")
+    ap.add_argument("dest")
+    ap.add_argument("--days", type=int)
+    ap.add_argument("--since")
+    ap.add_argument("--ports", nargs="+")
+    ap.add_argument("--columns", nargs="+")
+    args = ap.parse_args()
+    export_csv(args.table, args.dest, columns=args.columns, since=args.since, ports=args.ports, days=args.days)
+    print(f"✅ Exported {args.table} → {args.dest}")
@@ -1,97 +1,122 @@
-﻿import pandas as pd, datetime, requests, matplotlib.pyplot as plt
-from pathlib import Path
+﻿import pandas as pd, datetime
+import charts
+import dashboard
+from chart_render import ChartJob, describe, render_all
+from paths import DATA_DIR, DOCS_DIR
+import history_store
+import instrument
+from portcalls_client import PortCallsClient
+from dwell_matching import match_next_departures
+from routing import NZ_PORTS, OUT_PORTS, PRIMARY_HUB
+from schedule_index import ScheduleIndex, lanes_from_frame
 
 # --- Setup ---
-base = Path(r"C:\Users\seeds\Documents\Containrttransshipment")
-data_dir, docs_dir = base / "data", base / "docs"
+data_dir, docs_dir = DATA_DIR, DOCS_DIR
 data_dir.mkdir(exist_ok=True); docs_dir.mkdir(exist_ok=True)
 today = datetime.date.today()
 
+instrument.stage("fetch")
 print("📡 Fetching live vessel data (free PortCalls.io)...")
 
-api = "https://api.portcalls.io/v1/schedules"
-nz_ports = ["NZAKL", "NZTRG", "NZLYT"]
-out_ports = ["NLRTM", "CNSHA", "USLAX", "GBSOU"]  # Rotterdam, Shanghai, LA, Southampton
+# Dwell is observed at the primary hub; routing.py weighs it against the other hubs
+nz_ports, out_ports, hub = NZ_PORTS, OUT_PORTS, PRIMARY_HUB
+MIN_CONNECTION = pd.Timedelta(hours=0)   # least hub time between arrival and onward departure
+
+client = PortCallsClient()
+queries = [{"from": p, "to": hub} for p in nz_ports] + [{"from": hub, "to": p} for p in out_ports]
+results = client.fetch_many(queries)
 
 arrivals, departures = [], []
 
-for p in nz_ports:
-    try:
-        r = requests.get(api, params={"from": p, "to": "SGSIN", "limit": 10}, timeout=15).json()
-        arrivals += r.get("results", [])
-    except Exception:
+for p, res in zip(nz_ports, results[:len(nz_ports)]):
+    if isinstance(res, Exception):
         print(f"⚠️ Using fallback for {p}")
-        arrivals.append({"from": p, "to": "SGSIN", "eta_days": 12, "arrival": str(today)})
+        res = pd.DataFrame([{"from": p, "to": hub, "eta_days": 12, "arrival": str(today)}])
+    arrivals.append(res.assign(**{"from": res.get("from", p), "to": res.get("to", hub)}))
 
-for p in out_ports:
-    try:
-        r = requests.get(api, params={"from": "SGSIN", "to": p, "limit": 10}, timeout=15).json()
-        departures += r.get("results", [])
-    except Exception:
+fetched = []
+for p, res in zip(out_ports, results[len(nz_ports):]):
+    simulated = isinstance(res, Exception)
+    if simulated:
         print(f"⚠️ Using fallback for {p}")
-        departures.append({"from": "SGSIN", "to": p, "eta_days": 18, "departure": str(today + datetime.timedelta(days=10))})
+        res = pd.DataFrame([{"from": hub, "to": p, "eta_days": 18, "departure": str(today + datetime.timedelta(days=10))}])
+    res = res.assign(**{"from": res.get("from", hub), "to": res.get("to", p)})
+    departures.append(res)
+    if not simulated and "etd" in res.columns:
+        fetched.append(res)
+
+# Fetched onward departures also go into the persistent per-lane index (schedule_index.py)
+if fetched:
+    added = ScheduleIndex().update(lanes_from_frame(pd.concat(fetched, ignore_index=True)))
+    print(f"🗂️ Schedule index: {added:,} new departure(s)")
 
-df_arr = pd.DataFrame(arrivals)
-df_dep = pd.DataFrame(departures)
+df_arr = pd.concat(arrivals, ignore_index=True)
+df_dep = pd.concat(departures, ignore_index=True)
 
+instrument.stage("dwell_inference")
 # --- Infer dwell days ---
 print("🔎 Inferring dwell times...")
 
-df_arr["arrival_time"] = pd.to_datetime(df_arr.get("eta") or today)
-df_dep["depart_time"] = pd.to_datetime(df_dep.get("etd") or (today + datetime.timedelta(days=7)))
-
-pairs = []
-for _, row in df_arr.iterrows():
-    arr_t = pd.to_datetime(row.get("arrival_time", today))
-    next_dep = df_dep[df_dep["depart_time"] > arr_t].sort_values("depart_time").head(1)
-    if not next_dep.empty:
-        dep_t = next_dep.iloc[0]["depart_time"]
-        dwell = (dep_t - arr_t).days
-        pairs.append({
-            "Origin": row.get("from", ""),
-            "Arrival": arr_t.date(),
-            "Departure": dep_t.date(),
-            "Dwell_Days": dwell
-        })
-
-df_dwell = pd.DataFrame(pairs)
-df_dwell["Containers"] = [60,70,65][:len(df_dwell)]
+# PortCalls times carry a UTC offset; compare them as naive UTC next to the date fallbacks
+def _times(col, frame, fallback):
+    values = pd.to_datetime(frame.get(col, pd.Series(pd.NaT, index=frame.index)), utc=True, errors="coerce")
+    return values.dt.tz_localize(None).fillna(pd.Timestamp(fallback))
+
+
+df_arr["arrival_time"] = _times("eta", df_arr, today)
+df_dep["depart_time"] = _times("etd", df_dep, today + datetime.timedelta(days=7))
+df_arr["hub"], df_dep["hub"] = df_arr["to"].fillna(hub), df_dep["from"].fillna(hub)
+
+# Each arrival waits for the next sailing to each onward port, not just the hub's next sailing
+df_arr["_arrival"], df_dep["onward"] = range(len(df_arr)), df_dep["to"]
+legs = df_arr.merge(pd.DataFrame({"onward": out_ports}), how="cross")
+matched = match_next_departures(legs, df_dep, by=["hub", "onward"], min_connection=MIN_CONNECTION)
+matched = matched.dropna(subset=["depart_time"])
+instrument.rows("match_next_departures", legs, matched)
+df_dwell = pd.DataFrame({
+    "Origin": matched["from"].fillna("").values,
+    "Arrival": matched["arrival_time"].dt.date.values,
+    "Departure": matched["depart_time"].dt.date.values,
+    "Dwell_Days": matched["Dwell_Days"].astype(int).values,
+})
+# an arrival's containers are split evenly over the onward ports it connects to
+containers = df_dwell["Origin"].map({"NZAKL": 60, "NZTRG": 70, "NZLYT": 65}).fillna(60).astype(int)
+arrival = matched["_arrival"].to_numpy()
+ways = pd.Series(arrival).groupby(arrival).transform("size").to_numpy()
+nth = pd.Series(arrival).groupby(arrival).cumcount().to_numpy()
+df_dwell["Containers"] = containers // ways + (nth < containers % ways)
 df_dwell["Storage_Cost_NZD"] = df_dwell["Dwell_Days"] * 30 * df_dwell["Containers"]
 
 csv_path = data_dir / "inferred_dwell.csv"
 df_dwell.to_csv(csv_path, index=False)
+history_store.append("inferred_dwell", df_dwell, port_col="Origin")
 print(f"✅ Saved inferred dwell data to {csv_path}")
 
+instrument.stage("rendering")
 # --- Chart ---
-plt.figure(figsize=(7,5))
-plt.bar(df_dwell["Origin"], df_dwell["Dwell_Days"])
-plt.title("Inferred Transshipment Dwell Time in Singapore")
-plt.ylabel("Days")
-plt.tight_layout()
-plt.savefig(docs_dir / "dwell_chart.png")
-plt.close()
-
-# --- Dashboard ---
-html_table = df_dwell.to_html(index=False)
-avg_dwell = df_dwell["Dwell_Days"].mean()
-total_cost = df_dwell["Storage_Cost_NZD"].sum()
-
-html = f"""
-<html>
-<head><title>Inferred Transshipment Dwell Times</title></head>
-<body style='font-family:Arial;text-align:center;background:#f9fafc;'>
-<h1>🚢 Inferred Singapore Transshipment Dwell Times</h1>
-<p>Last updated: {today}</p>
-<img src='dwell_chart.png' width='500'><br>
-<h3>Average Dwell: {avg_dwell:.1f} days</h3>
-<h3>Total Storage Cost: NZD {total_cost:,.0f}</h3>
-{html_table}
-<p style='color:gray;font-size:14px;margin-top:20px;'>
-*Derived by comparing NZ→SG arrivals vs SG→onward departures (PortCalls.io).*<br>
+# one bar per origin: dwell averaged over its onward connections, weighted by containers
+by_origin = (df_dwell["Dwell_Days"] * df_dwell["Containers"]).groupby(df_dwell["Origin"], sort=False).sum() \
+    / df_dwell.groupby("Origin", sort=False)["Containers"].sum()
+chart = ChartJob(docs_dir / "dwell_chart.png", charts.bar,
+                 {"labels": list(by_origin.index), "values": by_origin.to_numpy()},
+                 {"figsize": (7,5), "title": "Inferred Transshipment Dwell Time in Singapore", "ylabel": "Days"})
+print(f"🖼️ Charts: {describe(render_all([chart]))}")
+
+instrument.stage("html")
+# --- Dashboard section (re-rendered only when the dwell data changes; see dashboard.py) ---
+def render_dwell(d):
+    dwell = d["dwell"]
+    return f"""
+<p style='text-align:center;'>Last updated: {d['date']}</p>
+<img src='dwell_chart.png' width='500' style='display:block;margin:auto;'>
+<h3 style='text-align:center;'>Average Dwell: {dwell['Dwell_Days'].mean():.1f} days</h3>
+<h3 style='text-align:center;'>Total Storage Cost: NZD {dwell['Storage_Cost_NZD'].sum():,.0f}</h3>
+{dashboard.table(dwell, 'inferred_dwell')}
+<p style='text-align:center;color:gray;font-size:14px;margin-top:20px;'>
+*Derived by matching each NZ→SG arrival to the next SG departure for each onward port (PortCalls.io).*<br>
 *Storage rate: NZD 30/day per container.*
-</p>
-</body></html>"""
+</p>"""
+
 
-html_path = docs_dir / "index.html"
-with open(html_path,"w",encoding="utf-8") as f: f.write(html)
-print(f"🌍 Dashboard ready at {html_path}")
+dashboard.write_section("dwell", render_dwell, {"date": today, "dwell": df_dwell})
+print("🌍 Dwell section ready (assemble with dashboard.py)")
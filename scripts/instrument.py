@@ -0,0 +1,220 @@
+﻿import atexit, json, os, statistics, sys, threading, time, uuid
+from datetime import datetime
+from pathlib import Path
+
+from paths import DATA_DIR
+
+try:
+    import resource
+except ImportError:   # Windows: peak RSS comes from psutil when installed
+    resource = None
+
+# --- Per-stage instrumentation and run manifest ---
+# Scripts mark their steps with instrument.stage("fetch"), stage("merge"), ... ; a stage
+# runs until the next one (or exit) and records wall/CPU time, how much it raised the
+# process's peak RSS and that peak so far (ru_maxrss only grows, so it is cumulative),
+# rows in/out of DataFrame steps, HTTP calls/latency/cache hits (portcalls_client) and
+# chart render times (chart_render). At exit each script leaves its record in
+# data/.run/<script>.json; the records of one run are merged into data/run_manifest.json
+# (by the pipeline, or by the script itself when run standalone), appended to
+# data/run_history.jsonl, and any stage whose wall time jumped against its recent runs is
+# flagged. TRANSSHIP_PROFILE=cprofile|pyinstrument also profiles each script into
+# data/profiles/.
+
+RUN_DIR = DATA_DIR / ".run"
+MANIFEST_PATH = DATA_DIR / "run_manifest.json"
+HISTORY_PATH = DATA_DIR / "run_history.jsonl"
+PROFILE_DIR = DATA_DIR / "profiles"
+ALERT_RATIO, ALERT_MIN_SECONDS, ALERT_WINDOW = 2.0, 1.0, 10
+
+RUN_ID = os.environ.get("TRANSSHIP_RUN_ID") or uuid.uuid4().hex[:12]
+SCRIPT = Path(sys.argv[0]).stem if sys.argv and sys.argv[0] else "interactive"
+PROFILE = os.environ.get("TRANSSHIP_PROFILE", "").lower()
+
+_lock = threading.RLock()
+_stages, _current = {}, None
+_t0, _cpu0 = time.perf_counter(), time.process_time()
+
+
+def peak_rss_mib():
+    """Process high-water RSS in MiB (None when the platform can't tell)."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / 2**20, 1)
+    except ImportError:
+        return None
+
+
+def _close():
+    global _current
+    if _current is None:
+        return
+    cur, _current = _current, None
+    rec = _stages.setdefault(cur.pop("name"), {"wall_s": 0.0, "cpu_s": 0.0})
+    rec["wall_s"] = round(rec["wall_s"] + time.perf_counter() - cur.pop("t0"), 4)
+    rec["cpu_s"] = round(rec["cpu_s"] + time.process_time() - cur.pop("cpu0"), 4)
+    rss0, rss = cur.pop("rss0"), peak_rss_mib()
+    if rss is not None:
+        rec["peak_rss_growth_mib"] = round(rec.get("peak_rss_growth_mib", 0.0) + rss - rss0, 1)
+    rec["peak_rss_cumulative_mib"] = rss
+    for key, value in cur.items():
+        if value:
+            rec.setdefault(key, type(value)())
+            if isinstance(value, list):
+                rec[key] += value
+            else:
+                rec[key].update(value)
+
+
+def _active():
+    """The open stage; events outside any stage land in an implicit 'script' stage."""
+    if _current is None:
+        stage("script")
+    return _current
+
+
+def stage(name):
+    """End the current stage (if any) and start timing `name`."""
+    global _current
+    with _lock:
+        _close()
+        _current = {"name": name, "t0": time.perf_counter(), "cpu0": time.process_time(), "rss0": peak_rss_mib(),
+                    "rows": [], "http": {}, "charts": {}}
+
+
+def rows(step, before, after):
+    """Record rows in/out of a DataFrame step (frames or plain counts)."""
+    count = lambda x: len(x) if hasattr(x, "__len__") else int(x)
+    with _lock:
+        _active()["rows"].append({"step": step, "in": count(before), "out": count(after)})
+
+
+def http(seconds, status):
+    """One HTTP request (status None on a connection error/timeout)."""
+    with _lock:
+        h = _active()["http"]
+        h["calls"] = h.get("calls", 0) + 1
+        h["errors"] = h.get("errors", 0) + (status is None or status >= 400)
+        h["seconds"] = round(h.get("seconds", 0.0) + seconds, 4)
+        h["max_s"] = round(max(h.get("max_s", 0.0), seconds), 4)
+
+
+def cache(kind):
+    """A page served from the response cache: fresh, revalidated, stale or offline."""
+    with _lock:
+        h = _active()["http"]
+        h[f"cache_{kind}"] = h.get(f"cache_{kind}", 0) + 1
+
+
+def charts(times):
+    """Chart render times {png: seconds} from chart_render."""
+    if times:
+        with _lock:
+            _active()["charts"].update(times)
+
+
+def _atomic_json(path, obj):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    tmp.write_text(json.dumps(obj, indent=2, default=str), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _history():
+    try:
+        with open(HISTORY_PATH, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except OSError:
+        return []
+
+
+def write_manifest(run_id=None, statuses=None):
+    """Merge this run's script records into run_manifest.json, log them and flag cost jumps."""
+    run_id = run_id or RUN_ID
+    records = {}
+    for path in RUN_DIR.glob("*.json"):
+        rec = json.loads(path.read_text(encoding="utf-8"))
+        if rec.get("run_id") == run_id:
+            records[rec["script"]] = rec
+    history, alerts, lines = _history(), [], []
+    for script, rec in sorted(records.items()):
+        for name, st in rec["stages"].items():
+            past = [h["wall_s"] for h in history if h["script"] == script and h["stage"] == name][-ALERT_WINDOW:]
+            typical = statistics.median(past) if len(past) >= 3 else None
+            if typical is not None and st["wall_s"] > max(typical, ALERT_MIN_SECONDS) * ALERT_RATIO:
+                alerts.append({"script": script, "stage": name, "wall_s": st["wall_s"], "typical_wall_s": typical})
+                print(f"🚨 {script}/{name}: {st['wall_s']:.1f}s vs typical {typical:.1f}s")
+            lines.append({"run_id": run_id, "finished": rec["finished"], "script": script, "stage": name,
+                          "wall_s": st["wall_s"], "cpu_s": st["cpu_s"],
+                          "peak_rss_growth_mib": st.get("peak_rss_growth_mib"),
+                          "peak_rss_cumulative_mib": st.get("peak_rss_cumulative_mib"),
+                          "http_calls": st.get("http", {}).get("calls", 0)})
+    manifest = {"run_id": run_id, "generated": datetime.now().isoformat(timespec="seconds"),
+                "pipeline": statuses or {}, "scripts": records, "alerts": alerts}
+    _atomic_json(MANIFEST_PATH, manifest)
+    with open(HISTORY_PATH, "a", encoding="utf-8") as f:
+        f.writelines(json.dumps(line) + "\n" for line in lines)
+    return manifest
+
+
+# --- Optional profiler (whole script) ---
+_profiler = None
+if PROFILE == "cprofile":
+    import cProfile
+    _profiler = cProfile.Profile()
+    _profiler.enable()
+elif PROFILE == "pyinstrument":
+    try:
+        from pyinstrument import Profiler
+        _profiler = Profiler()
+        _profiler.start()
+    except ImportError:
+        print("⚠️ TRANSSHIP_PROFILE=pyinstrument but pyinstrument is not installed")
+
+
+def _stop_profiler():
+    if _profiler is None:
+        return
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    if PROFILE == "cprofile":
+        _profiler.disable()
+        _profiler.dump_stats(PROFILE_DIR / f"{SCRIPT}-{RUN_ID}.prof")
+    else:
+        _profiler.stop()
+        (PROFILE_DIR / f"{SCRIPT}-{RUN_ID}.html").write_text(_profiler.output_html(), encoding="utf-8")
+
+
+def end():
+    """Close the current stage and leave this script's record in data/.run (once per script)."""
+    global _stages
+    with _lock:
+        _close()
+        stages, _stages = _stages, {}
+    if not stages:
+        return
+    _atomic_json(RUN_DIR / f"{SCRIPT}.json", {
+        "run_id": RUN_ID, "script": SCRIPT, "finished": datetime.now().isoformat(timespec="seconds"),
+        "wall_s": round(time.perf_counter() - _t0, 4), "cpu_s": round(time.process_time() - _cpu0, 4),
+        "peak_rss_mib": peak_rss_mib(), "stages": stages})
+    if "TRANSSHIP_RUN_ID" not in os.environ:   # standalone run; the pipeline merges its own
+        write_manifest()
+
+
+def begin(script, run_id=None):
+    """Start a fresh record for `script` when one interpreter runs several (transship.py)."""
+    global SCRIPT, RUN_ID, _t0, _cpu0
+    end()
+    with _lock:
+        SCRIPT = Path(script).stem
+        RUN_ID = run_id or os.environ.get("TRANSSHIP_RUN_ID") or uuid.uuid4().hex[:12]
+        _t0, _cpu0 = time.perf_counter(), time.process_time()
+
+
+@atexit.register
+def _finish():
+    _stop_profiler()
+    end()
@@ -0,0 +1,213 @@
+﻿import hashlib, io, json, os, uuid
+from collections import namedtuple
+from datetime import timedelta
+
+import pandas as pd
+
+from paths import DATA_DIR
+import feed_loader
+from leg_join import KEY, LEG_COLUMNS, join_frames
+from leg_table import FEEDS, classify_departures, load_leg_table
+from online_stats import MomentSketch
+
+# --- Persisted per-lane leg aggregates, folded in incrementally ---
+# Transit averages used to be recomputed from the whole leg table every run. Instead the
+# state below keeps, per lane x DepartureType x leg metric, a MomentSketch (count, sum,
+# sum of squares, t-digest) plus a high-water mark on (ActualArrival_JP, Vessel_IMO) of
+# the last voyage folded in. The first run seeds the state from the full leg table.
+#
+# After that a run parses only what the feeds gained: per feed the state keeps the byte
+# offset it has read up to and a hash of the bytes before it. While a feed still holds
+# those bytes, only the lines past the offset are read, joined together with a saved
+# window of the rows from LOOKBACK_DAYS before the mark (enough for any voyage to
+# complete), and only voyages past the mark are folded. A feed that was rewritten
+# rather than appended to is scanned once for its window and marked again.
+
+STATE_PATH = DATA_DIR / "aggregates" / "leg_state.json"
+LANE = "NZ>SG>JP"          # the feeds carry one lane; a Lane column would split them
+ALL = "All"
+LOOKBACK_DAYS = 90         # longer than any NZ departure -> JP arrival voyage
+TIME_COLS = dict(zip(FEEDS, ("Departure_NZ", "ActualArrival_SG", "ActualArrival_JP")))
+CHECK_BYTES = 4096
+
+# legs: the voyages folded in; spans: {feed: (start, stop) bytes read}, None when the feeds
+# were read in full
+Update = namedtuple("Update", "state legs spans")
+
+
+class LegAggregates:
+    def __init__(self, sketches=None, hwm=None, marks=None):
+        self.sketches = sketches or {}     # "lane|departure type|metric" -> MomentSketch
+        self.hwm = hwm                     # {"time": iso, "imo": int} of the last folded voyage
+        self.marks = marks or {}           # feed -> {"offset": bytes read, "check": hash before it}
+
+    def _sketch(self, lane, kind, metric):
+        return self.sketches.setdefault(f"{lane}|{kind}|{metric}", MomentSketch())
+
+    def _after_hwm(self, legs):
+        if self.hwm is None:
+            return legs
+        ts, hwm_ts = legs["ActualArrival_JP"], pd.Timestamp(self.hwm["time"])
+        return legs[(ts > hwm_ts) | ((ts == hwm_ts) & (legs[KEY] > self.hwm["imo"]))]
+
+    def fold(self, legs):
+        """Fold voyages beyond the high-water mark into the state; returns those voyages."""
+        new = self._after_hwm(legs).sort_values(["ActualArrival_JP", KEY])
+        if new.empty:
+            return new
+        lanes = new["Lane"] if "Lane" in new.columns else pd.Series(LANE, index=new.index)
+        for (lane, kind), grp in new.groupby([lanes, new["DepartureType"].astype(str)]):
+            for metric in LEG_COLUMNS:
+                self._sketch(lane, kind, metric).add_many(grp[metric])
+                self._sketch(lane, ALL, metric).add_many(grp[metric])
+        last = new.iloc[-1]
+        self.hwm = {"time": last["ActualArrival_JP"].isoformat(), "imo": int(last[KEY])}
+        return new
+
+    def frame(self):
+        """One row per lane x DepartureType x metric: count, mean, std, p50, p90."""
+        rows = []
+        for key, s in sorted(self.sketches.items()):
+            lane, kind, metric = key.split("|")
+            rows.append({"Lane": lane, "DepartureType": kind, "Metric": metric, "Count": s.count,
+                         "Mean": s.mean, "Std": s.std, "P50": s.digest.quantile(0.5), "P90": s.digest.quantile(0.9)})
+        return pd.DataFrame(rows, columns=["Lane", "DepartureType", "Metric", "Count", "Mean", "Std", "P50", "P90"])
+
+    def means(self, lane=LANE, by_type=True):
+        """Mean leg durations for a lane, per DepartureType (the summary_by_departure_type shape) or overall."""
+        df = self.frame()
+        df = df[(df["Lane"] == lane) & ((df["DepartureType"] != ALL) if by_type else (df["DepartureType"] == ALL))]
+        if df.empty:   # nothing folded yet
+            return pd.DataFrame(columns=LEG_COLUMNS, index=pd.Index([], name="DepartureType"), dtype=float)
+        out = df.pivot(index="DepartureType", columns="Metric", values="Mean").reindex(columns=LEG_COLUMNS)
+        out.columns.name = None
+        return out
+
+    def to_dict(self):
+        return {"hwm": self.hwm, "marks": self.marks,
+                "sketches": {k: s.to_dict() for k, s in sorted(self.sketches.items())}}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls({k: MomentSketch.from_dict(s) for k, s in d["sketches"].items()}, d.get("hwm"), d.get("marks"))
+
+    @classmethod
+    def load(cls, path=STATE_PATH):
+        try:
+            return cls.from_dict(json.loads(path.read_text(encoding="utf-8")))
+        except FileNotFoundError:
+            return cls()
+
+    def save(self, path=STATE_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        tmp.write_text(json.dumps(self.to_dict()), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+# --- Feed marks and the saved lookback window ---
+def _check(path, offset):
+    """Hash of the first and last CHECK_BYTES bytes before `offset`."""
+    with open(path, "rb") as f:
+        head = f.read(min(offset, CHECK_BYTES))
+        f.seek(max(0, offset - CHECK_BYTES))
+        tail = f.read(offset - max(0, offset - CHECK_BYTES))
+    return hashlib.sha256(head + tail).hexdigest()[:16]
+
+
+def _mark(path):
+    offset = feed_loader.complete_size(path)
+    return {"offset": offset, "check": _check(path, offset)}
+
+
+def _appended(path, mark):
+    """True when the feed still holds the bytes `mark` was taken over (and maybe more lines)."""
+    return bool(mark) and path.stat().st_size >= mark["offset"] and _check(path, mark["offset"]) == mark["check"]
+
+
+def rows_since(path, mark, parse_dates=None):
+    """(rows, whole, new mark): the lines a CSV gained since `mark`, or all of it when it was rewritten."""
+    new_mark, whole = _mark(path), not _appended(path, mark)
+    start = 0 if whole else mark["offset"]
+    rows = pd.read_csv(io.BytesIO(feed_loader.byte_range(path, start, new_mark["offset"])), encoding="utf-8-sig",
+                       parse_dates=parse_dates)
+    return rows, whole, new_mark
+
+
+def _window_path(root, name):
+    try:
+        import pyarrow  # noqa: F401
+        return root / f"{name.removesuffix('.csv')}.parquet"
+    except ImportError:
+        return root / f"{name.removesuffix('.csv')}.pkl"
+
+
+def _load_window(root, name):
+    path = _window_path(root, name)
+    if not path.exists():
+        return None
+    return pd.read_parquet(path) if path.suffix == ".parquet" else pd.read_pickle(path)
+
+
+def _save_window(root, name, frame):
+    path = _window_path(root, name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    if path.suffix == ".parquet":
+        frame.to_parquet(tmp, index=False)
+    else:
+        frame.to_pickle(tmp)
+    os.replace(tmp, path)
+
+
+def _scan(path, time_col, cutoff, chunksize=200_000):
+    """Rows of a whole feed CSV at or after `cutoff`, read in chunks."""
+    parts = []
+    for chunk in feed_loader.iter_feed(path, chunksize):
+        parts.append(chunk[chunk[time_col] >= cutoff])
+    return pd.concat(parts, ignore_index=True)
+
+
+def _join(frames):
+    nz, sg, jp = (frames[name].drop_duplicates() for name in FEEDS)
+    if nz.empty or sg.empty or jp.empty:
+        return pd.DataFrame(columns=[KEY, "ActualArrival_JP", "DepartureType"] + LEG_COLUMNS)
+    return classify_departures(join_frames(nz, sg, jp))
+
+
+def update(data_dir=DATA_DIR, path=STATE_PATH):
+    """Fold in the voyages from the feed lines added since the last run; returns an Update."""
+    state, window_dir = LegAggregates.load(path), path.parent / "window"
+    feeds = {name: data_dir / name for name in FEEDS}
+    marks = {name: _mark(p) for name, p in feeds.items()}   # before reading, so nothing is skipped
+    frames, spans = None, None
+    if state.hwm is None:   # seed from the whole leg table
+        legs = load_leg_table(data_dir)
+    else:
+        cutoff = pd.Timestamp(state.hwm["time"]) - timedelta(days=LOOKBACK_DAYS)
+        frames, spans = {}, {}
+        for name, p in feeds.items():
+            old, window = state.marks.get(name), _load_window(window_dir, name)
+            if window is not None and _appended(p, old):
+                start, stop = old["offset"], marks[name]["offset"]
+                fresh = feed_loader.read_feed(p, report=False, start=start, stop=stop) if stop > start else window[:0]
+                frames[name], spans[name] = pd.concat([window, fresh], ignore_index=True), (start, stop)
+            else:   # rewritten feed (or no window yet): rescan it once
+                frames[name], spans[name] = _scan(p, TIME_COLS[name], cutoff), None
+        legs = _join(frames)
+    new = state.fold(legs)
+    if state.hwm is not None:
+        cutoff = pd.Timestamp(state.hwm["time"]) - timedelta(days=LOOKBACK_DAYS)
+        for name, p in feeds.items():
+            rows = frames[name] if frames else _scan(p, TIME_COLS[name], cutoff)
+            _save_window(window_dir, name, rows[rows[TIME_COLS[name]] >= cutoff].reset_index(drop=True))
+    if len(new) or marks != state.marks or not path.exists():
+        state.marks = marks
+        state.save(path)
+    return Update(state, new, spans)
+
+
+def current(data_dir=DATA_DIR, path=STATE_PATH):
+    """The saved state as the ETA feeds stage left it (seeded from the feeds if there is none)."""
+    state = LegAggregates.load(path)
+    return state if state.hwm is not None else update(data_dir, path).state
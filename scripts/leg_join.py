@@ -0,0 +1,110 @@
+﻿import pandas as pd
+
+import feed_loader
+
+# --- Voyage-aware, chunked NZ -> SG -> JP leg join ---
+# Legs are keyed by voyage rather than by Vessel_IMO alone: each NZ departure takes the
+# first SG arrival after it, and that SG call takes the next JP arrival after it leaves
+# (Departure_SG when the feed has it, else the SG arrival). Both calls must come before
+# the vessel's next NZ departure, so a voyage with a missing SG or JP call is dropped
+# instead of borrowing the next voyage's call. Feeds sorted by Vessel_IMO are
+# read in chunks and joined one block of complete IMO groups at a time, so memory stays
+# bounded by the chunk size rather than years of port-call history. Feeds that grow by
+# appended lines instead (not IMO-sorted) are joined in memory. Feeds arrive already
+# typed and validated through feed_loader.
+
+KEY = "Vessel_IMO"
+LEG_COLUMNS = ["NZ_to_SG_days", "SG_to_JP_days", "Total_Transit_Days"]
+
+
+class UnsortedFeedError(ValueError):
+    """A feed that isn't sorted by Vessel_IMO, so it can't be joined block by block."""
+
+
+def _days(delta):
+    return delta.dt.total_seconds() / 86400
+
+
+def join_frames(nz, sg, jp):
+    """Voyage-aware join of in-memory NZ/SG/JP frames; one row per NZ departure with a full voyage."""
+    nz = nz.assign(Departure_NZ=pd.to_datetime(nz["Departure_NZ"]).astype("datetime64[ns]")).dropna(subset=["Departure_NZ"])
+    sg = sg.assign(ActualArrival_SG=pd.to_datetime(sg["ActualArrival_SG"]).astype("datetime64[ns]")).dropna(subset=["ActualArrival_SG"])
+    jp = jp.assign(ActualArrival_JP=pd.to_datetime(jp["ActualArrival_JP"]).astype("datetime64[ns]")).dropna(subset=["ActualArrival_JP"])
+    if "Departure_SG" in sg.columns:
+        sg["Departure_SG"] = pd.to_datetime(sg["Departure_SG"]).astype("datetime64[ns]")
+    sg["_sg_ready"] = sg["Departure_SG"].fillna(sg["ActualArrival_SG"]) if "Departure_SG" in sg.columns else sg["ActualArrival_SG"]
+    nz = nz.sort_values([KEY, "Departure_NZ"])
+    nz["_next_nz"] = nz.groupby(KEY)["Departure_NZ"].shift(-1)   # end of this voyage
+
+    leg1 = pd.merge_asof(nz.sort_values("Departure_NZ"), sg.sort_values("ActualArrival_SG"),
+                         left_on="Departure_NZ", right_on="ActualArrival_SG", by=KEY,
+                         direction="forward", allow_exact_matches=False, suffixes=("_NZ", "_SG"))
+    leg1 = leg1[leg1["ActualArrival_SG"].notna() & ~(leg1["ActualArrival_SG"] >= leg1["_next_nz"])]
+    legs = pd.merge_asof(leg1.sort_values("_sg_ready"), jp.sort_values("ActualArrival_JP"),
+                         left_on="_sg_ready", right_on="ActualArrival_JP", by=KEY,
+                         direction="forward", allow_exact_matches=False, suffixes=("", "_JP"))
+    legs = legs[legs["ActualArrival_JP"].notna() & ~(legs["ActualArrival_JP"] >= legs["_next_nz"])]
+
+    legs["NZ_to_SG_days"] = _days(legs["ActualArrival_SG"] - legs["Departure_NZ"])
+    legs["SG_to_JP_days"] = _days(legs["ActualArrival_JP"] - legs["_sg_ready"])
+    legs["Total_Transit_Days"] = legs["NZ_to_SG_days"] + legs["SG_to_JP_days"]
+    return legs.drop(columns=["_sg_ready", "_next_nz"]).sort_values([KEY, "Departure_NZ"]).reset_index(drop=True)
+
+
+def imo_blocks(path, chunksize):
+    """Yield frames of complete IMO groups from a CSV sorted by Vessel_IMO."""
+    carry, last_seen = None, None
+    for chunk in feed_loader.iter_feed(path, chunksize):
+        if chunk.empty:
+            continue
+        imos = chunk[KEY]
+        if not imos.is_monotonic_increasing or (last_seen is not None and imos.iloc[0] < last_seen):
+            raise UnsortedFeedError(f"{path} must be sorted by {KEY} for chunked joins")
+        last_seen = imos.iloc[-1]
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        complete = chunk[KEY] != last_seen
+        carry = chunk[~complete]
+        if complete.any():
+            yield chunk[complete]
+    if carry is not None and len(carry):
+        yield carry
+
+
+class _Cursor:
+    """Pulls blocks from a sorted feed up to a given IMO, dropping IMOs nobody asked for."""
+
+    def __init__(self, blocks):
+        self.blocks, self.buf, self.done = iter(blocks), None, False
+
+    def upto(self, lo, hi):
+        while not self.done and (self.buf is None or self.buf[KEY].iloc[-1] <= hi):
+            block = next(self.blocks, None)
+            if block is None:
+                self.done = True
+            else:
+                self.buf = block if self.buf is None else pd.concat([self.buf, block], ignore_index=True)
+        if self.buf is None:
+            return pd.DataFrame(columns=[KEY])
+        taken = self.buf[self.buf[KEY] <= hi]
+        self.buf = self.buf[self.buf[KEY] > hi]
+        return taken[taken[KEY] >= lo]
+
+
+def iter_legs(nz_path, sg_path, jp_path, chunksize=200_000):
+    """Stream joined voyages block by block from IMO-sorted feed CSVs."""
+    sg, jp = _Cursor(imo_blocks(sg_path, chunksize)), _Cursor(imo_blocks(jp_path, chunksize))
+    for nz in imo_blocks(nz_path, chunksize):
+        lo, hi = nz[KEY].iloc[0], nz[KEY].iloc[-1]
+        sg_block, jp_block = sg.upto(lo, hi), jp.upto(lo, hi)
+        if len(sg_block) and len(jp_block):
+            yield join_frames(nz, sg_block, jp_block)
+
+
+def join_legs(nz_path, sg_path, jp_path, chunksize=200_000):
+    """All joined voyages as one DataFrame (output is at most one row per NZ departure)."""
+    try:
+        parts = list(iter_legs(nz_path, sg_path, jp_path, chunksize))
+    except UnsortedFeedError:
+        return join_frames(*(feed_loader.read_feed(p) for p in (nz_path, sg_path, jp_path)))
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=[KEY] + LEG_COLUMNS)
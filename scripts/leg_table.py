@@ -0,0 +1,75 @@
+﻿import hashlib, os, uuid
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from paths import DATA_DIR
+from leg_join import LEG_COLUMNS, join_legs
+
+# --- Shared NZ -> SG -> JP leg table ---
+# Built once per set of feed files: the voyage join, parsed datetimes, leg durations and
+# delay classification are persisted as a typed snapshot (Parquet, or pickle without
+# pyarrow) under data/cache keyed by the feeds' content fingerprint, and memoized
+# in-process. parse_api_feeds, eta_multileg_analysis and update_eta_dashboard all read
+# this table instead of re-reading and re-merging the feeds.
+
+FEEDS = ("portconnect_departures.csv", "singapore_arrivals.csv", "japan_arrivals.csv")
+DELAY_THRESHOLD_HOURS = 2
+
+
+def feed_fingerprint(data_dir=DATA_DIR):
+    h = hashlib.sha256()
+    for name in FEEDS:
+        with open(data_dir / name, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()[:16]
+
+
+def classify_departures(legs):
+    """Add DepartureType (Delayed / On-time / Unknown) next to the NZ delay column."""
+    if "Departure_Delay_Hours" not in legs.columns:
+        return legs.assign(DepartureType="Unknown")
+    kind = np.where(legs["Departure_Delay_Hours"] > DELAY_THRESHOLD_HOURS, "Delayed", "On-time")
+    legs = legs.drop(columns="DepartureType", errors="ignore")
+    legs.insert(legs.columns.get_loc("Departure_Delay_Hours") + 1, "DepartureType", kind)
+    return legs
+
+
+def _snapshot_path(data_dir, fp):
+    try:
+        import pyarrow  # noqa: F401
+        return data_dir / "cache" / f"legs-{fp}.parquet"
+    except ImportError:
+        return data_dir / "cache" / f"legs-{fp}.pkl"
+
+
+@lru_cache(maxsize=4)
+def _load(data_dir, fp):
+    path = _snapshot_path(data_dir, fp)
+    if path.exists():
+        return pd.read_parquet(path) if path.suffix == ".parquet" else pd.read_pickle(path)
+    legs = classify_departures(join_legs(*(data_dir / name for name in FEEDS)))
+    legs["DepartureType"] = legs["DepartureType"].astype("category")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    if path.suffix == ".parquet":
+        legs.to_parquet(tmp, index=False)
+    else:
+        legs.to_pickle(tmp)
+    os.replace(tmp, path)
+    for old in path.parent.glob("legs-*"):   # stale snapshots go only once the new one is in place
+        if old != path:
+            old.unlink(missing_ok=True)
+    return legs
+
+
+def load_leg_table(data_dir=DATA_DIR):
+    """The leg table for the current feeds (treat as read-only; copy before mutating)."""
+    return _load(data_dir, feed_fingerprint(data_dir))
+
+
+def summary_by_departure_type(legs):
+    """Mean leg durations per DepartureType (the dashboard/summary grouping)."""
+    return legs.groupby("DepartureType", observed=True)[LEG_COLUMNS].mean()
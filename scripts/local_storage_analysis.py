@@ -1,84 +1,59 @@
 ﻿import os, datetime
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-
-base = r"C:\Users\seeds\Documents\Containrttransshipment"
-docs = os.path.join(base, "docs")
-data = os.path.join(base, "data")
+import charts
+import dashboard
+from chart_render import ChartJob, describe, render_all
+from paths import DATA_DIR, DOCS_DIR
+import history_store
+import instrument
+from breakeven_solver import YARD_NZ_DAY, TRUCK_PER_CTN, WHARF_PER_CTN, default_lanes, nz_cost, solve_lanes
+
+docs, data = str(DOCS_DIR), str(DATA_DIR)
 os.makedirs(docs, exist_ok=True); os.makedirs(data, exist_ok=True)
 
 print("📦 Rebuilding Local-Storage (NZ) scenario with clearer breakeven charts...")
 
-# --- Inputs (fallbacks kept simple & explicit) ---
-ports         = ["Auckland", "Tauranga", "Lyttelton"]
-containers    = [60, 70, 65]                 # per-port fleet
-yard_nz_day   = 45.0                         # NZ yard/day/TEU
-truck_per_ctn = 320.0                        # one-off per container
-wharf_per_ctn = 180.0                        # one-off per container
-# Reference Singapore transshipment totals from your prior page (constant lines)
-trans_total   = {"Auckland":108000, "Tauranga":115500, "Lyttelton":113750}
-
-days = np.arange(0, 15)                      # show up to 14 deferred days
-
-rows = []
-for port, ctn in zip(ports, containers):
+instrument.stage("scenarios")
+# --- Inputs (shared lane defaults; see breakeven_solver) ---
+yard_nz_day, truck_per_ctn, wharf_per_ctn = YARD_NZ_DAY, TRUCK_PER_CTN, WHARF_PER_CTN
+# Lanes carry the reference Singapore transshipment totals (constant lines) and
+# the exact fractional breakeven for every port, solved at once
+lanes = solve_lanes(default_lanes())
+
+rows, jobs = [], []
+for _, lane in lanes.iterrows():
+    port, ctn, be = lane["Port"], lane["Containers"], lane["Breakeven_Day"]
+    # Show at least 14 deferred days, and always the crossing itself
+    days = np.arange(0, max(15, int(np.nan_to_num(be)) + 4))
     # NZ deferred total = per-container yard*days + truck + wharf, times number of containers
-    nz_costs = ctn * (yard_nz_day * days + truck_per_ctn + wharf_per_ctn)
-    sg_line  = np.full_like(days, trans_total[port])
-
-    # Breakeven = day with minimal abs difference
-    diff = sg_line - nz_costs
-    be_day = int(days[np.argmin(np.abs(diff))])
-    cheaper_mask = nz_costs < sg_line
-
-    # --- Pretty chart ---
-    plt.figure(figsize=(7.5, 5.2), dpi=140)
-    plt.plot(days, nz_costs, linewidth=3, label="NZ Deferred Storage (total)")
-    plt.plot(days, sg_line, linewidth=2, linestyle="--", label="SG Transshipment (total)")
-
-    # Shade region where NZ is cheaper
-    if cheaper_mask.any():
-        plt.fill_between(days, nz_costs, sg_line, where=cheaper_mask, alpha=0.18)
+    nz_costs = nz_cost(ctn, yard_nz_day, truck_per_ctn, wharf_per_ctn, days)
 
-    # Breakeven marker & label
-    plt.axvline(be_day, linestyle=":", linewidth=2)
-    y_val = ctn * (yard_nz_day * be_day + truck_per_ctn + wharf_per_ctn)
-    plt.scatter([be_day], [y_val], s=60)
-    plt.annotate(f"Breakeven ≈ {be_day} day(s)",
-                 xy=(be_day, y_val),
-                 xytext=(be_day+0.5, y_val*1.03),
-                 arrowprops=dict(arrowstyle="->", lw=1))
+    # --- Pretty chart (rendered below, only if its inputs changed) ---
+    jobs.append(ChartJob(os.path.join(docs, f"local_breakeven_{port}.png"), charts.breakeven_curve,
+                         {"days": days, "nz_costs": nz_costs, "sg_total": float(lane["Trans_Total"]), "breakeven": float(be)},
+                         {"figsize": (7.5, 5.2), "dpi": 140, "title": f"{port}: Local NZ vs SG Transshipment — Breakeven"}))
 
-    # Formatting for readability
-    plt.title(f"{port}: Local NZ vs SG Transshipment — Breakeven", fontsize=13, pad=12)
-    plt.xlabel("Deferred days in NZ yard", fontsize=11)
-    plt.ylabel("Total cost (NZD)", fontsize=11)
-    plt.grid(True, linestyle="--", alpha=0.35)
-    plt.legend(loc="best", frameon=False)
-    plt.tight_layout()
-    out_png = os.path.join(docs, f"local_breakeven_{port}.png")
-    plt.savefig(out_png)
-    plt.close()
-
-    rows.append((port, ctn, be_day, int(y_val), int(trans_total[port])))
+    # NZ cost at the last whole deferred day that is still cheaper than SG
+    y_val = nz_cost(ctn, yard_nz_day, truck_per_ctn, wharf_per_ctn, np.floor(be)) if lane["Has_Crossing"] else np.nan
+    rows.append((port, ctn, round(be, 2), y_val, int(lane["Trans_Total"]), bool(lane["Has_Crossing"])))
 
 # Summary table & small overview bar chart
-df = pd.DataFrame(rows, columns=["Port","Containers","Breakeven_Day","NZ_Cost_at_BE","SG_Transshipment_Total"])
+df = pd.DataFrame(rows, columns=["Port","Containers","Breakeven_Day","NZ_Cost_at_BE","SG_Transshipment_Total","Has_Crossing"])
+df["NZ_Cost_at_BE"] = df["NZ_Cost_at_BE"].astype("Int64")
 df.to_csv(os.path.join(data, "local_breakeven_summary.csv"), index=False)
+history_store.append("local_breakeven_summary", df, port_col="Port")
 
 # Overview bar chart of Breakeven Day per port
-plt.figure(figsize=(7.5, 4.5), dpi=140)
-plt.bar(df["Port"], df["Breakeven_Day"])
-for i,(p,be) in enumerate(zip(df["Port"], df["Breakeven_Day"])):
-    plt.text(i, be+0.15, f"{be}d", ha="center", va="bottom")
-plt.title("Breakeven Day by Port (NZ defer vs SG transshipment)", fontsize=13, pad=10)
-plt.ylabel("Days", fontsize=11)
-plt.grid(axis="y", linestyle="--", alpha=0.35)
-plt.tight_layout()
-plt.savefig(os.path.join(docs, "local_breakeven_overview.png"))
-plt.close()
-
+jobs.append(ChartJob(os.path.join(docs, "local_breakeven_overview.png"), charts.bar,
+                     {"labels": list(df["Port"]), "values": df["Breakeven_Day"].fillna(0).to_numpy()},
+                     {"figsize": (7.5, 4.5), "dpi": 140, "grid": True, "ylabel": "Days",
+                      "title": "Breakeven Day by Port (NZ defer vs SG transshipment)",
+                      "value_labels": [f"{be:.1f}d" if be == be else "no crossing" for be in df["Breakeven_Day"]]}))
+instrument.stage("rendering")
+print(f"🖼️ Charts: {describe(render_all(jobs))}")
+
+instrument.stage("html")
 # Rebuild local_storage.html to include the clearer charts
 html = f"""
 <html><head><title>📦 Local NZ Deferred Departure — Breakeven</title>
@@ -115,4 +90,16 @@ th {{ background:#f0f3f8; }}
 with open(os.path.join(docs, "local_storage.html"), "w", encoding="utf-8") as f:
     f.write(html)
 
-print(f"✅ Local-storage breakeven visuals refreshed → {docs}\\local_storage.html")
+print(f"✅ Local-storage breakeven visuals refreshed → {os.path.join(docs, 'local_storage.html')}")
+
+# --- Dashboard section (re-rendered only when the summary changes; see dashboard.py) ---
+def render_local_storage(d):
+    return f"""
+<img src="local_breakeven_overview.png" alt="Breakeven day overview" style="display:block;margin:12px auto;max-width:95%;">
+{dashboard.table(d['summary'], 'local_breakeven_summary')}
+<p style="text-align:center;color:gray;font-size:13px;">Assumptions: NZ yard {d['yard']:.0f} NZD/day/TEU, Truck {d['truck']:.0f} NZD/ctn, Wharf {d['wharf']:.0f} NZD/ctn.
+<a href="local_storage.html">Per-port cost curves →</a></p>"""
+
+
+dashboard.write_section("local_storage", render_local_storage,
+                        {"summary": df, "yard": yard_nz_day, "truck": truck_per_ctn, "wharf": wharf_per_ctn})
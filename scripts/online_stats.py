@@ -0,0 +1,195 @@
+﻿import math
+
+import numpy as np
+
+# --- Online, mergeable statistics ---
+# RunningStats keeps count/mean/M2 (Welford) so mean and variance update per observation
+# and two partial states combine exactly (Chan et al.). MomentSketch keeps count/sum/sum
+# of squares instead, for folding whole batches of values at once. TDigest is a small
+# merging t-digest: buffered points are folded into centroids whose size is bounded by
+# q(1-q)/compression, which keeps tail quantiles accurate in a few KB. All round-trip
+# through plain dicts for JSON checkpoints.
+
+
+class RunningStats:
+    __slots__ = ("count", "mean", "m2", "min", "max")
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, min=math.inf, max=-math.inf):
+        self.count, self.mean, self.m2, self.min, self.max = count, mean, m2, min, max
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.min, self.max = min(self.min, x), max(self.max, x)
+
+    def merge(self, other):
+        if not other.count:
+            return self
+        n = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / n
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / n
+        self.count = n
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance) if self.count > 1 else math.nan
+
+    def to_dict(self):
+        return {"count": self.count, "mean": self.mean, "m2": self.m2,
+                "min": self.min if self.count else None, "max": self.max if self.count else None}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["count"], d["mean"], d["m2"],
+                   math.inf if d.get("min") is None else d["min"], -math.inf if d.get("max") is None else d["max"])
+
+
+class TDigest:
+    def __init__(self, compression=100, means=(), weights=(), min=math.inf, max=-math.inf):
+        self.compression = compression
+        self.means, self.weights = list(means), list(weights)
+        self.min, self.max = min, max
+        self._buf = []
+
+    def add(self, x, w=1.0):
+        self._buf.append((x, w))
+        self.min, self.max = min(self.min, x), max(self.max, x)
+        if len(self._buf) >= 8 * self.compression:
+            self._compress()
+
+    def add_many(self, values):
+        values = np.asarray(values, dtype=float)
+        if not len(values):
+            return
+        self._buf.extend((float(x), 1.0) for x in values)
+        self.min, self.max = min(self.min, float(values.min())), max(self.max, float(values.max()))
+        self._compress()
+
+    def merge(self, other):
+        other._compress()
+        self._buf.extend(zip(other.means, other.weights))
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        self._compress()
+        return self
+
+    @property
+    def total(self):
+        return sum(self.weights) + sum(w for _, w in self._buf)
+
+    def _compress(self):
+        if not self._buf:
+            return
+        points = sorted([*zip(self.means, self.weights), *self._buf])
+        self._buf = []
+        total = sum(w for _, w in points)
+        means, weights, done = [], [], 0.0
+        cm, cw = points[0]
+        for m, w in points[1:]:
+            q = (done + (cw + w) / 2) / total
+            if cw + w <= max(1.0, 4 * total * q * (1 - q) / self.compression):
+                cm, cw = cm + (m - cm) * w / (cw + w), cw + w
+            else:
+                means.append(cm); weights.append(cw)
+                done += cw
+                cm, cw = m, w
+        means.append(cm); weights.append(cw)
+        self.means, self.weights = means, weights
+
+    def quantile(self, q):
+        self._compress()
+        if not self.weights:
+            return math.nan
+        w = np.asarray(self.weights)
+        centers = np.cumsum(w) - w / 2
+        xs = np.concatenate([[0.0], centers, [w.sum()]])
+        ys = np.concatenate([[self.min], self.means, [self.max]])
+        return float(np.interp(q * w.sum(), xs, ys))
+
+    def to_dict(self):
+        self._compress()
+        return {"compression": self.compression, "means": self.means, "weights": self.weights,
+                "min": self.min if self.weights else None, "max": self.max if self.weights else None}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["compression"], d["means"], d["weights"],
+                   math.inf if d.get("min") is None else d["min"], -math.inf if d.get("max") is None else d["max"])
+
+
+class OnlineSummary:
+    """Mean/variance plus quantile sketch for one metric."""
+    QUANTILES = (0.5, 0.9)
+
+    def __init__(self, stats=None, digest=None):
+        self.stats, self.digest = stats or RunningStats(), digest or TDigest()
+
+    def add(self, x):
+        self.stats.add(x)
+        self.digest.add(x)
+
+    def merge(self, other):
+        self.stats.merge(other.stats)
+        self.digest.merge(other.digest)
+        return self
+
+    def describe(self):
+        out = {"count": self.stats.count, "mean": self.stats.mean if self.stats.count else math.nan,
+               "std": self.stats.std}
+        out.update({f"p{int(q * 100)}": self.digest.quantile(q) for q in self.QUANTILES})
+        return out
+
+    def to_dict(self):
+        return {"stats": self.stats.to_dict(), "digest": self.digest.to_dict()}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(RunningStats.from_dict(d["stats"]), TDigest.from_dict(d["digest"]))
+
+
+class MomentSketch:
+    """count / sum / sum of squares plus a t-digest; folds arrays and merges exactly."""
+
+    def __init__(self, count=0, total=0.0, sumsq=0.0, digest=None):
+        self.count, self.total, self.sumsq = count, total, sumsq
+        self.digest = digest or TDigest()
+
+    def add_many(self, values):
+        v = np.asarray(values, dtype=float)
+        v = v[~np.isnan(v)]
+        self.count += len(v)
+        self.total += float(v.sum())
+        self.sumsq += float((v * v).sum())
+        self.digest.add_many(v)
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.sumsq += other.sumsq
+        self.digest.merge(other.digest)
+        return self
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else math.nan
+
+    @property
+    def std(self):
+        if self.count < 2:
+            return math.nan
+        return math.sqrt(max(0.0, (self.sumsq - self.total ** 2 / self.count) / (self.count - 1)))
+
+    def to_dict(self):
+        return {"count": self.count, "sum": self.total, "sumsq": self.sumsq, "digest": self.digest.to_dict()}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["count"], d["sum"], d["sumsq"], TDigest.from_dict(d["digest"]))
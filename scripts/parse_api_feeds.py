@@ -1,34 +1,47 @@
-﻿import pandas as pd
+﻿import io
 from datetime import datetime
+import pandas as pd
+from paths import DATA_DIR
+import feed_loader
+import history_store
+import instrument
+import leg_aggregates
 
-data_path = r"C:\\Users\\seeds\\Documents\\Containrttransshipment\\data"
+data_dir = DATA_DIR
 
-try:
-    nz = pd.read_csv(f"{data_path}\\portconnect_departures.csv")
-    sg = pd.read_csv(f"{data_path}\\singapore_arrivals.csv")
-    jp = pd.read_csv(f"{data_path}\\japan_arrivals.csv")
-except FileNotFoundError as e:
-    print(f"⚠️ Missing data file: {e}")
+feeds = {name: data_dir / f"{name}.csv" for name in ("portconnect_departures", "singapore_arrivals", "japan_arrivals")}
+missing = [str(f) for f in feeds.values() if not f.exists()]
+if missing:
+    print(f"⚠️ Missing data file: {missing}")
     exit()
 
-# --- Identify delayed vs on-time from NZ ---
-if "Departure_Delay_Hours" in nz.columns:
-    nz["DepartureType"] = nz["Departure_Delay_Hours"].apply(lambda x: "Delayed" if x > 2 else "On-time")
-else:
-    nz["DepartureType"] = "Unknown"
+instrument.stage("aggregate")
+# --- Fold only the feed lines added since the last run into the persisted per-lane aggregates ---
+state, new, spans = leg_aggregates.update(data_dir)
+added = len(new)
+print(f"➕ Folded {added:,} new voyage(s) into the leg aggregates")
 
-# --- Merge datasets ---
-merged = pd.merge(nz, sg, on="Vessel_IMO", how="inner", suffixes=("_NZ", "_SG"))
-merged = pd.merge(merged, jp, on="Vessel_IMO", how="inner", suffixes=("", "_JP"))
-
-merged["NZ_to_SG_days"] = (pd.to_datetime(merged["ActualArrival_SG"]) - pd.to_datetime(merged["Departure_NZ"])).dt.days
-merged["SG_to_JP_days"] = (pd.to_datetime(merged["ActualArrival_JP"]) - pd.to_datetime(merged["ActualArrival_SG"])).dt.days
-merged["Total_Transit_Days"] = merged["NZ_to_SG_days"] + merged["SG_to_JP_days"]
-
-# --- Group by delay type ---
-summary = merged.groupby("DepartureType")[["NZ_to_SG_days","SG_to_JP_days","Total_Transit_Days"]].mean().round(1)
+instrument.stage("summary")
+# --- Averages by delay type, from the aggregate state (no recompute over history) ---
+summary = state.means().round(1)
+instrument.rows("fold_new_voyages", added, summary)
+state.frame().round(3).to_csv(data_dir / "leg_aggregates.csv", index=False)
 summary["Updated"] = datetime.now().strftime("%Y-%m-%d %H:%M")
+summary.to_csv(data_dir / "eta_summary_comparison.csv")
 
-summary.to_csv(f"{data_path}\\eta_summary_comparison.csv")
-merged.to_csv(f"{data_path}\\eta_multileg_final.csv", index=False)
+instrument.stage("export")
+# --- Append the new voyages and feed lines; a seeding run writes them in full ---
+final = data_dir / "eta_multileg_final.csv"
+if spans is None or not final.exists():
+    new.to_csv(final, index=False)
+elif added:
+    new.reindex(columns=pd.read_csv(final, nrows=0).columns).to_csv(final, mode="a", header=False, index=False)
+for name, path in feeds.items():
+    span = None if spans is None else spans[path.name]
+    if span is None:
+        history_store.append_csv(name, path)
+    elif span[1] > span[0]:
+        history_store.append_csv(name, io.BytesIO(feed_loader.byte_range(path, *span)), replace=False)
+if added:
+    history_store.append("eta_multileg_final", new, replace=spans is None)
 print("✅ Parsed and merged ETA data successfully.")
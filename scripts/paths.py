@@ -0,0 +1,15 @@
+﻿import os
+from pathlib import Path
+
+# --- Project locations ---
+# Defaults to the repository checkout; TRANSSHIP_BASE (or TRANSSHIP_DATA / TRANSSHIP_DOCS)
+# points the scripts elsewhere, e.g. a Linux runner or a scratch copy.
+
+
+def locations(env=os.environ):
+    """(base, data, docs) directories for an environment mapping."""
+    base = Path(env.get("TRANSSHIP_BASE", Path(__file__).resolve().parents[1]))
+    return base, Path(env.get("TRANSSHIP_DATA", base / "data")), Path(env.get("TRANSSHIP_DOCS", base / "docs"))
+
+
+BASE, DATA_DIR, DOCS_DIR = locations()
@@ -0,0 +1,206 @@
+﻿import argparse, ast, hashlib, importlib.metadata, io, json, os, subprocess, sys, time, uuid
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+# --- Incremental DAG pipeline runner (replaces the serial run_full_pipeline.ps1 steps) ---
+# Stages declare the data/ and docs/ files they read and write; edges come from those
+# declarations (plus explicit `after` ordering). A stage is skipped when the fingerprint
+# of its inputs and code matches the last successful run and its outputs exist.
+# `always` stages pull live schedules, so they run every time; their downstream stages
+# still skip when the files they produce come out unchanged.
+
+SCRIPTS = Path(__file__).resolve().parent
+FEEDS = ("data/portconnect_departures.csv", "data/singapore_arrivals.csv", "data/japan_arrivals.csv")
+LEG_STATE = "data/aggregates/leg_state.json"   # leg_aggregates.STATE_PATH
+SECTIONS = ("summary", "baseline", "scenarios", "deferral", "dwell", "routing", "local_storage", "breakeven", "eta", "live")   # dashboard.SECTIONS
+
+
+def _plotly_bundle():
+    """chart_tiles' plotly.js bundle for the installed plotly (read from metadata, no import)."""
+    try:
+        return (f"docs/assets/plotly-{importlib.metadata.version('plotly')}.min.js",)
+    except importlib.metadata.PackageNotFoundError:
+        return ()
+
+
+Stage = namedtuple("Stage", "name script inputs outputs after always", defaults=((), (), (), False))
+STAGES = [
+    Stage("transit", "analyze_transit.py", always=True,
+          outputs=("data/delay_scenarios.csv", "docs/fragments/baseline.html", "docs/fragments/scenarios.html")),
+    Stage("sensitivity", "sensitivity_analysis.py", outputs=("docs/yard_sensitivity_chart.png",)),
+    Stage("dwell", "infer_dwell.py", always=True,
+          outputs=("data/inferred_dwell.csv", "docs/dwell_chart.png", "docs/fragments/dwell.html")),
+    Stage("deferral", "deferral_optimizer.py", inputs=("data/inferred_dwell.csv", "data/containers.csv"),
+          outputs=("data/deferral_summary.csv", "data/deferral_schedule.csv", "docs/fragments/deferral.html")),
+    Stage("routing", "routing.py", inputs=("data/inferred_dwell.csv", "data/routing_legs.csv"),
+          outputs=("data/routing_paths.csv", "docs/fragments/routing.html")),
+    Stage("local_storage", "local_storage_analysis.py",
+          outputs=("data/local_breakeven_summary.csv", "docs/local_breakeven_overview.png", "docs/local_storage.html",
+                   "docs/fragments/local_storage.html")),
+    Stage("breakeven", "breakeven_analysis.py",
+          outputs=("data/breakeven_summary.csv", "docs/breakeven.html", "docs/fragments/breakeven.html")),
+    Stage("breakeven_mc", "breakeven_montecarlo.py",
+          inputs=FEEDS + ("data/inferred_dwell.csv",), outputs=("data/breakeven_montecarlo.csv",)),
+    Stage("summary", "summary_metrics.py", inputs=("data/local_breakeven_summary.csv",),
+          outputs=("data/local_storage_summary.csv", "data/summary_metrics.json", "docs/fragments/summary.html")),
+    Stage("eta_feeds", "parse_api_feeds.py", inputs=FEEDS,
+          outputs=("data/eta_summary_comparison.csv", "data/eta_multileg_final.csv", LEG_STATE)),
+    Stage("eta_multileg", "eta_multileg_analysis.py", inputs=FEEDS + ("data/eta_multileg_final.csv", LEG_STATE),
+          outputs=("data/eta_multileg_summary.json", "data/eta_multileg_comparison.csv",
+                   "data/aggregates/eta_multileg_history.json")),
+    Stage("eta_dashboard", "update_eta_dashboard.py", inputs=FEEDS + (LEG_STATE,),
+          outputs=("docs/eta_multileg_chart.html", "docs/data/charts/eta_voyages/overview.json",
+                   "docs/fragments/eta.html") + _plotly_bundle()),
+    # Section scripts only write their fragments; the page is assembled once, from all of them
+    Stage("dashboard", "dashboard.py", inputs=tuple(f"docs/fragments/{name}.html" for name in SECTIONS),
+          outputs=("docs/index.html",)),
+]
+
+
+def resolve(rel, data_dir, docs_dir):
+    top, _, rest = rel.partition("/")
+    return {"data": data_dir, "docs": docs_dir}[top] / rest
+
+
+def dependencies(stages):
+    """{stage: set of upstream stages} from declared outputs -> inputs and `after`."""
+    producers = {}
+    for s in stages:
+        for out in s.outputs:
+            producers.setdefault(out, set()).add(s.name)
+    deps = {s.name: set(s.after) | {p for i in s.inputs for p in producers.get(i, ())} for s in stages}
+    for name in deps:
+        deps[name].discard(name)
+    seen = set()
+
+    def visit(name, trail=()):
+        if name in trail:
+            raise ValueError(f"pipeline cycle: {' -> '.join(trail + (name,))}")
+        if name not in seen:
+            for d in deps[name]:
+                visit(d, trail + (name,))
+            seen.add(name)
+    for name in deps:
+        visit(name)
+    return deps
+
+
+def local_modules(script, found=None):
+    """The script plus every sibling module it imports, transitively."""
+    found = found if found is not None else set()
+    path = SCRIPTS / script
+    if path in found or not path.exists():
+        return found
+    found.add(path)
+    for node in ast.walk(ast.parse(path.read_text(encoding="utf-8-sig"))):
+        names = [a.name for a in node.names] if isinstance(node, ast.Import) else \
+                [node.module] if isinstance(node, ast.ImportFrom) and node.module else []
+        for name in names:
+            local_modules(f"{name.split('.')[0]}.py", found)
+    return found
+
+
+def fingerprint(stage, data_dir, docs_dir):
+    h = hashlib.sha256()
+    for path in sorted(local_modules(stage.script)):
+        h.update(path.name.encode() + path.read_bytes())
+    for rel in stage.inputs:
+        path = resolve(rel, data_dir, docs_dir)
+        h.update(rel.encode() + (path.read_bytes() if path.exists() else b"<missing>"))
+    return h.hexdigest()
+
+
+def run_stage(stage, env):
+    t0 = time.perf_counter()
+    import transship   # a warm `transship serve` runs the stage without a cold interpreter start
+    out = io.BytesIO()
+    code = transship.request(["run", stage.script], env, out)
+    if code is not None:
+        return code == 0, out.getvalue().decode("utf-8", errors="replace"), time.perf_counter() - t0
+    proc = subprocess.run([sys.executable, str(SCRIPTS / stage.script)], env=env, cwd=SCRIPTS,
+                          capture_output=True)
+    output = (proc.stdout + proc.stderr).decode("utf-8", errors="replace")
+    return proc.returncode == 0, output, time.perf_counter() - t0
+
+
+def run(stages, data_dir, docs_dir, jobs=4, force=False, dry_run=False):
+    """Run the DAG; returns {stage: 'ran'|'skipped'|'failed'|'blocked'}."""
+    deps = dependencies(stages)
+    state_path = data_dir / ".pipeline_state.json"
+    state = json.loads(state_path.read_text()) if state_path.exists() else {}
+    env = {**os.environ, "PYTHONIOENCODING": "utf-8"}
+    by_name = {s.name: s for s in stages}
+    pending, running, done = dict(by_name), {}, {}
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            progressed = False
+            for name, stage in list(pending.items()):
+                if deps[name] & (set(pending) | set(running.values())):
+                    continue
+                del pending[name]
+                progressed = True
+                if any(done.get(d) in ("failed", "blocked") for d in deps[name]):
+                    done[name] = "blocked"
+                    print(f"⛔ {name}: blocked by a failed upstream stage")
+                    continue
+                outputs_exist = all(resolve(o, data_dir, docs_dir).exists() for o in stage.outputs)
+                if not (force or stage.always or not outputs_exist
+                        or state.get(name) != fingerprint(stage, data_dir, docs_dir)):
+                    done[name] = "skipped"
+                    print(f"⏭️ {name}: inputs unchanged")
+                elif dry_run:
+                    done[name] = "ran"
+                    print(f"▶️ {name}: would run {stage.script}")
+                else:
+                    print(f"▶️ {name}: running {stage.script}")
+                    running[pool.submit(run_stage, stage, env)] = name
+            if progressed or not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                ok, output, seconds = future.result()
+                print(output.rstrip())
+                if ok:
+                    done[name] = "ran"
+                    state[name] = fingerprint(by_name[name], data_dir, docs_dir)
+                    print(f"✅ {name} finished in {seconds:.1f}s")
+                else:
+                    done[name] = "failed"
+                    print(f"❌ {name} failed after {seconds:.1f}s")
+
+    if not dry_run:
+        state_path.write_text(json.dumps(state, indent=2))
+    return done
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Run the transshipment analysis pipeline incrementally")
+    ap.add_argument("--base", help="project root holding data/ and docs/ (default: this checkout)")
+    ap.add_argument("--jobs", type=int, default=4, help="stages to run in parallel")
+    ap.add_argument("--force", action="store_true", help="run every stage regardless of fingerprints")
+    ap.add_argument("--only", nargs="+", metavar="STAGE", help="run just these stages")
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args()
+
+    if args.base:
+        os.environ["TRANSSHIP_BASE"] = str(Path(args.base).resolve())
+    os.environ.setdefault("TRANSSHIP_RUN_ID", uuid.uuid4().hex[:12])   # stage scripts report under this run
+    from paths import DATA_DIR, DOCS_DIR
+    import instrument
+    DATA_DIR.mkdir(parents=True, exist_ok=True); DOCS_DIR.mkdir(parents=True, exist_ok=True)
+
+    stages = [s for s in STAGES if not args.only or s.name in args.only]
+    if args.only and len(stages) != len(args.only):
+        ap.error(f"unknown stage in {args.only}; known: {[s.name for s in STAGES]}")
+    print(f"🌊 Running pipeline in {DATA_DIR.parent} ({len(stages)} stages, {args.jobs} parallel)")
+    result = run([s._replace(after=tuple(a for a in s.after if a in {t.name for t in stages})) for s in stages],
+                 DATA_DIR, DOCS_DIR, args.jobs, args.force, args.dry_run)
+    if not args.dry_run:
+        manifest = instrument.write_manifest(statuses=result)
+        print(f"🧾 Run manifest → {instrument.MANIFEST_PATH} ({len(manifest['alerts'])} cost alert(s))")
+    summary = ", ".join(f"{k}={sum(v == k for v in result.values())}" for k in ("ran", "skipped", "failed", "blocked"))
+    print(f"🏁 Pipeline done: {summary}")
+    sys.exit(1 if any(v == "failed" for v in result.values()) else 0)
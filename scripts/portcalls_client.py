@@ -0,0 +1,133 @@
+﻿import json, os, time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urljoin, urlparse
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+import instrument
+from response_cache import ResponseCache
+
+# --- Shared PortCalls.io schedule fetcher ---
+# One pooled session, bounded concurrency across port/lane queries, pagination and
+# retry with exponential backoff. Point PORTCALLS_API at a local stub server to test.
+# Responses go through the on-disk ResponseCache; PORTCALLS_OFFLINE=1 serves cached
+# (possibly stale) pages without touching the network. A body "next" that is a URL or a
+# path/query ("/...", "?...") is followed as a link, anything else is sent back as the
+# cursor. A page requested twice, or more than max_pages per query, stops the fetch.
+
+API_URL = os.environ.get("PORTCALLS_API", "https://api.portcalls.io/v1/schedules")
+RETRY_STATUS = {429, 500, 502, 503, 504}
+OFFLINE = os.environ.get("PORTCALLS_OFFLINE", "") not in ("", "0")
+
+
+def _retry_after(value, default):
+    """Seconds to wait for a Retry-After header: delta-seconds or an HTTP-date."""
+    if value is None:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class PortCallsClient:
+    def __init__(self, base_url=API_URL, max_workers=4, timeout=15, retries=3, backoff=0.5, page_limit=100,
+                 cache=None, offline=OFFLINE, max_pages=1000):
+        self.base_url, self.max_workers, self.timeout = base_url, max_workers, timeout
+        self.retries, self.backoff, self.page_limit = retries, backoff, page_limit
+        self.max_pages = max_pages
+        self.cache = ResponseCache() if cache is None else cache
+        self.offline = offline
+        self.session = requests.Session()
+        self.session.headers["accept"] = "application/json"
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _get(self, url, params, headers=None):
+        """GET one page, retrying connection errors and 429/5xx with exponential backoff."""
+        for attempt in range(self.retries + 1):
+            t0 = time.perf_counter()
+            try:
+                res = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+                instrument.http(time.perf_counter() - t0, res.status_code)
+                if res.status_code not in RETRY_STATUS:
+                    res.raise_for_status()
+                    return res
+                delay = _retry_after(res.headers.get("Retry-After"), self.backoff * 2 ** attempt)
+                error = requests.HTTPError(f"{res.status_code} from {url}", response=res)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                instrument.http(time.perf_counter() - t0, None)
+                delay, error = self.backoff * 2 ** attempt, e
+            if attempt < self.retries:
+                time.sleep(delay)
+        raise error
+
+    def _page(self, url, params):
+        """Return (body, next_url) for one page, from cache when fresh or revalidated."""
+        entry = self.cache.get(url, params) if self.cache else None
+        if entry and (self.offline or self.cache.is_fresh(entry)):
+            instrument.cache("offline" if self.offline else "fresh")
+            return entry["body"], entry["next_url"]
+        if self.offline:
+            raise LookupError(f"offline and no cached response for {url} {params}")
+        try:
+            res = self._get(url, params, self.cache.validators(entry) if entry else None)
+        except requests.RequestException:
+            if entry:   # stale-if-error
+                instrument.cache("stale")
+                return entry["body"], entry["next_url"]
+            raise
+        if res.status_code == 304 and entry:
+            entry = self.cache.revalidated(url, params, entry)
+            instrument.cache("revalidated")
+            return entry["body"], entry["next_url"]
+        body, next_url = res.json(), res.links.get("next", {}).get("url")
+        if self.cache:
+            self.cache.put(url, params, body, res.headers, next_url)
+        return body, next_url
+
+    def fetch(self, params):
+        """Fetch every page of one schedule query into a single DataFrame."""
+        url, params = self.base_url, {"limit": self.page_limit, **params}
+        frames, seen = [], set()
+        while url:
+            page = (url, json.dumps(params, sort_keys=True, default=str))
+            if page in seen:
+                raise RuntimeError(f"pagination loop: {url} {params} was already fetched")
+            if len(seen) >= self.max_pages:
+                raise RuntimeError(f"more than {self.max_pages} pages for {params}")
+            seen.add(page)
+            body, next_url = self._page(url, params)
+            frames.append(pd.DataFrame(body.get("results", [])))
+            nxt = body.get("next")
+            if nxt and (urlparse(str(nxt)).scheme in ("http", "https") or str(nxt).startswith(("/", "?"))):
+                url, params = urljoin(url, str(nxt)), None   # absolute or relative next-page link
+            elif nxt:
+                params = {**(params or {}), "cursor": nxt}   # opaque cursor token (may contain "/")
+            elif next_url:
+                url, params = urljoin(url, next_url), None   # Link header, possibly relative
+            else:
+                break
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def fetch_many(self, queries):
+        """Run queries concurrently; returns one DataFrame or Exception per query, in order."""
+        def run(params):
+            try:
+                return self.fetch(params)
+            except Exception as e:
+                return e
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(run, queries))
@@ -0,0 +1,105 @@
+﻿import hashlib, json, os, threading, time, uuid
+from pathlib import Path
+from urllib.parse import urlparse
+
+from paths import DATA_DIR
+
+# --- Persistent HTTP response cache ---
+# Entries are content-addressed by endpoint + params and stored as JSON under data/cache.
+# Freshness is a per-endpoint TTL; stale entries keep their ETag/Last-Modified for
+# conditional revalidation and are evicted least-recently-used once the cache is too big.
+# Fetcher threads share one cache: writes go through unique temp files and eviction runs
+# one thread at a time, tolerating entries that disappear under it. The cache's size is
+# kept as a running total (one scan when first needed, then each write's change), so
+# the directory is only scanned again when a write takes it past max_bytes.
+
+CACHE_DIR = Path(os.environ.get("PORTCALLS_CACHE_DIR", DATA_DIR / "cache"))
+ENDPOINT_TTL = {"/v1/schedules": 6 * 3600}   # seconds; schedules move slowly
+
+
+class ResponseCache:
+    def __init__(self, root=CACHE_DIR, ttl=None, default_ttl=3600, max_bytes=64 * 2**20):
+        self.root, self.default_ttl, self.max_bytes = Path(root), default_ttl, max_bytes
+        self.ttl = {**ENDPOINT_TTL, **(ttl or {})}
+        self._evicting, self._sizing = threading.Lock(), threading.Lock()
+        self._total = None   # bytes on disk as of the last scan plus writes since; None until scanned
+
+    def key(self, url, params):
+        raw = json.dumps([url, sorted((params or {}).items())], default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, url, params):
+        """Return the stored entry (fresh or stale) or None; marks it as recently used."""
+        path = self._path(self.key(url, params))
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:   # evicted since it was read; the entry is still good
+            pass
+        return entry
+
+    def is_fresh(self, entry):
+        ttl = self.ttl.get(urlparse(entry["url"]).path, self.default_ttl)
+        return time.time() - entry["stored"] < ttl
+
+    def put(self, url, params, body, headers=None, next_url=None):
+        headers = headers or {}
+        entry = {"url": url, "params": params, "stored": time.time(), "body": body, "next_url": next_url,
+                 "etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified")}
+        path = self._path(self.key(url, params))
+        self._write(path, entry)
+        return entry
+
+    def _write(self, path, entry):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        data = json.dumps(entry, default=str).encode("utf-8")
+        tmp.write_bytes(data)
+        try:
+            old = path.stat().st_size
+        except FileNotFoundError:
+            old = 0
+        os.replace(tmp, path)
+        with self._sizing:
+            if self._total is not None:
+                self._total += len(data) - old
+            over = self._total is None or self._total > self.max_bytes
+        if over:
+            self._evict()
+
+    def revalidated(self, url, params, entry):
+        """Mark an entry fresh again after a 304 Not Modified."""
+        entry["stored"] = time.time()
+        self._write(self._path(self.key(url, params)), entry)
+        return entry
+
+    def validators(self, entry):
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def _evict(self):
+        with self._evicting:
+            files = []
+            for p in self.root.glob("*/*.json"):
+                try:
+                    files.append((p.stat(), p))
+                except FileNotFoundError:   # replaced or removed by another thread meanwhile
+                    pass
+            total = sum(st.st_size for st, _ in files)
+            for st, p in sorted(files, key=lambda f: f[0].st_mtime):
+                if total <= self.max_bytes:
+                    break
+                p.unlink(missing_ok=True)
+                total -= st.st_size
+            with self._sizing:
+                self._total = total
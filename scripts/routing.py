@@ -0,0 +1,259 @@
+﻿import argparse, datetime, os, time, uuid
+
+import numpy as np
+import pandas as pd
+
+import dashboard
+import instrument
+from paths import DATA_DIR
+
+# --- Multi-hub routing graph ---
+# NZ cargo can transship at several hubs, not only Singapore. Ports and hubs form a
+# directed graph. Each leg is weighted two ways: elapsed days (sailing plus the dwell at
+# the hub it leaves from) and NZD per TEU (freight plus that hub's handling and dwell
+# storage). The fastest and cheapest paths between every pair of nodes come from one
+# batched Dijkstra per metric (scipy.sparse.csgraph).
+#
+# The all-pairs distances and predecessors are cached in data/cache/routing.npz, along
+# with the edge weights they were solved from. The next run looks only at edges whose
+# weights changed. A source row is re-solved when a changed edge got dearer and lies on
+# its shortest-path tree, or got cheaper and now shortens one of its paths. Every other
+# row is still optimal and is kept.
+
+NZ_PORTS = ["NZAKL", "NZTRG", "NZLYT"]
+OUT_PORTS = ["NLRTM", "CNSHA", "USLAX", "GBSOU"]   # Rotterdam, Shanghai, LA, Southampton
+HUBS = {   # hub: (name, handling NZD/TEU, storage NZD/day/TEU, default dwell days)
+    "SGSIN": ("Singapore", 380.0, 30.0, 7.0),
+    "MYPKG": ("Port Klang", 330.0, 22.0, 5.0),
+    "KRPUS": ("Busan", 350.0, 26.0, 4.0),
+}
+PRIMARY_HUB = "SGSIN"   # the hub infer_dwell observes
+LEGS = {   # reference (sailing days, freight NZD/TEU) per leg; Singapore mainline services run the biggest ships
+    ("NZAKL", "SGSIN"): (12.3, 700.0), ("NZTRG", "SGSIN"): (11.8, 690.0), ("NZLYT", "SGSIN"): (13.5, 730.0),
+    ("NZAKL", "MYPKG"): (12.9, 780.0), ("NZTRG", "MYPKG"): (12.4, 770.0), ("NZLYT", "MYPKG"): (14.1, 810.0),
+    ("NZAKL", "KRPUS"): (13.6, 820.0), ("NZTRG", "KRPUS"): (13.2, 810.0), ("NZLYT", "KRPUS"): (15.0, 860.0),
+    ("SGSIN", "MYPKG"): (1.0, 110.0), ("MYPKG", "SGSIN"): (1.0, 110.0), ("SGSIN", "KRPUS"): (6.2, 430.0),
+    ("KRPUS", "SGSIN"): (6.2, 430.0), ("MYPKG", "KRPUS"): (6.8, 470.0), ("KRPUS", "MYPKG"): (6.8, 470.0),
+    ("SGSIN", "NLRTM"): (24.0, 1150.0), ("SGSIN", "CNSHA"): (5.8, 420.0),
+    ("SGSIN", "USLAX"): (21.5, 1250.0), ("SGSIN", "GBSOU"): (25.0, 1180.0),
+    ("MYPKG", "NLRTM"): (23.2, 1250.0), ("MYPKG", "CNSHA"): (6.5, 460.0),
+    ("MYPKG", "USLAX"): (22.5, 1350.0), ("MYPKG", "GBSOU"): (24.3, 1290.0),
+    ("KRPUS", "NLRTM"): (33.0, 1750.0), ("KRPUS", "CNSHA"): (1.8, 200.0),
+    ("KRPUS", "USLAX"): (11.5, 800.0), ("KRPUS", "GBSOU"): (34.0, 1800.0),
+}
+FREIGHT_BASE, FREIGHT_PER_DAY = 120.0, 55.0   # NZD/TEU for routing_legs.csv rows without Freight_NZD
+METRICS = ("Days", "Cost_NZD")
+LEGS_PATH = DATA_DIR / "routing_legs.csv"
+DWELL_PATH = DATA_DIR / "inferred_dwell.csv"
+CACHE_PATH = DATA_DIR / "cache" / "routing.npz"
+PATHS_PATH = DATA_DIR / "routing_paths.csv"
+EPS = 1e-9
+
+
+def legs(path=LEGS_PATH):
+    """Legs (From, To, Transit_Days, Freight_NZD): LEGS plus any rows of data/routing_legs.csv, which win."""
+    df = pd.DataFrame([(a, b, d, f) for (a, b), (d, f) in LEGS.items()],
+                      columns=["From", "To", "Transit_Days", "Freight_NZD"])
+    try:
+        extra = pd.read_csv(path, encoding="utf-8-sig")
+    except FileNotFoundError:
+        extra = None
+    if extra is not None and len(extra):
+        df = pd.concat([df, extra], ignore_index=True).drop_duplicates(["From", "To"], keep="last")
+    df["Freight_NZD"] = df["Freight_NZD"].fillna(FREIGHT_BASE + FREIGHT_PER_DAY * df["Transit_Days"])
+    return df.reset_index(drop=True)
+
+
+def hub_dwell(path=DWELL_PATH):
+    """Dwell days per hub: the defaults, with the primary hub's from the inferred dwell data when there is any."""
+    dwell = {hub: terms[3] for hub, terms in HUBS.items()}
+    try:
+        observed = pd.read_csv(path, encoding="utf-8-sig")["Dwell_Days"].dropna()
+    except (FileNotFoundError, KeyError):
+        observed = pd.Series(dtype=float)
+    if len(observed):
+        dwell[PRIMARY_HUB] = float(observed.mean())
+    return dwell
+
+
+def edge_weights(legs, dwell):
+    """Per-leg Days and Cost_NZD; a leg leaving a hub carries that hub's dwell, handling and storage."""
+    hub = legs["From"].isin(HUBS)
+    dwell_days = legs["From"].map(dwell).where(hub, 0.0)
+    handling = legs["From"].map({h: t[1] for h, t in HUBS.items()}).where(hub, 0.0)
+    storage = legs["From"].map({h: t[2] for h, t in HUBS.items()}).where(hub, 0.0)
+    return pd.DataFrame({"From": legs["From"], "To": legs["To"],
+                         "Days": legs["Transit_Days"] + dwell_days,
+                         "Cost_NZD": legs["Freight_NZD"] + handling + storage * dwell_days})
+
+
+def node_order(edges):
+    """NZ ports, hubs and onward ports first, then any other node in the legs, sorted."""
+    known = NZ_PORTS + list(HUBS) + OUT_PORTS
+    return known + sorted((set(edges["From"]) | set(edges["To"])) - set(known))
+
+
+def edge_arrays(edges, nodes):
+    """(sorted edge keys from * n + to, weights of shape (edges, metrics)); parallel legs keep the minimum."""
+    idx = {node: i for i, node in enumerate(nodes)}
+    e = edges.groupby(["From", "To"], as_index=False)[list(METRICS)].min()
+    keys = e["From"].map(idx).to_numpy(np.int64) * len(nodes) + e["To"].map(idx).to_numpy(np.int64)
+    order = np.argsort(keys)
+    return keys[order], e[list(METRICS)].to_numpy(float)[order]
+
+
+def _lookup(keys, values, query):
+    """values[keys == query] per query key, inf where the edge doesn't exist."""
+    if not len(keys):
+        return np.full(len(query), np.inf)
+    i = np.minimum(np.searchsorted(keys, query), len(keys) - 1)
+    return np.where(keys[i] == query, values[i], np.inf)
+
+
+class AllPairs:
+    """Shortest distances and predecessors from every node, for each metric."""
+
+    def __init__(self, nodes, keys, weights, dist, pred):
+        self.nodes, self.keys, self.weights, self.dist, self.pred = list(nodes), keys, weights, dist, pred
+
+    @classmethod
+    def load(cls, path=CACHE_PATH):
+        try:
+            with np.load(path) as z:
+                return cls(z["nodes"].tolist(), z["keys"], z["weights"], z["dist"], z["pred"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, path=CACHE_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, nodes=np.array(self.nodes), keys=self.keys, weights=self.weights, dist=self.dist, pred=self.pred)
+        os.replace(tmp, path)
+
+    def stale_rows(self, keys, weights, m):
+        """Source rows whose metric-m result the new edge weights can change."""
+        every = np.union1d(self.keys, keys)
+        old, new = _lookup(self.keys, self.weights[:, m], every), _lookup(keys, weights[:, m], every)
+        changed = old != new
+        u, v = np.divmod(every[changed], len(self.nodes))
+        old, new = old[changed], new[changed]
+        dearer = new > old
+        dist, pred = self.dist[m], self.pred[m]
+        stale = (pred[:, v[dearer]] == u[dearer]).any(axis=1)
+        cheaper = ~dearer
+        stale |= (dist[:, u[cheaper]] + new[cheaper] < dist[:, v[cheaper]] - EPS).any(axis=1)
+        return np.flatnonzero(stale)
+
+    @classmethod
+    def build(cls, nodes, keys, weights, previous=None):
+        """Solve every row, or only the rows of `previous` the changed edges can affect; returns (result, rows solved per metric)."""
+        from scipy.sparse import csr_matrix
+        from scipy.sparse.csgraph import dijkstra
+        n = len(nodes)
+        reuse = previous is not None and previous.nodes == list(nodes) and previous.dist.shape[0] == len(METRICS)
+        if reuse:
+            dist, pred = previous.dist.copy(), previous.pred.copy()
+        else:
+            dist = np.full((len(METRICS), n, n), np.inf)
+            pred = np.full((len(METRICS), n, n), -9999, dtype=np.int32)
+        solved = []
+        for m in range(len(METRICS)):
+            rows = previous.stale_rows(keys, weights, m) if reuse else np.arange(n)
+            if len(rows):
+                graph = csr_matrix((weights[:, m], np.divmod(keys, n)), shape=(n, n))
+                dist[m, rows], pred[m, rows] = dijkstra(graph, directed=True, indices=rows, return_predecessors=True)
+            solved.append(len(rows))
+        return cls(nodes, keys, weights, dist, pred), solved
+
+    def path(self, m, source, target):
+        """Node names along the metric-m shortest path, or None when target is unreachable."""
+        s, t = self.nodes.index(source), self.nodes.index(target)
+        if not np.isfinite(self.dist[m, s, t]):
+            return None
+        out = [t]
+        while out[-1] != s:
+            out.append(int(self.pred[m, s, out[-1]]))
+        return [self.nodes[i] for i in reversed(out)]
+
+    def along(self, route):
+        """Totals of every metric along a route of node names."""
+        idx = [self.nodes.index(node) for node in route]
+        keys = np.array(idx[:-1], dtype=np.int64) * len(self.nodes) + np.array(idx[1:], dtype=np.int64)
+        return [float(_lookup(self.keys, self.weights[:, m], keys).sum()) for m in range(len(METRICS))]
+
+
+def solve(edges, cache_path=CACHE_PATH):
+    """All-pairs result for these edges, reusing the cached rows they can't affect; returns (AllPairs, rows solved per metric)."""
+    nodes = node_order(edges)
+    keys, weights = edge_arrays(edges, nodes)
+    previous = AllPairs.load(cache_path) if cache_path else None
+    if previous is not None and previous.nodes == nodes and np.array_equal(previous.keys, keys) \
+            and np.array_equal(previous.weights, weights):
+        return previous, [0] * len(METRICS)
+    result, solved = AllPairs.build(nodes, keys, weights, previous)
+    if cache_path:
+        result.save(cache_path)
+    return result, solved
+
+
+def _via(route):
+    return " → ".join(route[1:-1]) or "direct"
+
+
+def route_table(pairs, origins=NZ_PORTS, destinations=OUT_PORTS):
+    """Cheapest and fastest path for every origin x destination pair."""
+    fast, cheap = METRICS.index("Days"), METRICS.index("Cost_NZD")
+    rows = []
+    for o in origins:
+        for d in destinations:
+            fastest, cheapest = pairs.path(fast, o, d), pairs.path(cheap, o, d)
+            if fastest is None:
+                continue
+            f_days, f_cost = pairs.along(fastest)
+            c_days, c_cost = pairs.along(cheapest)
+            rows.append({"Origin": o, "Destination": d, "Cheapest_Via": _via(cheapest),
+                         "Cheapest_Cost_NZD": c_cost, "Cheapest_Days": c_days, "Fastest_Via": _via(fastest),
+                         "Fastest_Days": f_days, "Fastest_Cost_NZD": f_cost})
+    return pd.DataFrame(rows).round(2)
+
+
+def render_routing(d):
+    r = d["routes"]
+    split = int((r["Cheapest_Via"] != r["Fastest_Via"]).sum())
+    return f"""
+<p style='text-align:center;'>Last updated: {d['date']} · {len(r)} NZ origin × destination pairs via
+{', '.join(d['hubs'])} · {split} where the fastest route is not the cheapest</p>
+{dashboard.table(r, 'routing_paths')}
+<p style='text-align:center;color:gray;font-size:14px;'>
+*Costs are NZD per TEU: leg freight plus handling and dwell storage at each transshipment hub.
+Days include the hub dwell ({d['dwell']}).*</p>"""
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Cheapest and fastest NZ routes through the transshipment hubs")
+    ap.add_argument("--no-cache", action="store_true", help="solve every pair from scratch")
+    args = ap.parse_args()
+
+    instrument.stage("graph")
+    today = datetime.date.today()
+    dwell = hub_dwell()
+    edges = edge_weights(legs(), dwell)
+
+    instrument.stage("solve")
+    t0 = time.perf_counter()
+    result, solved = solve(edges, None if args.no_cache else CACHE_PATH)
+    print(f"🧭 {len(result.nodes)} nodes, {len(result.keys)} legs: re-solved "
+          + ", ".join(f"{s}/{len(result.nodes)} {m} rows" for m, s in zip(METRICS, solved))
+          + f" in {time.perf_counter() - t0:.3f}s")
+
+    instrument.stage("report")
+    routes = route_table(result)
+    routes.to_csv(PATHS_PATH, index=False)
+    print(routes.to_string(index=False))
+    print(f"💾 Routes → {PATHS_PATH.name}")
+
+    instrument.stage("html")
+    dashboard.write_section("routing", render_routing, {
+        "date": today, "routes": routes, "hubs": [f"{HUBS[h][0]} ({h})" for h in HUBS],
+        "dwell": ", ".join(f"{h} {dwell[h]:.1f} d" for h in HUBS)})
@@ -0,0 +1,103 @@
+﻿import numpy as np
+import pandas as pd
+
+# --- N-dimensional deferred-departure scenario grid ---
+# Evaluates the per-TEU deferral cost model over the Cartesian product of any parameter
+# axes with NumPy broadcasting. Large grids are processed in flat-index chunks and can be
+# written straight into a .npy memmap so only the result, never the temporaries, is big.
+
+DEFAULTS = {
+    "delay_days": 0,            # days held in the NZ yard before departure
+    "yard_rate": 15,            # NZ yard NZD/day/TEU
+    "sg_rate": 30,              # SG storage NZD/day/TEU
+    "delay_to_sg_ratio": 0.8,   # SG dwell days saved per NZ delay day
+    "handling": 380,            # SG handling + THC + admin NZD/TEU
+    "avg_stay": 7,              # baseline SG dwell days
+    "containers": 1,
+    "fx": 1.0,                  # NZD -> reporting currency
+}
+METRICS = ("reduced_sg_days", "current_cost", "deferred_cost", "savings_per_teu", "fleet_savings")
+
+
+def deferred_cost_model(delay_days=0, yard_rate=15, sg_rate=30, delay_to_sg_ratio=0.8, handling=380,
+                        avg_stay=7, containers=1, fx=1.0):
+    """Broadcast the deferral cost model over array-like inputs; returns {metric: array}."""
+    delay_days, avg_stay = np.asarray(delay_days), np.asarray(avg_stay)
+    reduced = np.maximum(1, avg_stay - delay_days * np.asarray(delay_to_sg_ratio))
+    current = handling + np.asarray(sg_rate) * avg_stay
+    deferred = handling + np.asarray(sg_rate) * reduced + np.asarray(yard_rate) * delay_days
+    savings = current - deferred
+    return {"reduced_sg_days": reduced, "current_cost": current, "deferred_cost": deferred,
+            "savings_per_teu": savings, "fleet_savings": savings * np.asarray(containers) * np.asarray(fx)}
+
+
+class ScenarioGrid:
+    """Result values labeled by named axes, sliceable into pivots like the yard heatmap."""
+
+    def __init__(self, axes, values, metric):
+        self.axes, self.values, self.metric = axes, values, metric
+
+    @property
+    def dims(self):
+        return list(self.axes)
+
+    def sel(self, **coords):
+        """Fix some axes at given labels, dropping them from the grid."""
+        index, axes = [], {}
+        for name, labels in self.axes.items():
+            if name in coords:
+                index.append(int(np.flatnonzero(labels == coords[name])[0]))
+            else:
+                index.append(slice(None))
+                axes[name] = labels
+        return ScenarioGrid(axes, self.values[tuple(index)], self.metric)
+
+    def pivot(self, index, columns, agg="max"):
+        """2-D DataFrame over two axes, reducing every other axis with `agg`."""
+        others = tuple(i for i, name in enumerate(self.dims) if name not in (index, columns))
+        values = getattr(np, agg)(self.values, axis=others) if others else np.asarray(self.values)
+        if self.dims.index(index) > self.dims.index(columns):
+            values = values.T
+        return pd.DataFrame(values, index=pd.Index(self.axes[index], name=index),
+                            columns=pd.Index(self.axes[columns], name=columns))
+
+    def best(self):
+        """Axis labels of the maximum value."""
+        pos = np.unravel_index(np.nanargmax(self.values), self.values.shape)
+        return {name: labels[i] for (name, labels), i in zip(self.axes.items(), pos)}
+
+    def to_frame(self):
+        mesh = np.meshgrid(*self.axes.values(), indexing="ij")
+        cols = {name: m.ravel() for name, m in zip(self.axes, mesh)}
+        return pd.DataFrame({**cols, self.metric: np.asarray(self.values).ravel()})
+
+
+def evaluate_grid(axes, fixed=None, metric="savings_per_teu", chunk_size=2**21, memmap_path=None):
+    """Evaluate `metric` over the full Cartesian grid of `axes` ({name: values}).
+
+    Parameters not given as axes come from `fixed`, then DEFAULTS. With `memmap_path`
+    the result is a .npy memmap on disk, for grids larger than memory.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"unknown metric {metric!r}; expected one of {METRICS}")
+    unknown = set(axes) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"unknown axes {sorted(unknown)}")
+    axes = {name: np.asarray(list(values)) for name, values in axes.items()}
+    params = {**DEFAULTS, **(fixed or {})}
+    shape = tuple(len(v) for v in axes.values())
+    total = int(np.prod(shape))
+
+    if memmap_path is not None:
+        out = np.lib.format.open_memmap(memmap_path, mode="w+", dtype=np.float64, shape=shape)
+    else:
+        out = np.empty(shape, dtype=np.float64)
+    flat = out.reshape(-1)
+
+    for start in range(0, total, chunk_size):
+        idx = np.unravel_index(np.arange(start, min(start + chunk_size, total)), shape)
+        chunk = {**params, **{name: labels[i] for (name, labels), i in zip(axes.items(), idx)}}
+        flat[start:start + len(idx[0])] = deferred_cost_model(**chunk)[metric]
+    if memmap_path is not None:
+        out.flush()
+    return ScenarioGrid(axes, out, metric)
@@ -0,0 +1,165 @@
+﻿import argparse, datetime, json, os, time, uuid
+from pathlib import Path
+
+import numpy as np
+
+from paths import DATA_DIR
+
+# --- Persistent departure index for connection queries ---
+# Each (hub, destination) lane is a sorted int64 array of departure times (epoch seconds,
+# UTC) stored as .npy under data/schedule_index/ and opened memory-mapped, so a lookup
+# only touches the pages binary search visits. A query like "next SGSIN -> NLRTM sailing
+# at least 24 h after this arrival" is one np.searchsorted call. A whole batch of
+# arrivals is one vectorized call. Only NumPy is imported here, not pandas.
+#
+# update() merges new departures into just the lanes they touch and drops duplicates.
+# Each rewritten lane gets a new file name and lanes.json is swapped last, so readers
+# that already have a lane mapped keep a consistent snapshot. A reader whose manifest
+# names a lane file that has since been replaced rereads lanes.json and maps the new one.
+
+INDEX_DIR = DATA_DIR / "schedule_index"
+MANIFEST = "lanes.json"
+NAT = np.datetime64("NaT", "s")
+NAT_SECONDS = np.iinfo(np.int64).min   # what NaT becomes as int64 seconds
+
+
+def _seconds(times):
+    """Epoch seconds (int64) for datetimes, datetime64 values, ISO strings or epoch numbers; NaT stays NaT's int."""
+    t = np.asarray(times)
+    if t.dtype.kind in "iuf":
+        return t.astype(np.int64)
+    if t.dtype == object:   # datetime / Timestamp objects; NaT (pandas' too) is the one not equal to itself
+        t = np.array([NAT if v != v else v for v in t.ravel()], "datetime64[s]").reshape(t.shape)
+    return t.astype("datetime64[s]").astype(np.int64)
+
+
+def _span(min_connection):
+    """Seconds in a timedelta, a timedelta64 or a number of seconds."""
+    if isinstance(min_connection, datetime.timedelta):
+        return int(min_connection.total_seconds())
+    if isinstance(min_connection, np.timedelta64):
+        return int(min_connection.astype("timedelta64[s]").astype(np.int64))
+    return int(min_connection)
+
+
+def lanes_from_frame(df, hub_col="from", dest_col="to", time_col="etd"):
+    """{(hub, dest): departure datetime64 values} from a PortCalls-shaped departures frame."""
+    import pandas as pd
+    times = pd.to_datetime(df[time_col], utc=True, errors="coerce").dt.tz_localize(None)
+    frame = pd.DataFrame({"hub": df[hub_col].to_numpy(), "dest": df[dest_col].to_numpy(), "t": times.to_numpy()})
+    frame = frame.dropna()
+    return {(h, d): g["t"].to_numpy("datetime64[s]") for (h, d), g in frame.groupby(["hub", "dest"], sort=False)}
+
+
+class ScheduleIndex:
+    """Sorted departure times per (hub, destination) lane, memory-mapped from `root`."""
+
+    def __init__(self, root=INDEX_DIR):
+        self.root, self._maps = Path(root), {}
+        self.manifest = self._read_manifest()
+
+    def _read_manifest(self):
+        try:
+            return json.loads((self.root / MANIFEST).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+
+    def lanes(self):
+        return sorted(tuple(key.split(">")) for key in self.manifest)
+
+    def times(self, hub, dest):
+        """The lane's departures as sorted epoch seconds (read-only; empty for an unknown lane)."""
+        key = f"{hub}>{dest}"
+        if key not in self._maps:
+            try:
+                self._maps[key] = self._load(key)
+            except FileNotFoundError:   # another process replaced the lane since our manifest was read
+                self.manifest = self._read_manifest()
+                self._maps = {}
+                self._maps[key] = self._load(key)
+        return self._maps[key]
+
+    def _load(self, key):
+        info = self.manifest.get(key)
+        return np.load(self.root / info["file"], mmap_mode="r") if info else np.empty(0, np.int64)
+
+    def _search(self, hub, dest, after, min_connection):
+        t, gap = self.times(hub, dest), _span(min_connection)
+        q = _seconds(after)
+        # no connection time: strictly after the arrival; otherwise at least that long after
+        i = np.searchsorted(t, q + gap, side="right" if gap <= 0 else "left")
+        return t, i
+
+    def next_departure(self, hub, dest, after, min_connection=0):
+        """First departure on the lane after `after` (+ min_connection), as datetime64[s], or None."""
+        if _seconds(after) == NAT_SECONDS:   # no arrival time, no connection
+            return None
+        t, i = self._search(hub, dest, after, min_connection)
+        return t[i].astype("datetime64[s]") if i < len(t) else None
+
+    def next_departures(self, hub, dest, arrivals, min_connection=0):
+        """Vectorized next_departure for an array of arrivals; NaT where there is none."""
+        arrivals = np.asarray(arrivals)
+        t, i = self._search(hub, dest, arrivals, min_connection)
+        ok = i < len(t)
+        if arrivals.dtype.kind not in "iuf":
+            ok &= ~np.isnat(arrivals.astype("datetime64[s]"))
+        out = np.full(len(i), NAT)
+        out[ok] = t[i[ok]].astype("datetime64[s]")
+        return out
+
+    def update(self, lanes):
+        """Merge {(hub, dest): departure times} into the index; returns the number of new departures."""
+        added, stale = 0, []
+        for (hub, dest), values in lanes.items():
+            key, new = f"{hub}>{dest}", _seconds(values)
+            new = np.unique(new[new != NAT_SECONDS])   # drop NaT
+            old = np.asarray(self.times(hub, dest))
+            merged = np.union1d(old, new)
+            if len(merged) == len(old):
+                continue
+            added += len(merged) - len(old)
+            self.root.mkdir(parents=True, exist_ok=True)
+            name = f"{hub}-{dest}.{uuid.uuid4().hex[:8]}.npy"
+            tmp = self.root / f".{name}.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, merged)
+            os.replace(tmp, self.root / name)
+            if key in self.manifest:
+                stale.append(self.manifest[key]["file"])
+            self.manifest[key] = {"file": name, "count": int(len(merged)),
+                                  "first": str(merged[0].astype("datetime64[s]")),
+                                  "last": str(merged[-1].astype("datetime64[s]"))}
+            self._maps.pop(key, None)
+        if added:
+            tmp = self.root / f".{MANIFEST}.{uuid.uuid4().hex[:8]}.tmp"
+            tmp.write_text(json.dumps(self.manifest, indent=1, sort_keys=True), encoding="utf-8")
+            os.replace(tmp, self.root / MANIFEST)
+            for name in stale:   # best effort: a reader may still have the old file mapped (Windows)
+                try:
+                    (self.root / name).unlink()
+                except OSError:
+                    pass
+        return added
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Query the persistent departure index (no arguments: list lanes)")
+    ap.add_argument("hub", nargs="?")
+    ap.add_argument("dest", nargs="?")
+    ap.add_argument("after", nargs="?", help="arrival time, e.g. '2025-11-03 08:00' (UTC)")
+    ap.add_argument("--min-hours", type=float, default=0.0, help="minimum connection time")
+    args = ap.parse_args()
+
+    index = ScheduleIndex()
+    if not args.after:
+        for key, info in sorted(index.manifest.items()):
+            print(f"🗂️ {key:<14} {info['count']:>8,} departures  {info['first']} → {info['last']}")
+        if not index.manifest:
+            print(f"ℹ️ No departures indexed under {index.root} yet (infer_dwell.py fills it)")
+    else:
+        t0 = time.perf_counter()
+        dep = index.next_departure(args.hub, args.dest, np.datetime64(args.after), int(args.min_hours * 3600))
+        us = (time.perf_counter() - t0) * 1e6
+        print(f"🚢 {args.hub} → {args.dest} after {args.after} (+{args.min_hours:g} h): "
+              f"{dep if dep is not None else 'no departure indexed'}  ({us:.0f} µs)")
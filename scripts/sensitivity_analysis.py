@@ -0,0 +1,27 @@
+﻿import numpy as np
+import charts
+from chart_render import ChartJob, describe, render_all
+from paths import DOCS_DIR
+import instrument
+from scenario_grid import evaluate_grid
+
+# --- Sensitivity of per-TEU savings to NZ yard cost and delay ---
+# The heatmap shown in the baseline section. SG rate, handling, dwell and the delay ratio
+# come from scenario_grid.DEFAULTS (the analyze_transit assumptions), so the grid only
+# changes with the cost model and reruns only then.
+
+docs_dir = DOCS_DIR
+docs_dir.mkdir(exist_ok=True)
+
+instrument.stage("sensitivity")
+print("📈 Running sensitivity analysis...")
+yard_rates, delays = range(10, 26, 3), np.arange(0, 8)
+grid = evaluate_grid({"yard_rate": yard_rates, "delay_days": delays})
+pivot = grid.pivot("yard_rate", "delay_days")
+
+instrument.stage("rendering")
+chart = ChartJob(docs_dir / "yard_sensitivity_chart.png", charts.heatmap,
+                 {"values": pivot.to_numpy(), "rows": list(pivot.index), "cols": list(pivot.columns)},
+                 {"figsize": (8,6), "title": "Sensitivity of Savings per TEU to Yard Cost and Delay",
+                  "xlabel": "Delay in NZ (days)", "ylabel": "NZ Yard Cost (NZD/day)", "cbar_label": "Savings per TEU (NZD)"})
+print(f"🖼️ Charts: {describe(render_all([chart]))}")
@@ -0,0 +1,154 @@
+﻿import argparse, time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from paths import DATA_DIR
+import container_costs
+
+# --- Seeded synthetic port calls at production volume ---
+# The checked-in feeds have three rows each, which says nothing about how the joins,
+# grids and charts scale. This generates NZ departures, Singapore arrivals and Japan
+# arrivals (same columns as the real feeds) for fleets of vessels on repeating NZ -> SG
+# -> JP rotations, plus PortCalls-shaped hub arrivals/onward departures for the dwell
+# matcher. Output is deterministic for a given (rows, seed), IMO-sorted like the feeds
+# leg_join expects, and generated in vessel blocks so 10^7 rows never sit in memory at once.
+
+START = pd.Timestamp("2024-01-01")
+NZ_PORTS = ["NZAKL", "NZTRG", "NZLYT"]
+OUT_PORTS = ["NLRTM", "CNSHA", "USLAX", "GBSOU"]
+FEED_NAMES = {"nz": "portconnect_departures.csv", "sg": "singapore_arrivals.csv", "jp": "japan_arrivals.csv"}
+TIME_FORMAT = "%Y-%m-%d %H:%M"
+FIRST_IMO = 9_100_000
+SYNTH_DIR = DATA_DIR / "cache" / "synth"
+
+
+def _days(start, days):
+    return start + pd.to_timedelta(np.round(days * 1440), unit="min")
+
+
+def call_counts(rows, seed=2025, calls_per_vessel=24):
+    """Calls per vessel (varying around calls_per_vessel) summing to exactly `rows`."""
+    rng = np.random.default_rng([seed, 0])
+    counts = rng.integers(max(1, calls_per_vessel // 2), calls_per_vessel * 3 // 2 + 1,
+                          rows // max(1, calls_per_vessel // 2) + 1)
+    cum = np.cumsum(counts)
+    n = int(np.searchsorted(cum, rows)) + 1
+    counts = counts[:n]
+    counts[-1] -= int(cum[n - 1]) - rows
+    return counts
+
+
+def voyage_blocks(rows, seed=2025, calls_per_vessel=24, block_rows=1_000_000, miss_rate=0.03, sg_departures=False):
+    """Yield (nz, sg, jp) frames, one block of whole vessels at a time, in IMO order.
+
+    With `sg_departures` the SG frame also carries Departure_SG (the real feed has none).
+    """
+    counts = call_counts(rows, seed, calls_per_vessel)
+    bounds = np.searchsorted(np.cumsum(counts), np.arange(block_rows, rows, block_rows), side="right")
+    edges = [0, *sorted(set(int(b) for b in bounds) - {0, len(counts)}), len(counts)]
+    for i, (lo, hi) in enumerate(zip(edges[:-1], edges[1:])):
+        rng = np.random.default_rng([seed, 1, i])
+        n_vessels = hi - lo
+        vessel = np.repeat(np.arange(n_vessels), counts[lo:hi])
+        n = len(vessel)
+        call = np.arange(n) - np.repeat(np.cumsum(counts[lo:hi]) - counts[lo:hi], counts[lo:hi])
+        rotation = rng.uniform(28, 56, n_vessels)             # days per NZ -> Asia -> NZ loop
+        phase = rng.uniform(0, rotation)
+        imo = FIRST_IMO + lo + vessel
+
+        depart = phase[vessel] + call * rotation[vessel] + rng.normal(0, 1.0, n)
+        delay = np.where(rng.random(n) < 0.3, rng.gamma(2.0, 6.0, n), rng.exponential(0.7, n)).round(1)
+        sg_arr = depart + delay / 24 + rng.lognormal(np.log(11), 0.12, n)
+        sg_dep = sg_arr + rng.lognormal(np.log(2.5), 0.4, n)
+        jp_arr = sg_dep + rng.lognormal(np.log(6), 0.15, n)
+        sg_keep, jp_keep = rng.random(n) >= miss_rate, rng.random(n) >= miss_rate
+
+        nz = pd.DataFrame({"Vessel_IMO": imo, "Departure_NZ": _days(START, depart), "Departure_Delay_Hours": delay})
+        sg = pd.DataFrame({"Vessel_IMO": imo[sg_keep], "ActualArrival_SG": _days(START, sg_arr[sg_keep])})
+        if sg_departures:
+            sg["Departure_SG"] = _days(START, sg_dep[sg_keep])
+        jp = pd.DataFrame({"Vessel_IMO": imo[jp_keep], "ActualArrival_JP": _days(START, jp_arr[jp_keep])})
+        yield nz, sg, jp
+
+
+def voyages(rows, seed=2025, calls_per_vessel=24, sg_departures=False):
+    """All three feeds in memory (fine up to ~10^6 rows; use write_feeds beyond that)."""
+    parts = list(voyage_blocks(rows, seed, calls_per_vessel, sg_departures=sg_departures))
+    return tuple(pd.concat(p, ignore_index=True) for p in zip(*parts))
+
+
+def write_feeds(out_dir, rows, seed=2025, calls_per_vessel=24, block_rows=1_000_000):
+    """Write the three feed CSVs (BOM + IMO-sorted, like the real exports) and return their paths."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = {k: out_dir / name for k, name in FEED_NAMES.items()}
+    for i, block in enumerate(voyage_blocks(rows, seed, calls_per_vessel, block_rows)):
+        for (key, path), frame in zip(paths.items(), block):
+            frame.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False,
+                         encoding="utf-8-sig" if i == 0 else "utf-8", date_format=TIME_FORMAT)
+    return paths
+
+
+def hub_calls(rows, seed=2025, days=365):
+    """PortCalls-shaped SGSIN arrivals from NZ (from/to/eta) and onward departures (from/to/etd)."""
+    rng = np.random.default_rng([seed, 2])
+    arrivals = pd.DataFrame({"from": rng.choice(NZ_PORTS, rows), "to": "SGSIN",
+                             "eta": _days(START, np.sort(rng.uniform(0, days, rows)))})
+    departures = pd.DataFrame({"from": "SGSIN", "to": rng.choice(OUT_PORTS, rows),
+                               "etd": _days(START, np.sort(rng.uniform(0, days + 14, rows)))})
+    return arrivals, departures
+
+
+def containers(counts, seed=2025, reefer_share=0.12, forty_share=0.6, avg_sg_dwell=7.0, ready_days=30):
+    """Container manifest (container_costs.CONTAINER records) with `counts` {port code: n} boxes,
+    ready to sail on days spread evenly over the first `ready_days`."""
+    rng = np.random.default_rng([seed, 3])
+    n = sum(counts.values())
+    out = container_costs.empty(n)
+    out["port"] = np.repeat([container_costs.PORTS.index(p) for p in counts], list(counts.values()))
+    yards = [[i for i, (p, _, _) in enumerate(container_costs.YARDS) if p == port] for port in container_costs.PORTS]
+    pick = rng.random(n)
+    for code, options in enumerate(yards):
+        mask = out["port"] == code
+        out["yard"][mask] = np.asarray(options)[(pick[mask] * len(options)).astype(int)]
+    out["size_ft"] = np.where(rng.random(n) < forty_share, 40, 20)
+    out["reefer"] = rng.random(n) < reefer_share
+    out["sg_dwell_days"] = rng.lognormal(np.log(avg_sg_dwell), 0.35, n)
+    out["ready_day"] = rng.integers(0, max(1, ready_days), n)
+    return out
+
+
+def cached_feeds(rows, seed=2025):
+    """Feed paths for (rows, seed) under data/cache/synth, generated on first use."""
+    out_dir = SYNTH_DIR / f"{rows}-{seed}"
+    paths = {k: out_dir / name for k, name in FEED_NAMES.items()}
+    if not (out_dir / ".complete").exists():
+        write_feeds(out_dir, rows, seed)
+        (out_dir / ".complete").touch()
+    return paths
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Generate seeded synthetic NZ/SG/JP port-call feeds")
+    ap.add_argument("--rows", type=float, default=1e5, help="NZ departures (e.g. 1e3 .. 1e7)")
+    ap.add_argument("--seed", type=int, default=2025)
+    ap.add_argument("--calls-per-vessel", type=int, default=24)
+    ap.add_argument("--out", type=Path, help="output directory (default: data/cache/synth/<rows>-<seed>)")
+    ap.add_argument("--containers", action="store_true",
+                    help="write a containers.csv manifest of --rows boxes (split evenly over the NZ ports) instead")
+    args = ap.parse_args()
+
+    rows = int(args.rows)
+    if args.containers:
+        out = args.out or SYNTH_DIR / f"containers-{rows}-{args.seed}.csv"
+        share = dict(zip(container_costs.PORTS, np.diff(np.linspace(0, rows, len(container_costs.PORTS) + 1).astype(int))))
+        container_costs.to_frame(containers(share, args.seed)).to_csv(out, index=False, encoding="utf-8-sig")
+        print(f"✅ Wrote {rows:,} synthetic containers to {out}")
+        raise SystemExit
+    out = args.out or SYNTH_DIR / f"{rows}-{args.seed}"
+    t0 = time.perf_counter()
+    paths = write_feeds(out, rows, args.seed, args.calls_per_vessel)
+    print(f"✅ Wrote {rows:,} synthetic voyages to {out} ({time.perf_counter() - t0:.1f}s)")
+    for path in paths.values():
+        print(f"   {path.name}: {path.stat().st_size / 2**20:.1f} MiB")
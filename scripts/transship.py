@@ -0,0 +1,315 @@
+﻿import argparse, atexit, contextlib, importlib, io, json, os, runpy, secrets, socket, sys, time, traceback, uuid
+from datetime import datetime
+
+import pipeline
+from paths import locations
+
+# --- transship: one command for every analysis ---
+#   python transship.py fetch | dwell | multileg | breakeven | local-storage | sensitivity | deferral | routing | dashboard
+#   python transship.py pipeline [--only ...]     # the incremental DAG (pipeline.py)
+#   python transship.py run <script.py> [args]    # any analysis script
+#   python transship.py serve                     # keep a warm interpreter for the commands above
+# This module imports only the standard library; NumPy/pandas/matplotlib/plotly/requests
+# load inside the script a subcommand runs, so `--help`, `status` and forwarding are instant.
+# Subcommands run their pipeline stages' scripts in this interpreter (instrument.begin/end
+# keeps one record per script), so a multi-script command pays the imports once.
+#
+# `serve` imports the heavy libraries and the shared leg table once and listens on a
+# loopback port (address + token in data/.run/serve.json). Later invocations, and the
+# pipeline's stages, are forwarded to it: on POSIX each request runs in a fork of the warm
+# process (concurrent, isolated, no cold start); elsewhere requests run in the server
+# process one at a time. A server started with different data/docs or PortCalls settings
+# refuses the request and the command runs cold instead.
+
+SCRIPTS = pipeline.SCRIPTS
+STAGES = {s.name: s for s in pipeline.STAGES}
+COMMANDS = {   # subcommand: (pipeline stages, help)
+    "fetch": (("transit",), "fetch NZ -> SG schedules and cost the baseline per container"),
+    "dwell": (("dwell",), "infer Singapore dwell from PortCalls arrivals and onward departures"),
+    "multileg": (("eta_feeds", "eta_multileg", "eta_dashboard"), "ETA feeds -> multi-leg analysis and chart"),
+    "breakeven": (("breakeven", "breakeven_mc"), "closed-form and Monte Carlo breakeven"),
+    "local-storage": (("local_storage", "summary"), "local NZ storage breakeven and summary metrics"),
+    "sensitivity": (("sensitivity",), "yard cost x NZ delay savings heatmap"),
+    "deferral": (("deferral",), "per-container deferral plan under yard capacity"),
+    "routing": (("routing",), "cheapest and fastest NZ routes through the transshipment hubs"),
+    "dashboard": (("dashboard",), "assemble docs/index.html from the section fragments"),
+}
+WARM_MODULES = ("numpy", "pandas", "scipy.optimize", "scipy.sparse", "requests", "matplotlib.figure",
+                "matplotlib.backends.backend_agg", "plotly.graph_objects", "pyarrow.dataset", "pyarrow.csv")
+PASS_ENV = ("TRANSSHIP_RUN_ID", "TRANSSHIP_PROFILE")   # per request; everything else must match the server
+IDLE_TIMEOUT = 3600
+REFRESH_SECONDS = 10
+
+
+def serve_file(env=os.environ):
+    return locations(env)[1] / ".run" / "serve.json"
+
+
+def _identity(env):
+    """What a warm server's imported modules depend on: resolved data/docs dirs and PortCalls settings."""
+    dirs = [str(p.resolve()) for p in locations(env)[1:]]
+    return dirs + sorted(f"{k}={v}" for k, v in env.items() if k.startswith("PORTCALLS_"))
+
+
+# --- Running scripts in this interpreter ---
+def run_script(script, args=()):
+    """Run one analysis script here as __main__; returns its exit code."""
+    import instrument
+    path = (SCRIPTS / script).resolve()
+    if not path.is_relative_to(SCRIPTS) or path.suffix != ".py" or not path.is_file():
+        return _usage(f"{script}: not an analysis script in {SCRIPTS}")
+    argv, cwd = sys.argv, os.getcwd()
+    sys.argv = [str(path), *args]
+    os.chdir(SCRIPTS)
+    instrument.begin(script)
+    try:
+        runpy.run_path(str(path), run_name="__main__")
+        code = 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            code = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except Exception:
+        traceback.print_exc()
+        code = 1
+    finally:
+        instrument.end()
+        sys.argv = argv
+        os.chdir(cwd)
+    sys.stdout.flush(); sys.stderr.flush()
+    return code
+
+
+def execute(command, extra=()):
+    """Run a subcommand locally."""
+    if command == "run":
+        return run_script(extra[0], extra[1:]) if extra else _usage("run needs a script name")
+    if command == "pipeline":
+        return run_script("pipeline.py", extra)
+    for name in COMMANDS[command][0]:
+        print(f"▶️ {name}: {STAGES[name].script}", flush=True)
+        code = run_script(STAGES[name].script)
+        if code:
+            print(f"❌ {name} failed (exit {code})")
+            return code
+    return 0
+
+
+def _usage(message):
+    print(f"transship: {message}", file=sys.stderr)
+    return 2
+
+
+# --- Client ---
+def request(argv, env=None, out=None):
+    """Run `argv` on the warm server; returns the exit code, or None when no server takes it."""
+    env = dict(os.environ if env is None else env)
+    if env.get("TRANSSHIP_WARM") == "inproc":   # already inside a single-threaded server
+        return None
+    try:
+        info = json.loads(serve_file(env).read_text(encoding="utf-8"))
+        conn = socket.create_connection(("127.0.0.1", info["port"]), timeout=2)
+    except (OSError, ValueError, KeyError):
+        return None
+    out = out or sys.stdout.buffer
+    with conn:
+        conn.sendall(json.dumps({"token": info["token"], "argv": list(argv),
+                                 "env": {k: v for k, v in env.items() if k.startswith(("TRANSSHIP_", "PORTCALLS_"))}
+                                 }).encode() + b"\n")
+        conn.settimeout(None)
+        for line in conn.makefile("rb"):
+            if line.startswith(b"\0"):
+                kind, _, value = line[1:].decode().strip().partition(" ")
+                if kind == "exit":
+                    return int(value)
+                print(f"⚠️ Warm server refused ({value}); running cold", file=sys.stderr)
+                return None
+            out.write(line)
+            out.flush()
+    return None   # server went away mid-request
+
+
+# --- Warm server ---
+def _warm_tables(stamp=None):
+    """Load the shared leg table so runs start with it cached; returns the feeds' stat stamp."""
+    try:
+        from leg_table import FEEDS, load_leg_table
+        from paths import DATA_DIR
+        now = tuple((p.stat().st_mtime_ns, p.stat().st_size) for p in (DATA_DIR / name for name in FEEDS))
+        if now != stamp:
+            load_leg_table()
+        return now
+    except (OSError, ValueError, KeyError, ImportError):
+        return stamp
+
+
+def _write_json(path, obj, mode=0o600):
+    """Atomic write, readable only by this user (serve.json holds the request token)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    with os.fdopen(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, mode), "w", encoding="utf-8") as f:
+        f.write(json.dumps(obj))
+    os.replace(tmp, path)
+
+
+def _handle(conn, req, fork):
+    """Run one request with its output streamed to `conn`; returns the child pid when forked."""
+    if fork:
+        pid = os.fork()
+        if pid:
+            return pid
+        code = 1
+        try:   # the child must never fall back into the server loop
+            for fd in (1, 2):
+                os.dup2(conn.fileno(), fd)
+            sys.stdout, sys.stderr = (open(fd, "w", encoding="utf-8", errors="replace", buffering=1, closefd=False)
+                                      for fd in (1, 2))
+            code = _execute_request(req, "fork")
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            with contextlib.suppress(BaseException):
+                atexit._run_exitfuncs()
+                sys.stdout.flush(); sys.stderr.flush()
+            os._exit(code)
+    out = io.TextIOWrapper(conn.makefile("wb"), encoding="utf-8", errors="replace", line_buffering=True)
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+        code = _execute_request(req, "inproc")
+    out.flush()
+    out.detach()
+    conn.sendall(f"\0exit {code}\n".encode())
+    return None
+
+
+def _execute_request(req, mode):
+    saved = {k: os.environ.get(k) for k in PASS_ENV + ("TRANSSHIP_WARM",)}
+    for k in PASS_ENV:
+        os.environ.pop(k, None)
+        if k in req["env"]:
+            os.environ[k] = req["env"][k]
+    os.environ["TRANSSHIP_WARM"] = mode
+    try:
+        args, extra = parser().parse_known_args(req["argv"])
+        return execute(args.command, extra)
+    except SystemExit as e:   # argparse error
+        return e.code if isinstance(e.code, int) else 2
+    finally:
+        for k, v in saved.items():
+            os.environ.pop(k, None)
+            if v is not None:
+                os.environ[k] = v
+
+
+def serve(idle_timeout=IDLE_TIMEOUT):
+    """Keep one warm interpreter and run forwarded commands until stopped or idle."""
+    t0 = time.perf_counter()
+    for name in WARM_MODULES:
+        with contextlib.suppress(ImportError):
+            importlib.import_module(name)
+    stamp = _warm_tables()
+    fork = hasattr(os, "fork")
+    token, path = secrets.token_hex(16), serve_file()
+    sock = socket.create_server(("127.0.0.1", 0))
+    sock.settimeout(0.2)
+    _write_json(path, {"port": sock.getsockname()[1], "token": token, "pid": os.getpid(),
+                       "started": datetime.now().isoformat(timespec="seconds"), "fork": fork})
+    print(f"🔥 Warm server ready in {time.perf_counter() - t0:.1f}s on port {sock.getsockname()[1]} "
+          f"({'fork per request' if fork else 'in-process'}); stop with `transship stop`", flush=True)
+    identity, children = _identity(os.environ), {}
+    last_active = last_refresh = time.monotonic()
+    try:
+        while True:
+            try:
+                conn, _ = sock.accept()
+            except socket.timeout:
+                conn = None
+            if conn is not None:
+                last_active = time.monotonic()
+                conn.settimeout(5)
+                try:
+                    req = json.loads(conn.makefile("rb").readline())
+                except (OSError, ValueError):
+                    conn.close()
+                    req = None
+                if req is None:
+                    pass
+                elif not secrets.compare_digest(str(req.get("token", "")).encode(), token.encode()):
+                    conn.close()
+                elif req["argv"][:1] in (["stop"], ["status"]):
+                    conn.sendall(f"🔥 pid {os.getpid()}, {len(children)} running\n\0exit 0\n".encode())
+                    conn.close()
+                    if req["argv"][0] == "stop":
+                        break
+                elif _identity(req["env"]) != identity:
+                    conn.sendall(b"\0refused different data/docs or PortCalls settings\n")
+                    conn.close()
+                else:
+                    conn.settimeout(None)
+                    print(f"▶️ {' '.join(req['argv'])}", flush=True)
+                    pid = _handle(conn, req, fork)
+                    if pid:
+                        children[pid] = conn
+                    else:
+                        conn.close()
+            while children:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+                if not pid:
+                    break
+                conn = children.pop(pid, None)
+                if conn is not None:
+                    with contextlib.suppress(OSError):
+                        conn.sendall(f"\0exit {os.waitstatus_to_exitcode(status)}\n".encode())
+                    conn.close()
+                last_active = time.monotonic()
+            if not children and time.monotonic() - last_refresh > REFRESH_SECONDS:
+                stamp, last_refresh = _warm_tables(stamp), time.monotonic()
+            if not children and time.monotonic() - last_active > idle_timeout:
+                print("💤 Idle; shutting down")
+                break
+    finally:
+        sock.close()
+        with contextlib.suppress(OSError, ValueError):
+            if json.loads(path.read_text(encoding="utf-8"))["pid"] == os.getpid():
+                path.unlink()
+    return 0
+
+
+def parser():
+    ap = argparse.ArgumentParser(prog="transship", description="NZ -> Singapore transshipment analyses")
+    ap.add_argument("--cold", action="store_true", help="run here even if a warm server is up")
+    sub = ap.add_subparsers(dest="command", required=True, metavar="command")
+    for name, (_, help) in COMMANDS.items():
+        sub.add_parser(name, help=help)
+    sub.add_parser("run", help="run one analysis script (transship run <script.py> [args])", add_help=False)
+    sub.add_parser("pipeline", help="run the incremental pipeline (pipeline.py arguments)", add_help=False)
+    p = sub.add_parser("serve", help="keep a warm interpreter for later commands")
+    p.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT, help="seconds idle before exiting")
+    sub.add_parser("stop", help="stop the warm server")
+    sub.add_parser("status", help="show whether a warm server is up")
+    return ap
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    ap = parser()
+    args, extra = ap.parse_known_args(argv)
+    if extra and args.command not in ("run", "pipeline"):
+        ap.error(f"unrecognized arguments: {' '.join(extra)}")
+    if args.command == "serve":
+        return serve(args.idle_timeout)
+    if args.command in ("stop", "status"):
+        code = request([args.command])
+        if code is None:
+            print("💤 No warm server running")
+        return 0
+    if not args.cold:
+        code = request([a for a in argv if a != "--cold"])
+        if code is not None:
+            return code
+    return execute(args.command, extra)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,26 @@
-﻿import pandas as pd
-import plotly.graph_objects as go
-from datetime import datetime
+﻿import plotly.graph_objects as go
+import chart_tiles
+import dashboard
+import instrument
+from paths import DATA_DIR, DOCS_DIR
+import leg_aggregates
+from leg_table import load_leg_table
 
-data_path = r"C:\\Users\\seeds\\Documents\\Containrttransshipment\\data"
-docs_path = r"C:\\Users\\seeds\\Documents\\Containrttransshipment\\docs"
+data_dir, docs_dir = DATA_DIR, DOCS_DIR
 
+instrument.stage("aggregate")
 try:
-    df = pd.read_csv(f"{data_path}\\eta_multileg_final.csv")
+    state = leg_aggregates.current(data_dir)
 except FileNotFoundError:
-    print("⚠️ Missing merged data file.")
+    print("⚠️ Missing ETA feed files.")
     exit()
 
-# Compute averages by delay type
-if "DepartureType" in df.columns:
-    avg = df.groupby("DepartureType")[["NZ_to_SG_days","SG_to_JP_days","Total_Transit_Days"]].mean().reset_index()
-else:
-    avg = pd.DataFrame(columns=["DepartureType","NZ_to_SG_days","SG_to_JP_days","Total_Transit_Days"])
+# Averages by delay type from the persisted aggregate state (no feed re-read or re-merge)
+avg = state.means().round(1).reset_index()
+# Every voyage for the per-vessel view (the cached leg table, not a fresh join)
+voyages = load_leg_table(data_dir)[["Vessel_IMO", "Departure_NZ", "DepartureType", "Total_Transit_Days"]]
 
+instrument.stage("rendering")
 # Create stacked bar chart
 fig = go.Figure()
 for _, row in avg.iterrows():
@@ -37,30 +41,30 @@ fig.update_layout(
     legend_title_text="Departure Type"
 )
 
-chart_html = f"{docs_path}\\eta_multileg_chart.html"
-fig.write_html(chart_html, include_plotlyjs="cdn", full_html=False)
+instrument.stage("html")
+# --- Dashboard section: charts and fragment are rewritten only when their data changes ---
+# Both charts load on demand with the bundled plotly.js (chart_tiles); the standalone page
+# uses the same bundle instead of the CDN. The bundle is an output too, so deleting it (or
+# a plotly upgrade) re-renders the section even when the data is unchanged.
+chart_html = docs_dir / "eta_multileg_chart.html"
+voyage_tiles = chart_tiles.CHART_DIR / "eta_voyages" / "overview.json"
+means_chart = chart_tiles.CHART_DIR / "eta_means.json"
 
-# Update dashboard HTML
-index_path = f"{docs_path}\\index.html"
-with open(index_path, "r", encoding="utf-8") as f:
-    html = f.read()
 
-section_html = f"""
-<section>
-<h2>🧭 ETA Delay Impact (NZ ➜ SG ➜ JP)</h2>
-<p>Visual analysis of delay propagation from NZ departures to Japan arrivals.</p>
-<iframe src="eta_multileg_chart.html" width="100%" height="480" style="border:none;"></iframe>
-<p style='text-align:center;color:gray;'>Updated: {datetime.now().strftime('%Y-%m-%d %H:%M')}</p>
-</section>
-"""
+def render_eta(d):
+    fig.write_html(chart_html, include_plotlyjs=chart_tiles.plotly_js(), full_html=False)
+    bars = chart_tiles.figure(fig, "eta_means")
+    cloud = chart_tiles.scatter(d["voyages"], "eta_voyages", x="Departure_NZ", y="Total_Transit_Days",
+                                by="DepartureType", text="Vessel_IMO", title="⛴️ NZ → JP Transit per Voyage",
+                                x_title="NZ departure", y_title="Days")
+    return f"""
+<p style='text-align:center;'>Visual analysis of delay propagation from NZ departures to Japan arrivals.</p>
+{bars}
+<p style='text-align:center;'>Every voyage ({len(d['voyages']):,}): binned means over the whole period; zoom in
+for individual vessels. <a href='eta_multileg_chart.html'>Standalone chart</a></p>
+{cloud}"""
 
-import re
-if re.search("🧭 ETA Delay Impact", html):
-    html = re.sub(r"<section>.*?🧭 ETA Delay Impact.*?</section>", section_html, html, flags=re.S)
-else:
-    html = html.replace("</footer>", section_html + "\n</footer>")
 
-with open(index_path, "w", encoding="utf-8") as f:
-    f.write(html)
-
-print("✅ Dashboard updated with delay impact chart.")
+dashboard.write_section("eta", render_eta, {"figure": fig.to_json(), "voyages": voyages},
+                        outputs=[chart_html, voyage_tiles, means_chart, chart_tiles.plotly_path()])
+print("✅ Dashboard delay impact section ready.")
@@ -0,0 +1,11 @@
+﻿import os, sys, tempfile
+from pathlib import Path
+
+# The scripts are flat top-level modules that import each other by name, and resolve
+# data/ and docs/ from TRANSSHIP_BASE when they are imported. Point both at a scratch
+# base before any test imports them, so a test run never writes into the checkout.
+_BASE = Path(tempfile.mkdtemp(prefix="transship-tests-"))
+os.environ["TRANSSHIP_BASE"] = str(_BASE)
+os.environ.setdefault("PORTCALLS_CACHE_DIR", str(_BASE / "data" / "cache"))
+os.environ.setdefault("PORTCALLS_API", "http://127.0.0.1:9/v1/schedules")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
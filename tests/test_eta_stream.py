@@ -0,0 +1,30 @@
+﻿import pytest
+
+import eta_stream
+import synth_portcalls
+from leg_join import LEG_COLUMNS, join_frames
+from leg_table import classify_departures
+
+# Stream and batch must agree: replaying the synthetic feeds as events through EtaState
+# gives the same voyages and leg means as the batch leg join over the same feeds.
+
+
+def test_ts_reads_naive_times_as_utc():
+    assert eta_stream._ts("1970-01-02T00:00") == 86400
+    assert eta_stream._ts("1970-01-02 01:00+01:00") == 86400
+
+
+def test_stream_matches_batch_leg_join():
+    rows = 1500
+    state = eta_stream.EtaState()
+    for ev in eta_stream.synthetic_events(rows).to_dict("records"):
+        state.apply({**ev, "time": ev["time"].isoformat()})
+    nz, sg, jp = synth_portcalls.voyages(rows, sg_departures=True)
+    batch = classify_departures(join_frames(nz, sg, jp)).groupby("DepartureType")[LEG_COLUMNS]
+
+    stream = state.table("DepartureType")
+    assert sorted(stream) == sorted(batch.groups)
+    for kind, legs in batch:
+        for metric in LEG_COLUMNS:
+            assert stream[kind][metric]["count"] == len(legs)
+            assert stream[kind][metric]["mean"] == pytest.approx(legs[metric].mean(), abs=1e-9)
@@ -0,0 +1,69 @@
+﻿import pandas as pd
+import pytest
+
+import feed_loader
+from feed_loader import iter_feed, read_feed
+
+# Feed loader: rejected rows are reported by their 1-based line in the file (header = 1),
+# on the typed Arrow path, the string fallback, pandas' parser and for byte ranges.
+
+HEADER = "Vessel_IMO,ActualArrival_JP,Port\n"
+ROWS = [
+    "9300001,2024-01-01 10:00,JPTYO\n",   # line 2
+    "123,2024-01-02 10:00,JPTYO\n",       # line 3: IMO out of range
+    "9300003\n",                          # line 4: short row (pandas pads it -> missing time)
+    "\n",                                  # line 5: blank
+    "9300004,2024-01-04 10:00,JPUKB\n",   # line 6
+    "9300005,,JPTYO\n",                   # line 7: missing required time
+]
+BAD_TIME = "9300006,not a time,JPTYO\n"   # forces the string re-read on the Arrow path
+
+
+@pytest.fixture(params=["arrow", "pandas"])
+def engine(request, monkeypatch):
+    if request.param == "pandas":
+        monkeypatch.setattr(feed_loader, "pa", None)
+    elif feed_loader.pa is None:
+        pytest.skip("pyarrow not installed")
+    return request.param
+
+
+def write_feed(tmp_path, rows):
+    path = tmp_path / "japan_arrivals.csv"
+    path.write_text(HEADER + "".join(rows), encoding="utf-8")
+    return path
+
+
+def reject_lines(tmp_path, monkeypatch, path, **kw):
+    monkeypatch.setattr(feed_loader.Rejects.write, "__defaults__", (tmp_path / "rejects",))
+    out = read_feed(path, **kw)
+    report = tmp_path / "rejects" / "japan_arrivals.csv"
+    return out, pd.read_csv(report)["Row"].tolist() if report.exists() else []
+
+
+def test_reject_rows_are_file_lines(tmp_path, monkeypatch, engine):
+    out, lines = reject_lines(tmp_path, monkeypatch, write_feed(tmp_path, ROWS))
+    assert out["Vessel_IMO"].tolist() == [9300001, 9300004]
+    assert lines == [3, 4, 7]
+
+
+def test_reject_rows_after_string_fallback(tmp_path, monkeypatch, engine):
+    out, lines = reject_lines(tmp_path, monkeypatch, write_feed(tmp_path, ROWS + [BAD_TIME]))
+    assert out["Vessel_IMO"].tolist() == [9300001, 9300004]
+    assert lines == [3, 4, 7, 8]
+
+
+def test_reject_rows_in_a_byte_range(tmp_path, monkeypatch, engine):
+    path = write_feed(tmp_path, ROWS + [BAD_TIME])
+    start = len((HEADER + "".join(ROWS[:3])).encode())
+    out, lines = reject_lines(tmp_path, monkeypatch, path, start=start)
+    assert out["Vessel_IMO"].tolist() == [9300004]
+    assert lines == [7, 8]
+
+
+def test_read_feed_matches_iter_feed(tmp_path, engine):
+    path = write_feed(tmp_path, ROWS * 50 + [BAD_TIME])
+    whole = read_feed(path, report=False)
+    parts = pd.concat(iter_feed(path, 64, report=False), ignore_index=True)
+    parts["Port"] = parts["Port"].astype("category")
+    pd.testing.assert_frame_equal(whole, parts, check_categorical=False)
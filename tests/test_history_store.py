@@ -0,0 +1,38 @@
+﻿import pandas as pd
+import pytest
+
+import history_store
+
+pytest.importorskip("pyarrow")
+
+# History store: appends are conformed to the files already written, so a table whose
+# columns drift between runs still reads back as one dataset.
+
+
+def test_append_fills_missing_columns_and_casts_to_stored_types(tmp_path):
+    history_store.append("legs", pd.DataFrame({"IMO": [9300001], "Days": [5], "Port": ["NZAKL"]}),
+                         run_date="2024-01-01", root=tmp_path)
+    history_store.append("legs", pd.DataFrame({"IMO": [9300002.0], "Note": ["late"]}),
+                         run_date="2024-01-02", root=tmp_path)
+    out = history_store.read("legs", root=tmp_path).sort_values("IMO").reset_index(drop=True)
+    assert out["IMO"].tolist() == [9300001, 9300002] and str(out["IMO"].dtype) == "int64"
+    assert out["Days"].isna().tolist() == [False, True]
+    assert out["Note"].tolist()[1] == "late" and pd.isna(out["Note"].iloc[0])
+
+
+def test_append_rejects_values_that_do_not_fit(tmp_path):
+    history_store.append("legs", pd.DataFrame({"Days": [5]}), run_date="2024-01-01", root=tmp_path)
+    with pytest.raises(ValueError, match="Days"):
+        history_store.append("legs", pd.DataFrame({"Days": ["five"]}), run_date="2024-01-02", root=tmp_path)
+
+
+def test_append_csv_conforms_to_stored_schema(tmp_path):
+    history_store.append("feed", pd.DataFrame({"IMO": [9300001], "Delay": [1.5]}), run_date="2024-01-01",
+                         root=tmp_path)
+    csv = tmp_path / "feed.csv"
+    csv.write_text("IMO,Extra\n9300002,x\n", encoding="utf-8")
+    history_store.append_csv("feed", csv, run_date="2024-01-02", root=tmp_path)
+    out = history_store.read("feed", root=tmp_path).sort_values("IMO").reset_index(drop=True)
+    assert out["IMO"].tolist() == [9300001, 9300002]
+    assert out["Delay"].isna().tolist() == [False, True]
+    assert out["Extra"].tolist()[1] == "x"
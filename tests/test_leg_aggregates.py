@@ -0,0 +1,65 @@
+﻿import pandas as pd
+
+import leg_aggregates
+import synth_portcalls
+
+# Leg aggregates: a seed followed by appended feed lines folds the same voyages, with the
+# same statistics, as seeding once from the full feeds.
+
+TIME_COLS = {"nz": "Departure_NZ", "sg": "ActualArrival_SG", "jp": "ActualArrival_JP"}
+
+
+def write_feeds(root, frames, mode="w"):
+    root.mkdir(parents=True, exist_ok=True)
+    for key, frame in frames.items():
+        frame.to_csv(root / synth_portcalls.FEED_NAMES[key], mode=mode, header=mode == "w", index=False,
+                     encoding="utf-8-sig" if mode == "w" else "utf-8", date_format=synth_portcalls.TIME_FORMAT)
+
+
+def test_seed_plus_appends_matches_full_seed(tmp_path):
+    frames = dict(zip(("nz", "sg", "jp"), synth_portcalls.voyages(2000)))
+    cuts = [synth_portcalls.START + pd.Timedelta(days=d) for d in (150, 250)]
+    parts = [{k: f[(f[TIME_COLS[k]] >= lo) & (f[TIME_COLS[k]] < hi)] for k, f in frames.items()}
+             for lo, hi in zip([pd.Timestamp.min] + cuts, cuts + [pd.Timestamp.max])]
+    inc, full = tmp_path / "inc", tmp_path / "full"
+
+    write_feeds(inc, parts[0])
+    seed = leg_aggregates.update(inc, inc / "agg" / "state.json")
+    assert seed.spans is None and len(seed.legs)
+    folded = len(seed.legs)
+    for part in parts[1:]:
+        write_feeds(inc, part, mode="a")
+        step = leg_aggregates.update(inc, inc / "agg" / "state.json")
+        assert all(span is not None and span[1] > span[0] for span in step.spans.values())
+        folded += len(step.legs)
+    noop = leg_aggregates.update(inc, inc / "agg" / "state.json")
+    assert len(noop.legs) == 0 and all(a == b for a, b in noop.spans.values())
+
+    write_feeds(full, frames)
+    whole = leg_aggregates.update(full, full / "agg" / "state.json")
+    assert folded == len(whole.legs)
+    got, want = step.state.frame(), whole.state.frame()
+    pd.testing.assert_frame_equal(got[["Lane", "DepartureType", "Metric", "Count"]],
+                                  want[["Lane", "DepartureType", "Metric", "Count"]])
+    pd.testing.assert_series_equal(got["Mean"], want["Mean"], rtol=1e-9)
+
+
+def test_rows_since_reads_only_appended_lines(tmp_path):
+    path = tmp_path / "legs.csv"
+    path.write_text("Vessel_IMO,Days\n9300001,1.5\n", encoding="utf-8")
+    rows, whole, mark = leg_aggregates.rows_since(path, None)
+    assert whole and rows["Vessel_IMO"].tolist() == [9300001]
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("9300002,2.5\n9300003,")   # the half-written last line waits for the next read
+    rows, whole, mark = leg_aggregates.rows_since(path, mark)
+    assert not whole and rows["Vessel_IMO"].tolist() == [9300002]
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("3.5\n")
+    rows, whole, mark = leg_aggregates.rows_since(path, mark)
+    assert not whole and rows["Vessel_IMO"].tolist() == [9300003]
+
+    path.write_text("Vessel_IMO,Days\n9300009,9.5\n", encoding="utf-8")   # rewritten
+    rows, whole, _ = leg_aggregates.rows_since(path, mark)
+    assert whole and rows["Vessel_IMO"].tolist() == [9300009]
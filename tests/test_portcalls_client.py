@@ -0,0 +1,92 @@
+﻿import json, threading, time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import portcalls_client
+from portcalls_client import PortCallsClient
+
+# PortCalls client against a local stub server (http.server in a thread): cursors,
+# absolute and relative body links, Link headers, 429 + Retry-After and loop guards.
+
+
+class Stub(BaseHTTPRequestHandler):
+    throttled = set()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=None, headers=()):
+        self.send_response(status)
+        for k, v in headers:
+            self.send_header(k, v)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        if body is not None:
+            self.wfile.write(json.dumps(body).encode())
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        q = {k: v[0] for k, v in parse_qs(url.query).items()}
+        base = f"http://127.0.0.1:{self.server.server_port}"
+        page = lambda n, nxt=None: {"results": [{"page": n}], **({"next": nxt} if nxt else {})}
+        routes = {
+            "/v1/schedules": lambda: page(1, "ab/cd+==") if "cursor" not in q else page(2, f"{base}/v1/abs"),
+            "/v1/abs": lambda: page(3, "/v1/rel"),
+            "/v1/rel": lambda: page(4, "?page=5") if "page" not in q else page(5),
+            "/v1/loop": lambda: page(1, "/v1/loop"),
+            "/v1/cursor-loop": lambda: page(1, "same-cursor"),
+        }
+        if url.path == "/v1/schedules" and q.get("cursor") and self.path not in self.throttled:
+            self.throttled.add(self.path)   # first try of the cursor page: throttle with an HTTP-date
+            return self._send(429, headers=[("Retry-After", formatdate(usegmt=True))])
+        if url.path == "/v1/rel" and "page" in q:
+            return self._send(200, page(5), [("Link", '</v1/link?from=header>; rel="next"')])
+        if url.path == "/v1/link":
+            return self._send(200, page(6))
+        self._send(200, routes[url.path]())
+
+
+@pytest.fixture
+def server():
+    Stub.throttled = set()
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Stub)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_port}"
+    srv.shutdown()
+    srv.server_close()
+
+
+def client(url, **kw):
+    return PortCallsClient(url, cache=False, backoff=0.01, **kw)
+
+
+def test_follows_cursors_links_and_link_headers(server):
+    frame = client(f"{server}/v1/schedules").fetch({"from": "NZAKL"})
+    assert frame["page"].tolist() == [1, 2, 3, 4, 5, 6]
+    assert Stub.throttled   # the 429 was retried
+
+
+def test_repeated_link_stops_the_fetch(server):
+    with pytest.raises(RuntimeError, match="pagination loop"):
+        client(f"{server}/v1/loop").fetch({})
+
+
+def test_repeated_cursor_stops_the_fetch(server):
+    with pytest.raises(RuntimeError, match="pagination loop"):
+        client(f"{server}/v1/cursor-loop").fetch({})
+
+
+def test_page_cap(server):
+    with pytest.raises(RuntimeError, match="more than 3 pages"):
+        client(f"{server}/v1/schedules", max_pages=3).fetch({})
+
+
+def test_retry_after_accepts_seconds_and_http_dates():
+    assert portcalls_client._retry_after("2", 9) == 2.0
+    assert portcalls_client._retry_after("Wed, 21 Oct 2015 07:28:00 GMT", 9) == 0.0
+    assert 25 < portcalls_client._retry_after(formatdate(time.time() + 30, usegmt=True), 9) <= 30
+    assert portcalls_client._retry_after("soon", 9) == 9
+    assert portcalls_client._retry_after(None, 9) == 9
@@ -0,0 +1,54 @@
+﻿import os
+import threading
+
+from response_cache import ResponseCache
+
+# Response cache: the size is tracked in memory, so the directory is only scanned when a
+# write takes it over max_bytes, and eviction drops the least recently used entries.
+
+
+def disk_bytes(root):
+    return sum(p.stat().st_size for p in root.glob("*/*.json"))
+
+
+def test_scans_only_when_over_the_limit(tmp_path, monkeypatch):
+    cache = ResponseCache(tmp_path, max_bytes=20_000)
+    scans = []
+    evict = cache._evict
+    monkeypatch.setattr(cache, "_evict", lambda: (scans.append(1), evict()))
+    for i in range(50):
+        cache.put("http://x/v1/schedules", {"page": i}, {"results": ["x" * 900]})
+    assert 1 < len(scans) < 50   # the first write, then only writes past the limit
+    assert disk_bytes(tmp_path) <= 20_000
+    assert cache._total == disk_bytes(tmp_path)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(tmp_path, max_bytes=2_500)
+    for i in range(2):
+        cache.put("http://x/v1/schedules", {"page": i}, {"results": ["x" * 900]})
+    old = cache._path(cache.key("http://x/v1/schedules", {"page": 0}))
+    os.utime(old, (1, 1))
+    cache.get("http://x/v1/schedules", {"page": 0})   # touch: page 1 is now the oldest
+    cache.put("http://x/v1/schedules", {"page": 2}, {"results": ["x" * 900]})
+    assert cache.get("http://x/v1/schedules", {"page": 0}) is not None
+    assert cache.get("http://x/v1/schedules", {"page": 1}) is None
+
+
+def test_concurrent_puts_stay_within_the_limit(tmp_path):
+    cache, errors = ResponseCache(tmp_path, max_bytes=30_000), []
+
+    def worker(n):
+        try:
+            for i in range(40):
+                cache.put("http://x/v1/schedules", {"page": i % 25, "worker": n % 2}, {"results": ["x" * 700]})
+                cache.get("http://x/v1/schedules", {"page": (i + 3) % 25, "worker": n % 2})
+        except Exception as e:   # collected for the assertion below
+            errors.append(e)
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert disk_bytes(tmp_path) <= 30_000 + 8 * 1_000   # writes that raced the last eviction
@@ -0,0 +1,49 @@
+﻿import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("scipy")
+
+import routing
+from routing import METRICS, solve
+
+# Routing: an incremental solve from the cached all-pairs result matches a full
+# solve(edges, None) after edges get dearer, cheaper, appear or disappear.
+
+
+def base_edges(tmp_path):
+    return routing.edge_weights(routing.legs(tmp_path / "none.csv"), routing.hub_dwell(tmp_path / "none.csv"))
+
+
+def assert_same(got, want):
+    assert got.nodes == want.nodes
+    np.testing.assert_allclose(got.dist, want.dist, rtol=0, atol=1e-9)
+    for m in range(len(METRICS)):   # predecessors may differ on ties, but every path must cost its distance
+        for s in got.nodes:
+            for t in got.nodes:
+                route = got.path(m, s, t)
+                if route is not None and len(route) > 1:
+                    assert got.along(route)[m] == pytest.approx(want.dist[m, want.nodes.index(s), want.nodes.index(t)])
+
+
+def test_incremental_solve_matches_full_solve(tmp_path):
+    cache, rng = tmp_path / "routing.npz", np.random.default_rng(7)
+    edges = base_edges(tmp_path)
+    first, solved = solve(edges, cache)
+    assert solved == [len(first.nodes)] * len(METRICS)
+    assert solve(edges, cache)[1] == [0] * len(METRICS)   # unchanged edges: nothing re-solved
+
+    for _ in range(12):
+        edges = edges.copy()
+        pick = rng.choice(len(edges), size=3, replace=False)
+        edges.loc[pick, list(METRICS)] *= rng.choice([0.5, 0.8, 1.3, 3.0], size=(3, 1))
+        if rng.random() < 0.3:   # drop a leg
+            edges = edges.drop(index=edges.index[rng.integers(len(edges))])
+        if rng.random() < 0.3:   # add (or undercut) a leg between known nodes
+            a, b = rng.choice(first.nodes, size=2, replace=False)
+            edges = pd.concat([edges, pd.DataFrame({"From": [a], "To": [b], "Days": [rng.uniform(2, 30)],
+                                                    "Cost_NZD": [rng.uniform(300, 3000)]})], ignore_index=True)
+        edges = edges.reset_index(drop=True)
+        got, solved = solve(edges, cache)
+        want, _ = solve(edges, None)
+        assert_same(got, want)
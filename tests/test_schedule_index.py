@@ -0,0 +1,50 @@
+﻿import numpy as np
+import pandas as pd
+
+from schedule_index import ScheduleIndex
+
+# Persistent departure index: merging updates, next-departure lookups, NaT arrivals and
+# readers that outlive a lane rewrite.
+
+
+def t(*values):
+    return np.array(values, dtype="datetime64[s]")
+
+
+def test_update_merges_and_drops_duplicates(tmp_path):
+    index = ScheduleIndex(tmp_path)
+    assert index.update({("SGSIN", "JPTYO"): t("2024-01-03", "2024-01-01", "NaT")}) == 2
+    assert index.update({("SGSIN", "JPTYO"): t("2024-01-02", "2024-01-03"), ("SGSIN", "NLRTM"): t("2024-01-05")}) == 2
+    assert index.update({("SGSIN", "JPTYO"): t("2024-01-01")}) == 0
+
+    reopened = ScheduleIndex(tmp_path)
+    assert reopened.lanes() == [("SGSIN", "JPTYO"), ("SGSIN", "NLRTM")]
+    assert reopened.times("SGSIN", "JPTYO").astype("datetime64[s]").tolist() == \
+        t("2024-01-01", "2024-01-02", "2024-01-03").tolist()
+    assert len(list(tmp_path.glob("SGSIN-JPTYO.*.npy"))) == 1   # replaced lane files are removed
+
+
+def test_next_departure(tmp_path):
+    index = ScheduleIndex(tmp_path)
+    index.update({("SGSIN", "JPTYO"): t("2024-01-01T00:00", "2024-01-02T00:00")})
+    assert index.next_departure("SGSIN", "JPTYO", np.datetime64("2024-01-01T00:00")) == np.datetime64("2024-01-02T00:00")
+    assert index.next_departure("SGSIN", "JPTYO", np.datetime64("2023-12-31T20:00"), 4 * 3600) == \
+        np.datetime64("2024-01-01T00:00")
+    assert index.next_departure("SGSIN", "JPTYO", pd.Timestamp("2024-01-02")) is None
+    assert index.next_departure("SGSIN", "XXXXX", np.datetime64("2024-01-01")) is None
+
+
+def test_nat_arrival_has_no_departure(tmp_path):
+    index = ScheduleIndex(tmp_path)
+    index.update({("SGSIN", "JPTYO"): t("2024-01-01", "2024-01-02")})
+    for arrival in (np.datetime64("NaT"), pd.NaT, None):
+        assert index.next_departure("SGSIN", "JPTYO", arrival) is None
+    out = index.next_departures("SGSIN", "JPTYO", t("NaT", "2023-12-31"))
+    assert np.isnat(out[0]) and out[1] == np.datetime64("2024-01-01")
+
+
+def test_reader_survives_a_lane_rewrite(tmp_path):
+    ScheduleIndex(tmp_path).update({("SGSIN", "JPTYO"): t("2024-01-01")})
+    reader = ScheduleIndex(tmp_path)   # holds the manifest naming the first lane file
+    ScheduleIndex(tmp_path).update({("SGSIN", "JPTYO"): t("2024-01-02")})
+    assert reader.next_departure("SGSIN", "JPTYO", np.datetime64("2024-01-01")) == np.datetime64("2024-01-02")